@@ -0,0 +1,122 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+
+class LRUCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+validated_tokens = LRUCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+users = LRUCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication remembering verified tokens and their users.
+
+    A repeated token skips signature verification and the user query.
+    Tokens are kept no longer than until they expire. Saving or deleting a
+    user changes its version stamp in the Django cache, and cached users
+    are only used while their stamp is current. With a shared cache other
+    processes reload them on the next request, with a process-local one
+    after AUTH_CACHE_TTL seconds, see checks.MAX_LOCAL_AUTH_CACHE_TTL.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = validated_tokens.get(raw_token)
+        if validated_token is None:
+            validated_token = super().get_validated_token(raw_token)
+            validated_tokens.set(
+                raw_token, validated_token, self._lifetime(validated_token)
+            )
+        return validated_token
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        # Read before the user, so a concurrent change is never missed
+        version = cache.get(user_version_key(user_id))
+        cached = users.get(user_id)
+        if cached is not None and cached[1] == version:
+            user = cached[0]
+        else:
+            user = super().get_user(validated_token)
+            users.set(user_id, (user, version))
+        # Requests may change their user, don't share the cached instance
+        return copy.copy(user)
+
+    @staticmethod
+    def _lifetime(validated_token) -> float:
+        return validated_token.payload["exp"] - time.time()
+
+
+def user_version_key(user_id: Any) -> str:
+    return f"auth:user:{user_id}:version"
+
+
+def invalidate_user(sender, instance, **kwargs) -> None:
+    """Make cached copies of the user stale in every process.
+
+    The stamp changes again after commit, so a process that reloaded the
+    old row in between doesn't keep it.
+    """
+    user_id = getattr(instance, api_settings.USER_ID_FIELD)
+    users.delete(user_id)
+    key = user_version_key(user_id)
+    cache.set(key, uuid.uuid4().hex, timeout=None)
+    transaction.on_commit(lambda: cache.set(key, uuid.uuid4().hex, timeout=None))
+
+
+def clear_cache() -> None:
+    validated_tokens.clear()
+    users.clear()
+
+
+post_save.connect(invalidate_user, sender=settings.AUTH_USER_MODEL)
+post_delete.connect(invalidate_user, sender=settings.AUTH_USER_MODEL)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core import checks
+
+from app import caches
+
+# Longest time other processes may authenticate changed users with a
+# process-local cache, where they don't see the new version stamps
+MAX_LOCAL_AUTH_CACHE_TTL = 5
+
+
+@checks.register(checks.Tags.caches)
+def check_auth_cache(app_configs, **kwargs):
+    """Cached users must not outlive their changes for long"""
+    if settings.AUTH_CACHE_TTL > MAX_LOCAL_AUTH_CACHE_TTL and not caches.is_shared():
+        return [
+            checks.Error(
+                f"AUTH_CACHE_TTL is above {MAX_LOCAL_AUTH_CACHE_TTL} seconds, but "
+                "the default cache isn't shared between processes",
+                hint="Set CACHE_BACKEND and CACHE_LOCATION to a shared cache like "
+                f"memcached, or lower AUTH_CACHE_TTL to {MAX_LOCAL_AUTH_CACHE_TTL}.",
+                id="accounts.E001",
+            )
+        ]
+    return []
@@ -0,0 +1,19 @@
+"""Default cache as storage shared by all processes.
+
+Wallet cache invalidation, replica pins and versions of authenticated users
+are written by the process that changes the data and must be seen by every
+other one: web workers and the transfer queue workers.
+"""
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+
+# Every process has its own copy of these caches, or none at all
+PROCESS_LOCAL_BACKENDS = {
+    "django.core.cache.backends.dummy.DummyCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+}
+
+
+def is_shared(alias: str = DEFAULT_CACHE_ALIAS) -> bool:
+    """Whether values set in the cache are seen by other processes"""
+    return settings.CACHES[alias]["BACKEND"] not in PROCESS_LOCAL_BACKENDS
@@ -0,0 +1,92 @@
+"""PostgreSQL backend taking connections from a pool of the process.
+
+Closing a connection, e.g. at the end of a request, returns it to the pool
+after rolling back anything left open. Pool options are read from the POOL
+key of the database settings: MAX_SIZE, TIMEOUT and MAX_LIFETIME.
+"""
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from app.db.pool import ConnectionPool, PoolTimeoutError, pools
+
+from .creation import DatabaseCreation
+
+_lock = threading.Lock()
+# Connection parameters of pools by alias
+_params = {}
+
+
+def check(connection) -> bool:
+    if connection.closed:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    return True
+
+
+def reset(connection) -> bool:
+    """Roll back an open transaction and turn autocommit on, so checks don't
+    start transactions. Return False if the connection is broken.
+    """
+    if connection.closed:
+        return False
+    try:
+        if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+        connection.autocommit = True
+    except base.Database.Error:
+        return False
+    return True
+
+
+def close_pool(alias: str) -> None:
+    with _lock:
+        pool = pools.pop(alias, None)
+        _params.pop(alias, None)
+    if pool is not None:
+        pool.close()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_pool(self, conn_params: dict) -> ConnectionPool:
+        if _params.get(self.alias, conn_params) != conn_params:
+            # Settings changed, e.g. NAME by the test runner
+            close_pool(self.alias)
+        with _lock:
+            pool = pools.get(self.alias)
+            if pool is None:
+                _params[self.alias] = conn_params
+                options = self.settings_dict.get("POOL", {})
+                connect = super().get_new_connection
+                pool = pools[self.alias] = ConnectionPool(
+                    lambda: connect(conn_params),
+                    max_size=options.get("MAX_SIZE", 10),
+                    timeout=options.get("TIMEOUT", 5.0),
+                    max_lifetime=options.get("MAX_LIFETIME", 1800.0),
+                    check=check,
+                    name=self.alias,
+                )
+            return pool
+
+    def get_new_connection(self, conn_params):
+        try:
+            self.connection_pool = self.get_pool(conn_params)
+            connection = self.connection_pool.acquire()
+        except PoolTimeoutError as error:
+            raise base.Database.OperationalError(str(error)) from error
+        options = self.settings_dict["OPTIONS"]
+        self.isolation_level = options.get(
+            "isolation_level", connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # The connection stays referenced inside an atomic block
+                discard = self.in_atomic_block or not reset(self.connection)
+                self.connection_pool.release(self.connection, discard=discard)
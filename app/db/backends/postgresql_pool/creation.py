@@ -0,0 +1,10 @@
+from django.db.backends.postgresql import creation
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        from .base import close_pool
+
+        # Idle connections to the test database would block DROP DATABASE
+        close_pool(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
@@ -0,0 +1,183 @@
+"""Bounded pool of database connections.
+
+A ConnectionPool is shared by the threads of a process. Connections are
+created by factory() up to max_size; checkout reuses the most recently
+returned idle connection after check() passes, and waits up to timeout
+seconds for a connection while all of them are in use. Connections older
+than max_lifetime seconds are closed instead of being reused.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app import instrumentation
+
+Connection = Any
+
+
+class PoolTimeoutError(Exception):
+    """No connection became free in time"""
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        factory: Callable[[], Connection],
+        max_size: int = 10,
+        timeout: float = 5.0,
+        max_lifetime: Optional[float] = 1800.0,
+        check: Optional[Callable[[Connection], bool]] = None,
+        close: Optional[Callable[[Connection], None]] = None,
+        name: str = "default",
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check = check
+        self.close_connection = close or (lambda connection: connection.close())
+        self.name = name
+        self.clock = clock
+        # Idle connections with their creation time, most recent last
+        self._idle: List[Tuple[Connection, float]] = []
+        # id() of checked out connections -> creation time
+        self._in_use: Dict[int, float] = {}
+        # Open connections, idle, in use or being created
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def acquire(self) -> Connection:
+        started = self.clock()
+        deadline = started + self.timeout
+        while True:
+            idle = self._reserve(deadline)
+            if idle is None:
+                connection, created = self._connect(), self.clock()
+            else:
+                connection, created = idle
+                if self._expired(created) or not self._healthy(connection):
+                    self._discard(connection)
+                    continue
+
+            with self._condition:
+                self._in_use[id(connection)] = created
+            wait_time.observe((self.name,), self.clock() - started)
+            return connection
+
+    def _reserve(self, deadline: float) -> Optional[Tuple[Connection, float]]:
+        """Take an idle connection, or return None for room to open one"""
+        with self._condition:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    checkout_failures.inc((self.name, "timeout"))
+                    raise PoolTimeoutError(
+                        f"No connection of pool {self.name} was free "
+                        f"in {self.timeout} seconds"
+                    )
+                self._condition.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._size += 1
+            return None
+
+    def _connect(self) -> Connection:
+        """Open a connection in room taken by _reserve()"""
+        try:
+            return self.factory()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            checkout_failures.inc((self.name, "connect"))
+            raise
+
+    def release(self, connection: Connection, discard: bool = False) -> None:
+        """Return a checked out connection, closing it if discard is set"""
+        with self._condition:
+            created = self._in_use.pop(id(connection))
+            if not (discard or self._closed or self._expired(created)):
+                self._idle.append((connection, created))
+                self._condition.notify()
+                return
+        self._discard(connection)
+
+    def close(self) -> None:
+        """Close idle connections, and the others when they are released"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+            }
+
+    def _expired(self, created: float) -> bool:
+        return (
+            self.max_lifetime is not None
+            and self.clock() - created >= self.max_lifetime
+        )
+
+    def _healthy(self, connection: Connection) -> bool:
+        if self.check is None:
+            return True
+        try:
+            return self.check(connection)
+        except Exception:
+            return False
+
+    def _discard(self, connection: Connection) -> None:
+        try:
+            self.close_connection(connection)
+        except Exception:
+            pass
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+
+pools: Dict[str, ConnectionPool] = {}
+
+
+def _collect_connections() -> Iterator[Tuple[Tuple[str, ...], float]]:
+    for name, pool in list(pools.items()):
+        stats = pool.stats()
+        yield (name, "idle"), stats["idle"]
+        yield (name, "in_use"), stats["in_use"]
+
+
+def _collect_max_size() -> Iterator[Tuple[Tuple[str, ...], float]]:
+    for name, pool in list(pools.items()):
+        yield (name,), pool.max_size
+
+
+wait_time = instrumentation.Histogram(
+    "db_pool_wait_seconds", "Time of connection checkouts", ["pool"]
+)
+checkout_failures = instrumentation.Counter(
+    "db_pool_checkout_failures_total",
+    "Checkouts failed by timeout or connection error",
+    ["pool", "reason"],
+)
+instrumentation.register(
+    wait_time,
+    checkout_failures,
+    instrumentation.Gauge(
+        "db_pool_connections",
+        "Open connections of pools by state",
+        ["pool", "state"],
+        _collect_connections,
+    ),
+    instrumentation.Gauge(
+        "db_pool_max_size", "Maximum size of pools", ["pool"], _collect_max_size
+    ),
+)
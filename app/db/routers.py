@@ -0,0 +1,85 @@
+"""Read replica routing.
+
+Service functions decorated with read_from_replica run their queries on a
+random replica from settings.DATABASE_REPLICAS, and querysets they return
+are bound to it. Everything else, including all writes, goes to the
+primary. Users whose wallets were just written are pinned to the primary
+for REPLICA_PIN_SECONDS, so they read their own writes despite replica lag.
+Pins are kept in the default cache, which must be shared by all processes
+(check wallets.E002): writes of one process pin users in the others.
+"""
+import random
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Iterable, Optional, TypeVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import QuerySet
+
+F = TypeVar("F", bound=Callable)
+
+_read_db: ContextVar[Optional[str]] = ContextVar("read_db", default=None)
+
+
+def pin_key(user_id: int) -> str:
+    return f"replicas:pin:{user_id}"
+
+
+def pin_to_primary(user_ids: Iterable[int]) -> None:
+    """Read data of users from the primary for REPLICA_PIN_SECONDS.
+
+    The window starts again when the current transaction commits.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return
+    keys = {pin_key(user_id): True for user_id in user_ids}
+    cache.set_many(keys, settings.REPLICA_PIN_SECONDS)
+    transaction.on_commit(lambda: cache.set_many(keys, settings.REPLICA_PIN_SECONDS))
+
+
+def get_read_db(user_id: int) -> str:
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas or cache.get(pin_key(user_id)):
+        return DEFAULT_DB_ALIAS
+    return random.choice(replicas)
+
+
+def current_read_db() -> str:
+    """Database of the running read_from_replica function"""
+    return _read_db.get() or DEFAULT_DB_ALIAS
+
+
+def read_from_replica(func: F) -> F:
+    """Run func(user, ...) on a replica unless the user is pinned.
+
+    Nested calls use the database of the outermost one.
+    """
+
+    @wraps(func)
+    def wrapper(user, *args, **kwargs):
+        alias = _read_db.get() or get_read_db(user.pk)
+        token = _read_db.set(alias)
+        try:
+            result = func(user, *args, **kwargs)
+        finally:
+            _read_db.reset(token)
+        if isinstance(result, QuerySet) and result._db is None:
+            # Lazy querysets run after the function returns
+            result = result.using(alias)
+        return result
+
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints) -> str:
+        return current_read_db()
+
+    def db_for_write(self, model, **hints) -> str:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # Every database holds the same data
+        return True
@@ -0,0 +1,250 @@
+"""Per-request performance statistics and in-process Prometheus metrics.
+
+InstrumentationMiddleware keeps a RequestStats in a context variable for
+every request: queries and their time are counted by a database execute
+wrapper, serialization time by timed_serialization() blocks around building and
+rendering response data. Finished requests are observed in histograms
+labelled by view, which the /metrics view renders in the Prometheus text
+format. Metrics are kept per process.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (Callable, Dict, Iterable, Iterator, List, Optional,
+                    Sequence, Tuple)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    """Time and queries of one request, in seconds"""
+
+    __slots__ = ("started", "queries", "db_time", "serialization_time")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+
+    @property
+    def total_time(self) -> float:
+        return time.perf_counter() - self.started
+
+
+current_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_stats", default=None
+)
+
+
+def record_query(execute: Callable, sql: str, params, many: bool, context):
+    """Execute wrapper adding the query to the stats of the current request"""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+@contextmanager
+def timed_serialization() -> Iterator[None]:
+    """Add time of the block to serialization time of the current request"""
+    stats = current_stats.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serialization_time += time.perf_counter() - started
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(
+                f"{self.name}{{{_format_labels(self.labelnames, labels)}}} {value}"
+            )
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge:
+    """Gauge with labels, read from collect() on every render"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]],
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+        ]
+        for labels, value in sorted(self.collect()):
+            lines.append(
+                f"{self.name}{{{_format_labels(self.labelnames, labels)}}} {value}"
+            )
+        return lines
+
+    def reset(self) -> None:
+        pass
+
+
+class Histogram:
+    """Histogram with labels and fixed upper bounds of buckets"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [observations per bucket, sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, count = self._values.get(
+                labels, ([0] * len(self.buckets), 0.0, 0)
+            )
+            if index < len(self.buckets):
+                counts[index] += 1
+            self._values[labels] = (counts, total + value, count + 1)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            values = sorted(
+                (labels, (list(counts), total, count))
+                for labels, (counts, total, count) in self._values.items()
+            )
+        for labels, (counts, total, count) in values:
+            label_text = _format_labels(self.labelnames, labels)
+            cumulative = 0
+            for bound, observations in zip(self.buckets, counts):
+                cumulative += observations
+                lines.append(
+                    f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+LABELS = ("view", "method")
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Total time of requests", LABELS
+)
+request_db_duration = Histogram(
+    "http_request_db_seconds", "Time of database queries of requests", LABELS
+)
+request_serialization_duration = Histogram(
+    "http_request_serialization_seconds",
+    "Time of building and rendering response data",
+    LABELS,
+)
+request_queries = Histogram(
+    "http_request_queries", "Database queries of requests", LABELS, QUERY_BUCKETS
+)
+responses = Counter("http_responses_total", "Responses by status", LABELS + ("status",))
+
+METRICS = [
+    request_duration,
+    request_db_duration,
+    request_serialization_duration,
+    request_queries,
+    responses,
+]
+
+
+def observe_request(view: str, method: str, status: int, stats: RequestStats) -> None:
+    labels = (view, method)
+    request_duration.observe(labels, stats.total_time)
+    request_db_duration.observe(labels, stats.db_time)
+    request_serialization_duration.observe(labels, stats.serialization_time)
+    request_queries.observe(labels, stats.queries)
+    responses.inc(labels + (str(status),))
+
+
+def server_timing(stats: RequestStats) -> str:
+    """Server-Timing header value of request stats, durations in ms"""
+    return ", ".join(
+        [
+            f'db;desc="{stats.queries} queries";dur={stats.db_time * 1000:.2f}',
+            f"serialization;dur={stats.serialization_time * 1000:.2f}",
+            f"total;dur={stats.total_time * 1000:.2f}",
+        ]
+    )
+
+
+def register(*metrics) -> None:
+    """Add metrics of other modules to /metrics"""
+    METRICS.extend(metrics)
+
+
+def reset() -> None:
+    for metric in METRICS:
+        metric.reset()
@@ -0,0 +1,47 @@
+from contextlib import ExitStack
+from typing import Callable
+
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+
+from . import instrumentation
+
+
+def get_view_name(request: HttpRequest) -> str:
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    view_class = getattr(match.func, "view_class", None)
+    if view_class is not None:
+        return view_class.__name__
+    return getattr(match.func, "__name__", match.view_name)
+
+
+class InstrumentationMiddleware:
+    """Measure queries, DB time, serialization time and total time of requests.
+
+    The numbers are sent in the Server-Timing header and observed in the
+    histograms served by /metrics.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        stats = instrumentation.RequestStats()
+        token = instrumentation.current_stats.set(stats)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(instrumentation.record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            instrumentation.current_stats.reset(token)
+
+        response["Server-Timing"] = instrumentation.server_timing(stats)
+        instrumentation.observe_request(
+            get_view_name(request), request.method, response.status_code, stats
+        )
+        return response
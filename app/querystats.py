@@ -0,0 +1,199 @@
+"""SQL fingerprint statistics and slow query log.
+
+record_query is an execute wrapper installed on every database connection
+(see install()). It normalizes SQL into a fingerprint, with literals,
+placeholders and lists of them replaced, and keeps count, total and max
+time per fingerprint in memory. Queries slower than SLOW_QUERY_MS are
+logged with the wallets function that ran them.
+
+Every process writes its statistics to QUERY_STATS_DIR/<pid>.json at most
+every QUERY_STATS_DUMP_INTERVAL seconds and at exit, where the query_report
+command reads them.
+"""
+import atexit
+import inspect
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SORT_KEYS = ("total", "count", "max", "mean")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+_PLACEHOLDERS = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+_ROWS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """Return sql with values replaced, so similar queries are equal"""
+    sql = _STRING.sub("?", sql)
+    sql = _SAVEPOINT.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _PLACEHOLDERS.sub("(...)", sql)
+    sql = _ROWS.sub("(...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def _is_module_function(frame) -> bool:
+    function = frame.f_globals.get(frame.f_code.co_name)
+    if function is None:
+        return False
+    return getattr(inspect.unwrap(function), "__code__", None) is frame.f_code
+
+
+def get_caller() -> Optional[str]:
+    """Function that ran the query, as module.function:line.
+
+    The innermost top-level function of wallets.services is preferred over
+    nested functions and other wallets modules.
+    """
+    caller = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module == "wallets.services" and _is_module_function(frame):
+            return f"{module}.{frame.f_code.co_name}:{frame.f_lineno}"
+        if (
+            caller is None
+            and module.startswith("wallets.")
+            and not module.startswith("wallets.migrations")
+        ):
+            caller = f"{module}.{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return caller
+
+
+class QueryStats:
+    """Count, total and max time in seconds per fingerprint"""
+
+    def __init__(self):
+        # fingerprint -> [count, total, max]
+        self._values: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._next_dump: Optional[float] = None
+
+    def record(self, sql: str, duration: float) -> None:
+        key = fingerprint(sql)
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                self._values[key] = [1, duration, duration]
+            else:
+                values[0] += 1
+                values[1] += duration
+                if duration > values[2]:
+                    values[2] = duration
+
+    def snapshot(self) -> List[dict]:
+        with self._lock:
+            return [
+                {"fingerprint": key, "count": count, "total": total, "max": longest}
+                for key, (count, total, longest) in self._values.items()
+            ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def dump_due(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self._next_dump is not None and now < self._next_dump:
+                return False
+            due = self._next_dump is not None
+            self._next_dump = now + settings.QUERY_STATS_DUMP_INTERVAL
+            return due
+
+    def dump(self, directory: Optional[Path] = None) -> Path:
+        """Write the snapshot of this process to directory/<pid>.json"""
+        directory = Path(directory or settings.QUERY_STATS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{os.getpid()}.json"
+        temporary = directory / f"{os.getpid()}-{threading.get_ident()}.tmp"
+        temporary.write_text(
+            json.dumps({"pid": os.getpid(), "queries": self.snapshot()})
+        )
+        os.replace(temporary, path)
+        return path
+
+
+stats = QueryStats()
+
+
+def record_query(execute: Callable, sql: str, params, many: bool, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        stats.record(sql, duration)
+        if duration * 1000 >= settings.SLOW_QUERY_MS:
+            logger.warning(
+                "Slow query (%.1f ms) from %s: %s",
+                duration * 1000,
+                get_caller() or "unknown",
+                fingerprint(sql),
+            )
+        if stats.dump_due():
+            try:
+                stats.dump()
+            except OSError:
+                logger.exception("Can't write query stats")
+
+
+def install(sender, connection, **kwargs) -> None:
+    """connection_created receiver adding record_query to the connection"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def merge(snapshots: List[List[dict]]) -> List[dict]:
+    """Sum snapshots of several processes per fingerprint"""
+    merged: Dict[str, dict] = {}
+    for snapshot in snapshots:
+        for row in snapshot:
+            total = merged.setdefault(
+                row["fingerprint"],
+                {
+                    "fingerprint": row["fingerprint"],
+                    "count": 0,
+                    "total": 0.0,
+                    "max": 0.0,
+                },
+            )
+            total["count"] += row["count"]
+            total["total"] += row["total"]
+            total["max"] = max(total["max"], row["max"])
+    for row in merged.values():
+        row["mean"] = row["total"] / row["count"] if row["count"] else 0.0
+    return list(merged.values())
+
+
+def top(rows: List[dict], limit: int, key: str = "total") -> List[dict]:
+    return sorted(rows, key=lambda row: row[key], reverse=True)[:limit]
+
+
+def _dump_at_exit() -> None:
+    if stats.snapshot():
+        try:
+            stats.dump()
+        except OSError:
+            pass
+
+
+atexit.register(_dump_at_exit)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -52,7 +53,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "app.middleware.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "django.middleware.gzip.GZipMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -93,12 +96,54 @@ DATABASES = {
         "PASSWORD": os.environ.get("POSTGRES_PASSWORD", "password"),
         "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
         "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        # Used by the app.db.backends.postgresql_pool engine
+        "POOL": {
+            "MAX_SIZE": int(os.environ.get("POSTGRES_POOL_SIZE", default=10)),
+            "TIMEOUT": float(os.environ.get("POSTGRES_POOL_TIMEOUT", default=5)),
+            "MAX_LIFETIME": float(
+                os.environ.get("POSTGRES_POOL_MAX_LIFETIME", default=1800)
+            ),
+        },
         "TEST": {
             "NAME": "test_wallets",
         },
     }
 }
 
+# Read replicas: HOST of every PostgreSQL replica or NAME of every SQLite one
+DATABASE_REPLICAS = []
+replica_key = "HOST" if "postgresql" in DATABASES["default"]["ENGINE"] else "NAME"
+for index, replica in enumerate(os.environ.get("POSTGRES_REPLICAS", "").split(), 1):
+    DATABASES[f"replica{index}"] = {
+        **DATABASES["default"],
+        replica_key: replica,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{index}")
+
+DATABASE_ROUTERS = ["app.db.routers.ReplicaRouter"]
+
+# Seconds users read from the primary after changing wallets
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", default=5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "easy-money"),
+    }
+}
+
+# Seconds wallets stay cached, 0 turns the cache off. Other processes must
+# see invalidations, so it needs a shared CACHE_BACKEND (check wallets.E001)
+WALLET_CACHE_TIMEOUT = int(os.environ.get("WALLET_CACHE_TIMEOUT", default=0))
+WALLET_CACHE_LOCK_TIMEOUT = int(os.environ.get("WALLET_CACHE_LOCK_TIMEOUT", default=5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -150,10 +195,58 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedJWTAuthentication",
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "app.renderers.TimedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ],
 }
 
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", default=10000))
+# Changed users reach other processes through version stamps in the default
+# cache; if it isn't shared, only after AUTH_CACHE_TTL (check accounts.E001)
+AUTH_CACHE_TTL = int(os.environ.get("AUTH_CACHE_TTL", default=5))
+
+TRANSACTIONS_PAGE_SIZE = int(os.environ.get("TRANSACTIONS_PAGE_SIZE", default=50))
+TRANSACTIONS_MAX_PAGE_SIZE = int(
+    os.environ.get("TRANSACTIONS_MAX_PAGE_SIZE", default=500)
+)
+
+# List views serialize values() rows with wallets.fast_serializers
+FAST_LIST_SERIALIZATION = int(os.environ.get("FAST_LIST_SERIALIZATION", default=1))
+
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", default=2000))
+
+IDEMPOTENCY_KEY_RETENTION = int(
+    os.environ.get("IDEMPOTENCY_KEY_RETENTION", default=24)
+)
+
+# Transactions older than this many days are moved to the archive
+TRANSACTION_ARCHIVE_DAYS = int(os.environ.get("TRANSACTION_ARCHIVE_DAYS", default=365))
+
+# POST /transactions/ queues transfers for process_transfers workers
+ASYNC_TRANSFERS = int(os.environ.get("ASYNC_TRANSFERS", default=0))
+TRANSFER_QUEUE_BATCH_SIZE = int(
+    os.environ.get("TRANSFER_QUEUE_BATCH_SIZE", default=500)
+)
+TRANSFER_QUEUE_POLL_INTERVAL = float(
+    os.environ.get("TRANSFER_QUEUE_POLL_INTERVAL", default=0.2)
+)
+
+# SQL fingerprint statistics and slow query log, see app/querystats.py
+QUERY_STATS = int(os.environ.get("QUERY_STATS", default=1))
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", default=100))
+QUERY_STATS_DIR = os.environ.get(
+    "QUERY_STATS_DIR", os.path.join(tempfile.gettempdir(), "easy-money-querystats")
+)
+QUERY_STATS_DUMP_INTERVAL = int(
+    os.environ.get("QUERY_STATS_DUMP_INTERVAL", default=30)
+)
+
+# Transfer fee tiers per currency, see wallets/fees.py
+WALLET_FEE_SCHEDULES = {}
+
 SIMPLE_JWT = {
     # Устанавливаем срок жизни токена
     "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
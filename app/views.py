@@ -1,8 +1,28 @@
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import render
 
+from wallets import caching
+
+from . import instrumentation
+
 
 def index(request: HttpRequest) -> HttpResponse:
     reveal_type(request.is_ajax)
     reveal_type(request.user)
-    return render(request, 'main/index.html')
\ No newline at end of file
+    return render(request, 'main/index.html')
+
+
+def metrics(request: HttpRequest) -> HttpResponse:
+    """Request metrics and wallet cache stats in Prometheus text format"""
+    lines = []
+    for metric in instrumentation.METRICS:
+        lines += metric.render()
+    lines += [
+        "# HELP wallet_cache_requests_total Lookups of the wallet cache",
+        "# TYPE wallet_cache_requests_total counter",
+    ]
+    for result, value in caching.get_stats().items():
+        lines.append(f'wallet_cache_requests_total{{result="{result}"}} {value}')
+    return HttpResponse(
+        "\n".join(lines) + "\n", content_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,21 @@
+"""Offline benchmarks of the wallets app.
+
+Scripts are run from the project root, e.g. ``python -m benchmarks.run``.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django() -> None:
+    """Configure Django for a benchmark script run outside manage.py"""
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-for-offline-runs-only")
+    os.environ.setdefault("DJANGO_ALLOWED_HOSTS", "testserver")
+
+    import django
+
+    django.setup()
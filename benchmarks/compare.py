@@ -0,0 +1,47 @@
+"""Compare two benchmark result files, e.g. of two commits:
+
+    python -m benchmarks.compare benchmarks/results/abc1234-sqlite.json \
+        benchmarks/results/def5678-sqlite.json
+"""
+import argparse
+import json
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "queries", "rows_per_sec")
+
+
+def change(old: float, new: float) -> str:
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old:+.1%}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args()
+
+    with open(args.old) as file:
+        old = json.load(file)
+    with open(args.new) as file:
+        new = json.load(file)
+
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    for scale, results in new["scales"].items():
+        old_scenarios = old["scales"].get(scale, {}).get("scenarios", {})
+        print(f"\n{scale}")
+        print(f"{'scenario':<34}" + "".join(f"{metric:>14}" for metric in METRICS))
+        for name, result in results["scenarios"].items():
+            if name not in old_scenarios:
+                continue
+            print(
+                f"{name:<34}"
+                + "".join(
+                    f"{change(old_scenarios[name][metric], result[metric]):>14}"
+                    for metric in METRICS
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
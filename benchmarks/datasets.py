@@ -0,0 +1,15 @@
+"""Seeded benchmark datasets"""
+from typing import Dict
+
+from wallets.synthetic import DatasetGenerator, Scale
+
+SCALES = {
+    "small": Scale(users=20, wallets_per_user=3, transactions=2_000),
+    "medium": Scale(users=200, wallets_per_user=3, transactions=20_000),
+    "large": Scale(users=2_000, wallets_per_user=3, transactions=200_000),
+}
+
+
+def seed(scale: Scale, seed: int) -> Dict[str, int]:
+    """Generate USD wallets only, so users can transfer between their wallets"""
+    return DatasetGenerator(scale, seed=seed, currencies=["USD"]).generate()
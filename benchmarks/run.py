@@ -0,0 +1,127 @@
+"""Run the benchmark suite on seeded datasets and save results as JSON.
+
+Every scale is seeded into a fresh test database (SQLite or the configured
+PostgreSQL), measured and dropped:
+
+    python -m benchmarks.run --scales small medium --iterations 200
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from benchmarks import ROOT, setup_django
+
+setup_django()
+
+import django  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.test.utils import teardown_test_environment  # noqa: E402
+
+from accounts.models import User  # noqa: E402
+from benchmarks import datasets, suite  # noqa: E402
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_scale(scale: datasets.Scale, args: argparse.Namespace) -> dict:
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        started = time.perf_counter()
+        counts = datasets.seed(scale, args.seed)
+        seconds = time.perf_counter() - started
+        user = User.objects.order_by("id").first()
+        scenarios = suite.run(
+            user,
+            args.iterations,
+            warmup=args.warmup,
+            cold_cache=not args.warm_cache,
+            only=args.scenarios,
+        )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+    return {"dataset": dict(counts, seconds=seconds), "scenarios": scenarios}
+
+
+def print_results(title: str, results: dict) -> None:
+    print(f"\n{title}: {results['dataset']}")
+    print(
+        f"{'scenario':<34}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        f"{'queries':>9}{'rows/s':>11}"
+    )
+    for name, result in results["scenarios"].items():
+        print(
+            f"{name:<34}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+            f"{result['p99_ms']:>9.2f}{result['queries']:>9.1f}"
+            f"{result['rows_per_sec']:>11,.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scales", nargs="+", choices=datasets.SCALES, default=["small"]
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument(
+        "--warm-cache",
+        action="store_true",
+        help="Keep the wallet cache between iterations",
+    )
+    parser.add_argument("--scenarios", nargs="+", help="Run only these scenarios")
+    parser.add_argument("--output", help="JSON file, defaults to benchmarks/results/")
+    args = parser.parse_args()
+
+    commit = get_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "seed": args.seed,
+            "iterations": args.iterations,
+            "cache": "warm" if args.warm_cache else "cold",
+        },
+        "scales": {},
+    }
+
+    setup_test_environment()
+    try:
+        for name in args.scales:
+            report["scales"][name] = run_scale(datasets.SCALES[name], args)
+            print_results(name, report["scales"][name])
+    finally:
+        teardown_test_environment()
+
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"{commit}-{connection.vendor}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nSaved {output}")
+
+
+if __name__ == "__main__":
+    main()
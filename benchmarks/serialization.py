@@ -0,0 +1,131 @@
+"""Compare rows/sec of model serializers and the fast serialization path.
+
+Both paths serialize the same in-memory rows and render them to JSON, so
+the numbers don't include database time:
+
+    python -m benchmarks.serialization --rows 10000 --repeat 5
+"""
+import argparse
+import decimal
+import time
+from datetime import date, timedelta
+from functools import partial
+
+from benchmarks import setup_django
+
+setup_django()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from wallets.fast_serializers import (transaction_rows,  # noqa: E402
+                                      wallet_rows)
+from wallets.models import Transaction, Wallet  # noqa: E402
+from wallets.serializers import (TransactionSerializer,  # noqa: E402
+                                 WalletSerializer)
+
+
+def make_wallets(count):
+    now = timezone.now()
+    return [
+        Wallet(
+            id=index,
+            name=f"W{index:07d}",
+            type="Visa",
+            currency="USD",
+            balance=decimal.Decimal(index) / 100,
+            created_on=date.today(),
+            modified_on=now - timedelta(seconds=index),
+            owner_id=index % 100,
+        )
+        for index in range(count)
+    ]
+
+
+def make_transactions(count):
+    now = timezone.now()
+    wallets = make_wallets(100)
+    return [
+        Transaction(
+            id=index,
+            sender=wallets[index % 100],
+            receiver=wallets[(index + 1) % 100],
+            transfer_amount=decimal.Decimal(index) / 100,
+            commission=decimal.Decimal("0.10"),
+            status="PAID",
+            timestamp=now - timedelta(seconds=index),
+        )
+        for index in range(count)
+    ]
+
+
+def wallet_row(wallet):
+    return {
+        field.attname: getattr(wallet, field.attname) for field in Wallet._meta.fields
+    }
+
+
+def transaction_row(transaction):
+    return {
+        "id": transaction.id,
+        "sender__name": transaction.sender.name,
+        "receiver__name": transaction.receiver.name,
+        "transfer_amount": transaction.transfer_amount,
+        "commission": transaction.commission,
+        "status": transaction.status,
+        "timestamp": transaction.timestamp,
+    }
+
+
+def serialize_many(serializer_class, items):
+    return serializer_class(items, many=True).data
+
+
+def measure(serialize, items, repeat):
+    renderer = JSONRenderer()
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        content = renderer.render(serialize(items))
+        best = min(best, time.perf_counter() - started)
+    return len(items) / best, content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [
+        (
+            "wallets",
+            make_wallets(args.rows),
+            wallet_row,
+            WalletSerializer,
+            wallet_rows,
+        ),
+        (
+            "transactions",
+            make_transactions(args.rows),
+            transaction_row,
+            TransactionSerializer,
+            transaction_rows,
+        ),
+    ]
+    print(f"{'list':<14}{'serializer rows/s':>20}{'fast rows/s':>16}{'speedup':>10}")
+    for title, instances, to_row, serializer_class, row_serializer in cases:
+        rows = [to_row(instance) for instance in instances]
+        slow, slow_content = measure(
+            partial(serialize_many, serializer_class),
+            instances,
+            args.repeat,
+        )
+        fast, fast_content = measure(row_serializer.many, rows, args.repeat)
+        if fast_content != slow_content:
+            raise SystemExit(f"{title}: fast path JSON differs")
+        print(f"{title:<14}{slow:>20,.0f}{fast:>16,.0f}{fast / slow:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Benchmark scenarios of wallet services and views.
+
+Every scenario is called repeatedly; each call returns the number of rows
+it read or wrote. Latency, queries and rows of every call are recorded.
+"""
+import decimal
+import itertools
+import math
+import time
+from typing import Callable, Dict, List, Optional
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from wallets import services
+
+HISTORY_PAGE_SIZE = 100
+
+Scenario = Callable[[], int]
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of values"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def measure(scenario: Scenario, iterations: int, warmup: int, cold_cache: bool) -> dict:
+    for _ in range(warmup):
+        scenario()
+
+    latencies = []
+    queries = rows = 0
+    for _ in range(iterations):
+        if cold_cache:
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            rows += scenario()
+            latencies.append(time.perf_counter() - started)
+        queries += len(context)
+
+    total = sum(latencies)
+    return {
+        "iterations": iterations,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": total / iterations * 1000,
+        "queries": queries / iterations,
+        "rows_per_sec": rows / total if total else 0.0,
+    }
+
+
+def get_scenarios(user: User) -> Dict[str, Scenario]:
+    """Scenarios run as user, who must have at least two wallets"""
+    client = APIClient()
+    token = RefreshToken.for_user(user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    wallets = list(user.wallet_set.order_by("id")[:2])
+    wallet_name = wallets[0].name
+    # Transfers alternate directions, so balances stay the same
+    directions = itertools.cycle([wallets, wallets[::-1]])
+    amount = decimal.Decimal("0.01")
+
+    def get(url: str) -> dict:
+        response = client.get(url)
+        assert response.status_code == 200, response.content
+        return response.json()
+
+    def view_transfer() -> int:
+        sender, receiver = next(directions)
+        response = client.post(
+            "/transactions/",
+            {
+                "sender": sender.name,
+                "receiver": receiver.name,
+                "transfer_amount": str(amount),
+            },
+            format="json",
+        )
+        assert response.status_code == 201, response.content
+        return 1
+
+    def service_transfer() -> int:
+        sender, receiver = next(directions)
+        services.create_transaction(
+            user, {"sender": sender, "receiver": receiver, "transfer_amount": amount}
+        )
+        return 1
+
+    history_url = f"?page_size={HISTORY_PAGE_SIZE}"
+    return {
+        "view.wallet_list": lambda: len(get("/wallets/")),
+        "view.history_list": lambda: len(
+            get(f"/transactions/{history_url}")["results"]
+        ),
+        "view.wallet_history_list": lambda: len(
+            get(f"/transactions/{wallet_name}/{history_url}")["results"]
+        ),
+        "view.transfer_create": view_transfer,
+        "service.get_user_wallets": lambda: len(services.get_user_wallets(user)),
+        "service.get_user_transactions": lambda: len(
+            services.get_user_transactions(user).newest(HISTORY_PAGE_SIZE)
+        ),
+        "service.get_wallet_transactions": lambda: len(
+            services.get_wallet_transactions(user, wallet_name).newest(
+                HISTORY_PAGE_SIZE
+            )
+        ),
+        "service.create_transaction": service_transfer,
+    }
+
+
+def run(
+    user: User,
+    iterations: int,
+    warmup: int = 5,
+    cold_cache: bool = True,
+    only: Optional[List[str]] = None,
+) -> Dict[str, dict]:
+    """Measure scenarios of user, optionally only those named in only"""
+    return {
+        name: measure(scenario, iterations, warmup, cold_cache)
+        for name, scenario in get_scenarios(user).items()
+        if not only or name in only
+    }
@@ -0,0 +1,70 @@
+import atexit
+
+import pytest
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+
+from accounts import authentication
+from app import querystats
+from wallets import names
+
+
+@pytest.fixture(autouse=True, scope="session")
+def keep_query_stats():
+    """Don't write query stats of the test run for query_report"""
+    atexit.unregister(querystats._dump_at_exit)
+
+
+@pytest.fixture(scope="session")
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix):
+    """Add a second database, used as a replica by tests that request it"""
+    default = connections.databases["default"]
+    connections.databases.setdefault(
+        "replica", {**default, "TEST": {**default["TEST"], "NAME": None}}
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Tests reuse primary keys, so cached rows must not leak between them"""
+    cache.clear()
+    authentication.clear_cache()
+    names.allocator.reset()
+
+
+@pytest.fixture(autouse=True)
+def wallet_cache(settings):
+    """Tests run in a single process, so the local cache is enough"""
+    settings.WALLET_CACHE_TIMEOUT = 60
+
+
+@pytest.fixture
+def count_queries():
+    """Return number of queries executed by calling func"""
+
+    def count(func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            func(*args, **kwargs)
+        return len(context)
+
+    return count
+
+
+@pytest.fixture
+def assert_constant_queries(count_queries):
+    """Fail if queries of request grow with the number of rows.
+
+    request is called once, then add_rows() inserts more data and request
+    is called again; both calls must run the same number of queries,
+    which must not exceed budget.
+    """
+
+    def check(request, add_rows, budget):
+        before = count_queries(request)
+        add_rows()
+        after = count_queries(request)
+        assert before == after, f"{before} queries grew to {after} with more rows"
+        assert after <= budget, f"{after} queries exceed budget of {budget}"
+
+    return check
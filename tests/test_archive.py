@@ -0,0 +1,194 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from wallets import history, rollups, services
+from wallets.models import ArchivedTransaction, DailyWalletRollup, Transaction
+
+HORIZON = timedelta(days=365)
+
+
+@pytest.fixture
+def user():
+    return User.objects.create(email="user1@gmail.com")
+
+
+@pytest.fixture
+def transactions(user):
+    """Six transfers between wallets of user, the first four are old"""
+    sender = services.create_wallet(user, {"type": "Visa", "currency": "RUB"})
+    receiver = services.create_wallet(user, {"type": "Visa", "currency": "RUB"})
+    ids = [
+        services.create_transaction(
+            user, {"sender": sender, "receiver": receiver, "transfer_amount": 1}
+        ).id
+        for _ in range(6)
+    ]
+    Transaction.objects.filter(id__in=ids[:4]).update(
+        timestamp=timezone.now() - HORIZON - timedelta(days=1)
+    )
+    return ids
+
+
+@pytest.fixture
+def auth_client(user):
+    client = APIClient()
+    refresh = RefreshToken.for_user(user)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    return client
+
+
+@pytest.fixture
+def archive():
+    """Archive in batches of 3"""
+
+    def run():
+        return services.archive_transactions(timezone.now() - HORIZON, batch_size=3)
+
+    return run
+
+
+@pytest.mark.django_db
+def test_old_transactions_are_archived(archive, transactions):
+    before = list(Transaction.objects.order_by("id").values())
+
+    assert archive() == 4
+
+    assert list(Transaction.objects.values_list("id", flat=True)) == transactions[4:]
+    assert list(ArchivedTransaction.objects.order_by("id").values()) == before[:4]
+    assert archive() == 0
+
+
+@pytest.mark.django_db
+def test_archiving_stops_at_newer_transaction(archive, transactions):
+    Transaction.objects.filter(id=transactions[2]).update(timestamp=timezone.now())
+
+    assert archive() == 2
+    assert list(ArchivedTransaction.objects.values_list("id", flat=True)) == (
+        transactions[:2]
+    )
+
+
+@pytest.mark.django_db
+def test_rows_committed_during_archiving_are_kept(archive, transactions, monkeypatch):
+    """Only the copied rows are deleted from the hot table"""
+    late = Transaction.objects.get(id=transactions[1])
+    Transaction.objects.filter(id=late.id).delete()
+    bulk_create = ArchivedTransaction.objects.bulk_create
+
+    def commit_late_row(objs, *args, **kwargs):
+        # A transaction with a smaller id commits after the batch was read
+        created = bulk_create(objs, *args, **kwargs)
+        Transaction.objects.bulk_create([late])
+        return created
+
+    monkeypatch.setattr(ArchivedTransaction.objects, "bulk_create", commit_late_row)
+
+    assert archive() == 3
+
+    assert Transaction.objects.filter(id=late.id).exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("fast", [True, False])
+def test_pages_continue_into_archive(
+    archive, transactions, auth_client, settings, fast
+):
+    settings.FAST_LIST_SERIALIZATION = fast
+    expected = auth_client.get("/transactions/").json()["results"]
+    archive()
+
+    received = []
+    url = "/transactions/?page_size=4"
+    while url:
+        body = auth_client.get(url).json()
+        received += body["results"]
+        url = body["next"]
+
+    assert received == expected
+    assert [row["id"] for row in received] == transactions[::-1]
+
+
+@pytest.mark.django_db
+def test_archive_is_only_queried_for_older_rows(
+    archive, user, transactions, django_assert_num_queries
+):
+    archive()
+    watermark = history.get_watermark()
+    assert watermark == transactions[3]
+    transfers = services.get_user_transactions(user)
+
+    # The first page also reads the watermark
+    with django_assert_num_queries(2):
+        assert len(transfers.newest(2)) == 2
+    with django_assert_num_queries(2):
+        assert len(transfers.newest(3)) == 3
+    with django_assert_num_queries(1):
+        assert len(transfers.newest(10, before=watermark)) == 3
+
+
+@pytest.mark.django_db
+def test_archived_transaction_detail(archive, transactions, auth_client):
+    url = f"/transactions/{transactions[0]}/"
+    expected = auth_client.get(url).json()
+    archive()
+
+    response = auth_client.get(url)
+
+    assert response.status_code == 200
+    assert response.json() == expected
+    assert auth_client.get("/transactions/999999/").status_code == 404
+
+
+@pytest.mark.django_db
+def test_export_includes_archive(archive, user, transactions):
+    archive()
+    wallet = Transaction.objects.first().sender
+
+    rows = services.get_wallet_transactions_export(user, wallet.name)
+
+    assert [row[0] for row in rows] == transactions
+
+
+@pytest.mark.django_db
+def test_backfill_includes_archive(archive, transactions):
+    def get_rollups():
+        return list(DailyWalletRollup.objects.order_by("wallet", "day").values())
+
+    rollups.backfill(None, timezone.localdate())
+    expected = [{**row, "id": None} for row in get_rollups()]
+    archive()
+
+    rollups.backfill(None, timezone.localdate())
+
+    assert [{**row, "id": None} for row in get_rollups()] == expected
+
+
+@pytest.mark.django_db
+def test_archive_transactions_command(transactions):
+    out = StringIO()
+    call_command("archive_transactions", "--days", "365", stdout=out)
+
+    assert out.getvalue() == "Archived 4 transactions\n"
+
+
+@pytest.mark.django_db
+def test_archived_rows_are_read_right_after_archiving(transactions, auth_client):
+    """Reads before an archive run don't leave a stale watermark behind"""
+    url = f"/transactions/{transactions[0]}/"
+    expected = auth_client.get("/transactions/?page_size=5").json()
+    detail = auth_client.get(url).json()
+
+    call_command("archive_transactions", "--days", "365", stdout=StringIO())
+
+    body = auth_client.get("/transactions/?page_size=5").json()
+    assert body["results"] == expected["results"]
+    last = auth_client.get(body["next"]).json()["results"]
+    assert [row["id"] for row in last] == transactions[:1]
+    assert auth_client.get(url).json() == detail
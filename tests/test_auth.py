@@ -1,5 +1,9 @@
 import pytest
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts import authentication, checks
+from accounts.authentication import CachedJWTAuthentication, LRUCache
 
 test_data = {"email": "user1@gmail.com", "password": "string11111"}
 
@@ -23,3 +27,86 @@ def test_invalid_email(client):
     response_body = response.json()
     assert response.status_code == 400
     assert response_body["email"] == ["Enter a valid email address."]
+
+
+@pytest.fixture
+def auth_client(django_user_model):
+    user = django_user_model.objects.create(email="user1@gmail.com")
+    client = APIClient()
+    refresh = RefreshToken.for_user(user)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    client.user = user
+    return client
+
+
+@pytest.mark.django_db
+def test_cached_authentication(auth_client, django_assert_num_queries):
+    """Repeated token is authenticated without queries"""
+
+    response = auth_client.get("/transactions/")
+    assert response.status_code == 200
+
+    request = response.wsgi_request
+    with django_assert_num_queries(0):
+        user, _ = CachedJWTAuthentication().authenticate(request)
+    assert user == auth_client.user
+
+
+@pytest.mark.django_db
+def test_deactivated_user_is_invalidated(auth_client):
+    """Saving user drops it from the cache"""
+
+    assert auth_client.get("/wallets/").status_code == 200
+
+    auth_client.user.is_active = False
+    auth_client.user.save()
+    assert auth_client.get("/wallets/").status_code == 401
+
+
+@pytest.mark.django_db
+def test_user_changed_by_another_process_is_reloaded(
+    auth_client, django_capture_on_commit_callbacks
+):
+    """Cached user is dropped when another process saves it"""
+
+    assert auth_client.get("/wallets/").status_code == 200
+    # This process still has the user the other process is about to change
+    stale = authentication.users.get(auth_client.user.pk)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        auth_client.user.is_active = False
+        auth_client.user.save()
+    authentication.users.set(auth_client.user.pk, stale)
+
+    assert auth_client.get("/wallets/").status_code == 401
+
+
+def test_lru_cache_eviction_and_ttl():
+    """Least recently used and expired entries are dropped"""
+
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert len(cache) == 2
+
+    cache.set("d", 4, ttl=-1)
+    assert cache.get("d") is None
+
+
+def test_long_ttl_needs_shared_cache(settings, tmp_path):
+    """Other processes can't see version stamps in a local cache"""
+
+    assert checks.check_auth_cache(None) == []
+    settings.AUTH_CACHE_TTL = 60
+    assert [error.id for error in checks.check_auth_cache(None)] == ["accounts.E001"]
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(tmp_path),
+        }
+    }
+    assert checks.check_auth_cache(None) == []
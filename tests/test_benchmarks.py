@@ -0,0 +1,29 @@
+import pytest
+
+from accounts.models import User
+from benchmarks import datasets, suite
+
+
+def test_percentile():
+    """Percentiles use the nearest rank"""
+
+    values = list(range(1, 101))
+    assert suite.percentile(values, 50) == 50
+    assert suite.percentile(values, 99) == 99
+    assert suite.percentile([3.0], 95) == 3.0
+
+
+@pytest.mark.django_db
+def test_suite_runs():
+    """Every scenario reports latency, queries and rows"""
+
+    datasets.seed(datasets.Scale(users=2, wallets_per_user=2, transactions=10), 0)
+    user = User.objects.order_by("id").first()
+
+    results = suite.run(user, iterations=2, warmup=1)
+
+    assert set(results) == set(suite.get_scenarios(user))
+    for name, result in results.items():
+        assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"], name
+        assert result["queries"] > 0, name
+        assert result["rows_per_sec"] > 0, name
@@ -0,0 +1,116 @@
+import gzip
+import json
+from decimal import Decimal
+
+import pytest
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from wallets import services
+from wallets.models import Wallet
+
+
+@pytest.fixture
+def user():
+    return User.objects.create(email="user1@gmail.com")
+
+
+@pytest.fixture
+def user2():
+    return User.objects.create(email="user2@gmail.com")
+
+
+@pytest.fixture
+def wallets(user, user2):
+    return [
+        Wallet.objects.create(
+            name=name, type="Visa", currency="USD", balance=1000, owner=owner
+        )
+        for name, owner in [("U1USD1", user), ("U1USD2", user), ("U2USD1", user2)]
+    ]
+
+
+@pytest.fixture
+def auth_client(user):
+    client = APIClient()
+    refresh = RefreshToken.for_user(user)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    return client
+
+
+def transfer(user, sender, receiver, amount="1"):
+    services.create_transaction(
+        user,
+        {"sender": sender, "receiver": receiver, "transfer_amount": Decimal(amount)},
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "url", ["/wallets/", "/wallets/U1USD1/", "/transactions/", "/transactions/U1USD1/"]
+)
+def test_unchanged_poll_not_modified(
+    url, wallets, auth_client, django_assert_num_queries
+):
+    """Repeated GET with the ETag gets 304 without queries"""
+
+    transfer(wallets[0].owner, wallets[0], wallets[1])
+    response = auth_client.get(url)
+    assert response.status_code == 200
+    assert response["Last-Modified"]
+
+    with django_assert_num_queries(0):
+        response = auth_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "url", ["/wallets/", "/transactions/", "/transactions/U1USD2/"]
+)
+def test_incoming_transfer_changes_etag(url, wallets, user2, auth_client):
+    """Transfer from another user changes validators of the receiver"""
+
+    etag = auth_client.get(url)["ETag"]
+    transfer(user2, wallets[2], wallets[1])
+
+    response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_wallet_delete_changes_etag(wallets, auth_client):
+    """Deleting a wallet changes the list ETag"""
+
+    etag = auth_client.get("/transactions/")["ETag"]
+    auth_client.delete("/wallets/U1USD2/")
+
+    response = auth_client.get("/transactions/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_transaction_pages_etags(wallets, auth_client):
+    """Pages of one history have different ETags"""
+
+    for _ in range(3):
+        transfer(wallets[0].owner, wallets[0], wallets[1])
+
+    first = auth_client.get("/transactions/", {"page_size": 2})
+    second = auth_client.get(first.json()["next"])
+    assert first["ETag"] != second["ETag"]
+
+
+@pytest.mark.django_db
+def test_large_response_gzipped(wallets, auth_client):
+    """Large bodies are compressed for clients accepting gzip"""
+
+    for _ in range(20):
+        transfer(wallets[0].owner, wallets[0], wallets[1])
+
+    response = auth_client.get("/transactions/", HTTP_ACCEPT_ENCODING="gzip")
+    assert response["Content-Encoding"] == "gzip"
+    assert len(json.loads(gzip.decompress(response.content))["results"]) == 20
@@ -1,8 +1,11 @@
+import pytest
 from alphabet_detector import AlphabetDetector
 
-from wallets.models import Wallet
+from wallets import names
+from wallets.models import Wallet, WalletNameBlock
 
 
+@pytest.mark.django_db
 def test_create_wallet_name():
     """Testing wallet name with requirements"""
     wallet_name = Wallet.create_wallet_name()
@@ -12,3 +15,38 @@ def test_create_wallet_name():
     assert any(char.isdigit() for char in wallet_name) == True
     assert ad.only_alphabet_chars(wallet_name, "LATIN") == True
     assert ad.only_alphabet_chars(wallet_name, "CYRILLIC") == False
+    assert names.is_valid(wallet_name)
+
+
+def test_encode_is_unique():
+    """Different numbers give different valid names"""
+    numbers = list(range(10000)) + list(range(names.CAPACITY - 10000, names.CAPACITY))
+    encoded = {names.encode(number) for number in numbers}
+
+    assert len(encoded) == len(numbers)
+    assert all(names.is_valid(name) for name in encoded)
+
+    with pytest.raises(ValueError):
+        names.encode(names.CAPACITY)
+
+
+def test_check_digit():
+    """Changed character is detected by the check digit"""
+    name = names.encode(12345)
+    broken = ("A" if name[0] != "A" else "B") + name[1:]
+
+    assert names.is_valid(name)
+    assert not names.is_valid(broken)
+
+
+@pytest.mark.django_db
+def test_allocator_reserves_blocks(monkeypatch):
+    """Allocator inserts one block per BLOCK_SIZE names"""
+    monkeypatch.setattr(names, "BLOCK_SIZE", 10)
+    allocator = names.WalletNameAllocator()
+    allocated = {allocator.allocate() for _ in range(25)}
+
+    assert len(allocated) == 25
+    assert WalletNameBlock.objects.count() == 3
+    first = WalletNameBlock.objects.order_by("pk").first()
+    assert names.encode(first.pk * 10) in allocated
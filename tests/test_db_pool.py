@@ -0,0 +1,172 @@
+import threading
+
+import pytest
+from django.db import connection
+
+from app import instrumentation
+from app.db.pool import ConnectionPool, PoolTimeoutError, checkout_failures
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def created():
+    return []
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def make_pool(created, clock):
+    def factory():
+        created.append(FakeConnection(len(created)))
+        return created[-1]
+
+    def make(**kwargs):
+        kwargs.setdefault("check", lambda connection: connection.healthy)
+        return ConnectionPool(factory, clock=clock, name="test", **kwargs)
+
+    instrumentation.reset()
+    return make
+
+
+def test_connections_are_reused(make_pool, created):
+    pool = make_pool(max_size=2)
+
+    first = pool.acquire()
+    pool.release(first)
+    second = pool.acquire()
+
+    assert second is first
+    assert len(created) == 1
+    assert pool.stats() == {"max_size": 2, "size": 1, "idle": 0, "in_use": 1}
+
+
+def test_pool_is_bounded(make_pool):
+    pool = make_pool(max_size=2, timeout=0)
+    pool.acquire()
+    pool.acquire()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert checkout_failures._values == {("test", "timeout"): 1}
+
+
+def test_checkout_waits_for_release(make_pool):
+    pool = make_pool(max_size=1, timeout=5)
+    first = pool.acquire()
+    threading.Timer(0.05, pool.release, [first]).start()
+
+    assert pool.acquire() is first
+
+
+def test_unhealthy_connections_are_replaced(make_pool, created):
+    pool = make_pool()
+    first = pool.acquire()
+    pool.release(first)
+    first.healthy = False
+
+    second = pool.acquire()
+
+    assert second is not first
+    assert first.closed
+    assert pool.stats()["size"] == 1
+
+
+def test_max_lifetime(make_pool, created, clock):
+    pool = make_pool(max_lifetime=60)
+    first = pool.acquire()
+    pool.release(first)
+    clock.now = 30
+    assert pool.acquire() is first
+
+    clock.now = 61
+    pool.release(first)
+    assert first.closed
+    assert pool.acquire() is not first
+
+
+def test_discarded_connections_free_slots(make_pool):
+    pool = make_pool(max_size=1, timeout=0)
+    first = pool.acquire()
+    pool.release(first, discard=True)
+
+    assert first.closed
+    assert pool.acquire() is not first
+
+
+def test_connect_errors(clock):
+    def factory():
+        raise ConnectionError("refused")
+
+    instrumentation.reset()
+    pool = ConnectionPool(factory, max_size=1, clock=clock, name="test")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            pool.acquire()
+    assert pool.stats()["size"] == 0
+    assert checkout_failures._values == {("test", "connect"): 2}
+
+
+def test_close(make_pool):
+    pool = make_pool()
+    idle, in_use = pool.acquire(), pool.acquire()
+    pool.release(idle)
+
+    pool.close()
+    assert idle.closed and not in_use.closed
+    pool.release(in_use)
+    assert in_use.closed
+    assert pool.stats()["size"] == 0
+
+
+pooled = pytest.mark.skipif(
+    connection.settings_dict["ENGINE"] != "app.db.backends.postgresql_pool",
+    reason="Needs PostgreSQL with the pooled backend",
+)
+
+
+@pooled
+@pytest.mark.django_db(transaction=True)
+def test_postgres_connections_are_reused():
+    def backend_pid():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            return cursor.fetchone()[0]
+
+    pid = backend_pid()
+    connection.close()
+
+    assert backend_pid() == pid
+
+
+@pooled
+@pytest.mark.django_db(transaction=True)
+def test_postgres_transactions_are_rolled_back_on_release():
+    connection.set_autocommit(False)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    connection.close()
+
+    connection.ensure_connection()
+    assert connection.connection.get_transaction_status() == 0
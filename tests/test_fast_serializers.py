@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+import pytest
+from django.core.cache import cache
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from wallets.fast_serializers import RowSerializer, transaction_rows
+from wallets.models import Transaction, Wallet
+from wallets.serializers import TransactionSerializer
+
+
+@pytest.fixture
+def user():
+    user = User.objects.create(email="user1@gmail.com")
+    sender, receiver = [
+        Wallet.objects.create(
+            name=name, type="Visa", currency="USD", balance="1000.5", owner=user
+        )
+        for name in ["U1USD1", "U1USD2"]
+    ]
+    Transaction.objects.bulk_create(
+        Transaction(
+            sender=sender,
+            receiver=receiver,
+            transfer_amount=Decimal(amount),
+            commission=Decimal("0.10"),
+            status="PAID",
+        )
+        for amount in ["1", "2.5", "0.01", "99999.99", "10.10"]
+    )
+    return user
+
+
+@pytest.fixture
+def auth_client(user):
+    client = APIClient()
+    refresh = RefreshToken.for_user(user)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    return client
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/wallets/",
+        "/transactions/",
+        "/transactions/?page_size=2",
+        "/transactions/U1USD1/",
+        "/transactions/U1USD2/?page_size=3",
+    ],
+)
+@pytest.mark.parametrize("time_zone", ["UTC", "Europe/Moscow"])
+def test_fast_path_is_byte_identical(url, time_zone, auth_client, settings):
+    """Fast path renders the same JSON as the model serializers"""
+
+    settings.TIME_ZONE = time_zone
+    content = {}
+    for fast in (True, False):
+        settings.FAST_LIST_SERIALIZATION = fast
+        cache.clear()
+        response = auth_client.get(url)
+        assert response.status_code == 200
+        content[fast] = response.content
+
+    assert content[True] == content[False]
+
+
+@pytest.mark.django_db
+def test_transaction_rows(user):
+    """Rows are converted like model instances"""
+
+    queryset = Transaction.objects.order_by("id")
+    rows = transaction_rows.many(transaction_rows.values(queryset))
+    assert rows == TransactionSerializer(queryset, many=True).data
+
+
+def test_unsupported_field():
+    """Serializers with fields the fast path can't convert are rejected"""
+
+    class Serializer(serializers.Serializer):
+        total = serializers.SerializerMethodField()
+
+    with pytest.raises(ValueError):
+        RowSerializer(Serializer)
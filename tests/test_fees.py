@@ -0,0 +1,147 @@
+import gc
+import weakref
+from decimal import Decimal
+
+import pytest
+
+from wallets import services
+from wallets.fees import FeeEngine, FeeSchedule, Price, get_fee_engine
+from wallets.models import DEFAULT_COMMISSION, Wallet
+
+SCHEDULES = {"USD": [["100.00", "0.10"], ["1000.00", "0.05"], [None, "0.01"]]}
+
+
+@pytest.fixture
+def fee_schedules(settings):
+    settings.WALLET_FEE_SCHEDULES = SCHEDULES
+    get_fee_engine.cache_clear()
+    yield
+    get_fee_engine.cache_clear()
+
+
+@pytest.fixture
+def computed(fee_schedules, monkeypatch):
+    """Arguments of prices the engine computes rather than reuses"""
+    engine = get_fee_engine()
+    calls = []
+    compute = engine._price
+
+    def record(*key):
+        calls.append(key)
+        return compute(*key)
+
+    monkeypatch.setattr(engine, "_price", record)
+    return calls
+
+
+def test_schedule_tiers():
+    """Amount is charged the rate of the first tier it fits in"""
+
+    schedule = FeeSchedule(SCHEDULES["USD"])
+    assert schedule.rate(Decimal("0.01")) == Decimal("0.10")
+    assert schedule.rate(Decimal("100.00")) == Decimal("0.10")
+    assert schedule.rate(Decimal("100.01")) == Decimal("0.05")
+    assert schedule.rate(Decimal("5000")) == Decimal("0.01")
+
+
+def test_invalid_schedules():
+    """Schedules without open last tier or unordered are rejected"""
+
+    with pytest.raises(ValueError):
+        FeeSchedule([["100.00", "0.10"]])
+    with pytest.raises(ValueError):
+        FeeSchedule([["100.00", "0.10"], ["10.00", "0.05"], [None, "0.01"]])
+
+
+def test_default_engine():
+    """Currencies without schedule pay default commission, own transfers are free"""
+
+    engine = get_fee_engine()
+    assert engine.price("EUR", False, Decimal("10.00")) == Price(
+        Decimal(str(DEFAULT_COMMISSION)), Decimal("1.00"), Decimal("11.00")
+    )
+    assert engine.price("EUR", True, Decimal("10.00")) == Price(
+        Decimal("0"), Decimal("0"), Decimal("10.00")
+    )
+    assert engine.price("EUR", False, Decimal("0.05")).fee == Decimal("0.01")
+
+
+def test_price_batch(computed):
+    """Batch is priced with the configured schedule, equal transfers once"""
+
+    keys = [
+        ("USD", False, Decimal("50.00")),
+        ("USD", False, Decimal("500.00")),
+        ("USD", True, Decimal("500.00")),
+        ("EUR", False, Decimal("500.00")),
+    ]
+
+    prices = get_fee_engine().price_batch(keys * 3)
+
+    assert [prices[key].fee for key in keys] == [
+        Decimal("5.00"),
+        Decimal("25.00"),
+        Decimal("0"),
+        Decimal("50.00"),
+    ]
+    assert sorted(computed) == sorted(keys)
+
+
+def test_engine_is_collected():
+    """Prices kept by an engine don't keep it alive"""
+
+    engine = FeeEngine({}, FeeSchedule([(None, "0.10")]))
+    engine.price("USD", False, Decimal("10.00"))
+    ref = weakref.ref(engine)
+    del engine
+    gc.collect()
+
+    assert ref() is None
+
+
+@pytest.mark.django_db
+def test_batch_prices_equal_transfers_once(computed, django_user_model):
+    """Batch charges the scheduled fee, computing it once per distinct transfer"""
+
+    owner = django_user_model.objects.create(email="user1@gmail.com")
+    other = django_user_model.objects.create(email="user2@gmail.com")
+    Wallet.objects.create(
+        name="U1USD1", type="Visa", currency="USD", balance=1000, owner=owner
+    )
+    Wallet.objects.create(
+        name="U2USD1", type="Visa", currency="USD", balance=0, owner=other
+    )
+    transfer = {
+        "sender": "U1USD1",
+        "receiver": "U2USD1",
+        "transfer_amount": Decimal("50"),
+    }
+
+    results = services.create_transactions_batch(owner, [transfer] * 3)
+
+    assert [result["status"] for result in results] == ["PAID"] * 3
+    assert computed == [("USD", False, Decimal("50"))]
+    assert Wallet.objects.get(name="U1USD1").balance == 1000 - 3 * 55
+
+
+@pytest.mark.django_db
+def test_transfer_uses_schedule(fee_schedules, django_user_model):
+    """Validation and execution charge the scheduled fee"""
+
+    sender_owner = django_user_model.objects.create(email="user1@gmail.com")
+    receiver_owner = django_user_model.objects.create(email="user2@gmail.com")
+    sender = Wallet.objects.create(
+        name="U1USD1", type="Visa", currency="USD", balance=1000, owner=sender_owner
+    )
+    receiver = Wallet.objects.create(
+        name="U2USD1", type="Visa", currency="USD", balance=0, owner=receiver_owner
+    )
+
+    transaction = services.create_transaction(
+        sender_owner,
+        {"sender": sender, "receiver": receiver, "transfer_amount": Decimal("500")},
+    )
+
+    assert transaction.commission == Decimal("0.05")
+    assert Wallet.objects.get(name="U1USD1").balance == 1000 - 525
+    assert Wallet.objects.get(name="U2USD1").balance == 500
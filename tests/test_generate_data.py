@@ -0,0 +1,153 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+
+from accounts.models import User
+from wallets import bulk, ledger, names, rollups, services
+from wallets.models import DailyWalletRollup, LedgerEntry, Transaction, Wallet
+from wallets.synthetic import DatasetGenerator, Scale
+
+SCALE = Scale(users=10, wallets_per_user=3, transactions=200)
+
+
+def get_history():
+    return list(
+        Transaction.objects.order_by("id").values_list(
+            "sender__owner__email", "transfer_amount", "commission", "timestamp__date"
+        )
+    )
+
+
+def get_rollups():
+    return sorted(
+        DailyWalletRollup.objects.values_list(
+            "wallet_id",
+            "day",
+            "inflow",
+            "outflow",
+            "fees",
+            "incoming_count",
+            "outgoing_count",
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_generated_data_is_consistent():
+    """Balances, ledger and rollups agree with the generated transfers"""
+
+    counts = DatasetGenerator(SCALE, seed=1).generate()
+
+    assert counts["users"] == User.objects.count() == 10
+    assert counts["wallets"] == Wallet.objects.count() == 30
+    assert counts["transactions"] == Transaction.objects.count() == 200
+    assert counts["ledger_entries"] == LedgerEntry.objects.count()
+    assert counts["rollups"] == DailyWalletRollup.objects.count()
+
+    for wallet in Wallet.objects.all():
+        assert wallet.balance >= 0
+        assert ledger.get_balance(wallet) == pytest.approx(wallet.balance)
+        assert names.is_valid(wallet.name)
+    for transaction in Transaction.objects.select_related("sender", "receiver"):
+        assert transaction.sender.currency == transaction.receiver.currency
+        assert transaction.sender_id != transaction.receiver_id
+
+    generated = get_rollups()
+    rollups.backfill(None, datetime.date.today() + datetime.timedelta(days=1))
+    assert get_rollups() == generated
+
+
+@pytest.mark.django_db
+def test_generated_data_is_repeatable():
+    """Same scale and seed give the same dataset after existing rows"""
+
+    DatasetGenerator(SCALE, seed=1).generate()
+    first = get_history()
+    Wallet.objects.all().delete()
+    User.objects.all().delete()
+
+    DatasetGenerator(SCALE, seed=1).generate()
+    second = get_history()
+    assert [row[1:3] for row in first] == [row[1:3] for row in second]
+
+    DatasetGenerator(SCALE, seed=2).generate()
+    assert Transaction.objects.count() == 400
+
+
+@pytest.mark.django_db
+def test_generated_data_is_usable():
+    """Generated users and wallets work with the services"""
+
+    DatasetGenerator(SCALE, seed=1, currencies=["USD"]).generate()
+    user = User.objects.order_by("id").first()
+    sender, receiver = user.wallet_set.order_by("id")[:2]
+
+    services.create_transaction(
+        user,
+        {"sender": sender, "receiver": receiver, "transfer_amount": Decimal("1")},
+    )
+    wallet = services.create_wallet(user, {"type": "Visa", "currency": "EUR"})
+
+    assert user.check_password("password")
+    assert not Wallet.objects.filter(name=wallet.name).exclude(pk=wallet.pk).exists()
+    assert User.objects.create(email="new@example.com").pk > user.pk
+
+
+@pytest.mark.django_db
+def test_bulk_writer_adapts_values():
+    """Decimals and datetimes are written in the backend representation"""
+
+    user = User.objects.create(email="user1@gmail.com")
+    wallet = Wallet.objects.create(name="W1", type="Visa", currency="USD", owner=user)
+    writer = bulk.BulkWriter(connection, batch_size=2)
+    timestamp = datetime.datetime(2021, 5, 1, 12, tzinfo=datetime.timezone.utc)
+
+    written = writer.write(
+        LedgerEntry,
+        ("id", "wallet_id", "transaction_id", "kind", "amount", "created_on"),
+        [
+            (100 + index, wallet.pk, None, "OPENING", Decimal("1.5"), timestamp)
+            for index in range(3)
+        ],
+    )
+
+    assert written == 3
+    entries = LedgerEntry.objects.filter(wallet=wallet)
+    assert [entry.amount for entry in entries] == [Decimal("1.50")] * 3
+    assert {entry.created_on for entry in entries} == {timestamp}
+
+
+def test_copy_values():
+    """Values are escaped for COPY text format"""
+
+    assert bulk._copy_value(None) == "\\N"
+    assert bulk._copy_value(True) == "t"
+    assert bulk._copy_value("a\tb\\c\n") == "a\\tb\\\\c\\n"
+    assert bulk._copy_value(Decimal("1.50")) == "1.50"
+
+
+@pytest.mark.django_db
+def test_generate_data_command():
+    """Command generates a dataset of the given size"""
+
+    out = StringIO()
+    call_command("generate_data", "--users", "5", "--transactions", "20", stdout=out)
+    assert "5 users, 15 wallets, 20 transactions" in out.getvalue()
+
+    with pytest.raises(CommandError):
+        call_command("generate_data", "--wallets-per-user", "6")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("option", ["--users", "--wallets-per-user", "--batch-size"])
+def test_generate_data_rejects_zero(option):
+    """Explicit zero is rejected instead of replaced with the scale"""
+
+    with pytest.raises(CommandError):
+        call_command("generate_data", option, "0", stdout=StringIO())
+    assert not User.objects.exists()
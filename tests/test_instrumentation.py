@@ -0,0 +1,102 @@
+import re
+
+import pytest
+from django.test import Client
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from app import instrumentation
+from wallets.models import Wallet
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    instrumentation.reset()
+
+
+@pytest.fixture
+def auth_client():
+    user = User.objects.create(email="user1@gmail.com")
+    Wallet.objects.create(
+        name="U1USD1", type="Visa", currency="USD", balance=1000, owner=user
+    )
+    client = APIClient()
+    refresh = RefreshToken.for_user(user)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    return client
+
+
+def parse_server_timing(header):
+    return {
+        metric.split(";")[0]: dict(
+            param.split("=", 1) for param in metric.split(";")[1:]
+        )
+        for metric in header.split(", ")
+    }
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = instrumentation.Histogram("latency", "Latency", ["view"], (1, 2, 5))
+    for value in [0.5, 1, 3, 10]:
+        histogram.observe(("View",), value)
+
+    assert histogram.render() == [
+        "# HELP latency Latency",
+        "# TYPE latency histogram",
+        'latency_bucket{view="View",le="1"} 2',
+        'latency_bucket{view="View",le="2"} 2',
+        'latency_bucket{view="View",le="5"} 3',
+        'latency_bucket{view="View",le="+Inf"} 4',
+        'latency_sum{view="View"} 14.5',
+        'latency_count{view="View"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = instrumentation.Counter("requests", "Requests", ["view"])
+    counter.inc(('a"b\\c',))
+
+    assert counter.render()[-1] == 'requests{view="a\\"b\\\\c"} 1'
+
+
+@pytest.mark.django_db
+def test_server_timing_header(auth_client, count_queries):
+    """Server-Timing counts the queries of the request"""
+
+    responses = []
+    queries = count_queries(lambda: responses.append(auth_client.get("/wallets/")))
+
+    timing = parse_server_timing(responses[0]["Server-Timing"])
+    assert timing["db"]["desc"] == f'"{queries} queries"'
+    assert set(timing) == {"db", "serialization", "total"}
+    assert float(timing["serialization"]["dur"]) > 0
+    assert float(timing["total"]["dur"]) >= float(timing["db"]["dur"])
+
+
+@pytest.mark.django_db
+def test_metrics_per_view(auth_client):
+    auth_client.get("/wallets/")
+    auth_client.get("/wallets/")
+    auth_client.get("/transactions/")
+
+    response = Client().get("/metrics")
+
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain")
+    body = response.content.decode()
+    labels = 'view="WalletListCreateView",method="GET"'
+    assert f"http_request_duration_seconds_count{{{labels}}} 2" in body
+    assert f'http_request_queries_bucket{{{labels},le="+Inf"}} 2' in body
+    assert f'http_responses_total{{{labels},status="200"}} 2' in body
+    assert 'view="TransactionListCreateView",method="GET"' in body
+    assert re.search(r'wallet_cache_requests_total\{result="hits"\} \d+', body)
+
+
+@pytest.mark.django_db
+def test_unmatched_requests():
+    Client().get("/missing/")
+
+    body = Client().get("/metrics").content.decode()
+
+    assert 'http_responses_total{view="unmatched",method="GET",status="404"} 1' in body
@@ -0,0 +1,121 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from accounts.models import User
+from wallets import ledger, services
+from wallets.models import BalanceCheckpoint, LedgerEntry, Wallet
+
+
+@pytest.fixture
+def user1():
+    return User.objects.create(email="user1@gmail.com")
+
+
+@pytest.fixture
+def user2():
+    return User.objects.create(email="user2@gmail.com")
+
+
+@pytest.fixture
+def wallets(user1, user2):
+    sender = services.create_wallet(user1, {"type": "Visa", "currency": "RUB"})
+    receiver = services.create_wallet(user2, {"type": "Visa", "currency": "RUB"})
+    return sender, receiver
+
+
+def transfer(user, sender, receiver, amount):
+    return services.create_transaction(
+        user, {"sender": sender, "receiver": receiver, "transfer_amount": amount}
+    )
+
+
+@pytest.mark.django_db
+def test_transfer_entries(user1, wallets):
+    """Transfer writes debit, credit and fee entries"""
+
+    sender, receiver = wallets
+    transaction = transfer(user1, sender, receiver, 10)
+
+    entries = {
+        (entry.wallet_id, entry.kind): entry.amount
+        for entry in LedgerEntry.objects.filter(transaction=transaction)
+    }
+    assert entries == {
+        (sender.pk, "DEBIT"): -10,
+        (sender.pk, "FEE"): -1,
+        (receiver.pk, "CREDIT"): 10,
+    }
+    for wallet in Wallet.objects.all():
+        assert ledger.get_balance(wallet) == wallet.balance
+
+
+@pytest.mark.django_db
+def test_batch_entries(user1, wallets):
+    """Batch transfers are recorded in the ledger"""
+
+    sender, receiver = wallets
+    services.create_transactions_batch(
+        user1,
+        [
+            {"sender": sender.name, "receiver": receiver.name, "transfer_amount": 10},
+            {"sender": sender.name, "receiver": receiver.name, "transfer_amount": 20},
+        ],
+    )
+
+    assert LedgerEntry.objects.filter(transaction__isnull=False).count() == 6
+    for wallet in Wallet.objects.all():
+        assert ledger.get_balance(wallet) == wallet.balance
+
+
+@pytest.mark.django_db
+def test_balance_from_checkpoint(user1, wallets, django_assert_num_queries):
+    """Balance is checkpoint balance plus entries after it"""
+
+    sender, receiver = wallets
+    transfer(user1, sender, receiver, 10)
+    checkpoint = ledger.create_checkpoint(sender.pk)
+    assert checkpoint.balance == 100 - 11
+    assert ledger.create_checkpoint(sender.pk) is None
+
+    transfer(user1, sender, receiver, 20)
+    sender.refresh_from_db()
+    with django_assert_num_queries(2):
+        assert ledger.get_balance(sender) == sender.balance == 100 - 11 - 22
+
+
+@pytest.mark.django_db
+def test_balance_at(user1, wallets):
+    """Balance at a moment ignores later entries and checkpoints"""
+
+    sender, receiver = wallets
+    transfer(user1, sender, receiver, 10)
+    LedgerEntry.objects.update(created_on=timezone.now() - timedelta(days=2))
+    ledger.create_checkpoint(sender.pk)
+    transfer(user1, sender, receiver, 20)
+    ledger.create_checkpoint(sender.pk)
+
+    assert ledger.get_balance(sender, timezone.now() - timedelta(days=1)) == 89
+    assert ledger.get_balance(sender, timezone.now() - timedelta(days=3)) == 0
+
+
+@pytest.mark.django_db
+def test_checkpoint_balances_command(user1, wallets):
+    """Command checkpoints wallets and reports ledger mismatches"""
+
+    sender, receiver = wallets
+    transfer(user1, sender, receiver, 10)
+
+    out = StringIO()
+    call_command("checkpoint_balances", stdout=out)
+    assert "Created 2 checkpoints" in out.getvalue()
+    assert BalanceCheckpoint.objects.count() == 2
+
+    Wallet.objects.filter(pk=sender.pk).update(balance=1000)
+    transfer(user1, sender, receiver, 10)
+    with pytest.raises(CommandError):
+        call_command("checkpoint_balances", stdout=out, stderr=StringIO())
@@ -0,0 +1,131 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts import authentication
+from accounts.models import User
+from wallets import names
+from wallets.models import Transaction, Wallet
+
+
+@pytest.fixture
+def user():
+    user = User.objects.create(email="user1@gmail.com")
+    for name in ["U1USD1", "U1USD2"]:
+        Wallet.objects.create(
+            name=name, type="Visa", currency="USD", balance=1000, owner=user
+        )
+    return user
+
+
+@pytest.fixture
+def auth_client(user):
+    client = APIClient()
+    refresh = RefreshToken.for_user(user)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    return client
+
+
+def add_transactions(user, count=5):
+    sender, receiver = Wallet.objects.filter(owner=user).order_by("name")
+    Transaction.objects.bulk_create(
+        Transaction(sender=sender, receiver=receiver, transfer_amount=1, status="PAID")
+        for _ in range(count)
+    )
+
+
+def add_wallets(user, count=3):
+    for index in range(count):
+        Wallet.objects.create(
+            name=f"U1EUR{index}", type="Visa", currency="EUR", owner=user
+        )
+
+
+# Queries of every GET view: user, (user wallets for ETag), (wallet lookup),
+# (archive watermark), data
+VIEWS = [
+    ("/wallets/", add_wallets, 2),
+    ("/wallets/U1USD1/", add_wallets, 2),
+    ("/transactions/", add_transactions, 4),
+    ("/transactions/U1USD1/", add_transactions, 5),
+]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("url,add_rows,budget", VIEWS)
+def test_list_views_queries(
+    url, add_rows, budget, user, auth_client, assert_constant_queries
+):
+    """Queries of list and detail views don't depend on number of rows"""
+
+    add_transactions(user)
+
+    def request():
+        # Measure the uncached path
+        cache.clear()
+        authentication.clear_cache()
+        response = auth_client.get(url)
+        assert response.status_code == 200
+
+    assert_constant_queries(request, lambda: add_rows(user), budget)
+
+
+@pytest.mark.django_db
+def test_transaction_detail_queries(user, auth_client, count_queries):
+    """Transaction detail loads wallets with the transaction"""
+
+    add_transactions(user)
+    transaction = Transaction.objects.first()
+
+    def request():
+        response = auth_client.get(f"/transactions/{transaction.id}/")
+        assert response.status_code == 200
+
+    assert count_queries(request) == 2
+
+
+@pytest.mark.django_db
+def test_wallet_create_queries(auth_client, count_queries):
+    """Wallet creation counts wallets, inserts it and its opening entry"""
+
+    def request():
+        response = auth_client.post(
+            "/wallets/", data={"type": "Visa", "currency": "USD"}
+        )
+        assert response.status_code == 201
+
+    # Names come from a block the process has already reserved
+    names.allocator.allocate()
+    # user, count, SAVEPOINT, INSERT wallet, INSERT entry, RELEASE
+    assert count_queries(request) == 6
+
+
+@pytest.mark.django_db
+def test_transaction_batch_queries(
+    user, auth_client, assert_constant_queries, count_queries
+):
+    """Batch transfer runs the same queries for any number of transfers"""
+
+    transfers = [{"sender": "U1USD1", "receiver": "U1USD2", "transfer_amount": "1"}]
+
+    def request():
+        authentication.clear_cache()
+        response = auth_client.post(
+            "/transactions/batch/", data={"transactions": transfers}, format="json"
+        )
+        assert response.status_code == 201
+
+    def add_rows():
+        transfers.extend(transfers * 4)
+
+    if connection.features.can_return_rows_from_bulk_insert:
+        # user, SAVEPOINT, lock, INSERT transactions, INSERT entries,
+        # upsert rollups, UPDATE, RELEASE
+        assert_constant_queries(request, add_rows, 8)
+    else:
+        # Transactions are inserted one by one to get their ids
+        assert count_queries(request) == 8
+        add_rows()
+        assert count_queries(request) == 8 + 4
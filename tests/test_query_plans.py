@@ -0,0 +1,35 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from accounts.models import User
+from wallets.models import Transaction, Wallet
+
+
+@pytest.fixture
+def history():
+    user = User.objects.create(email="user1@gmail.com")
+    sender = Wallet.objects.create(
+        name="U1USD1", type="Visa", currency="USD", balance=100, owner=user
+    )
+    receiver = Wallet.objects.create(
+        name="U1USD2", type="Visa", currency="USD", balance=100, owner=user
+    )
+    Transaction.objects.create(sender=sender, receiver=receiver, transfer_amount=10)
+    return user
+
+
+@pytest.mark.django_db
+def test_history_queries_use_indexes(history):
+    """History queries are served by the ledger indexes"""
+
+    out = StringIO()
+    call_command("explain_history", "user1@gmail.com", "--wallet", "U1USD1", stdout=out)
+    plans = out.getvalue()
+
+    assert "wallet_owner_modified_idx" in plans
+    assert "transaction_sender_id_idx" in plans
+    assert "transaction_receiver_id_idx" in plans
+    assert "archive_sender_id_idx" in plans
+    assert "archive_receiver_id_idx" in plans
@@ -0,0 +1,88 @@
+import json
+import logging
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from accounts.models import User
+from app import querystats
+from wallets import services
+from wallets.models import Wallet
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    querystats.stats.reset()
+
+
+@pytest.mark.parametrize(
+    "sql,expected",
+    [
+        (
+            "SELECT * FROM t WHERE id = %s AND name = 'a''b'",
+            "SELECT * FROM t WHERE id = ? AND name = ?",
+        ),
+        (
+            "SELECT * FROM t WHERE id IN (%s, %s,\n %s)",
+            "SELECT * FROM t WHERE id IN (...)",
+        ),
+        (
+            "INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)",
+            "INSERT INTO t (a, b) VALUES (...)",
+        ),
+        ('SAVEPOINT "s1403_x12"', "SAVEPOINT ?"),
+        ("SELECT * FROM t LIMIT 21 OFFSET 40", "SELECT * FROM t LIMIT ? OFFSET ?"),
+    ],
+)
+def test_fingerprint(sql, expected):
+    assert querystats.fingerprint(sql) == expected
+
+
+@pytest.mark.django_db
+def test_queries_are_recorded():
+    assert querystats.record_query in connection.execute_wrappers
+
+    for pk in [1, 2, 3]:
+        list(Wallet.objects.filter(pk=pk))
+
+    [row] = [
+        row
+        for row in querystats.stats.snapshot()
+        if row["fingerprint"].startswith('SELECT "wallets_wallet"."id"')
+    ]
+    assert row["count"] == 3
+    assert 0 < row["max"] <= row["total"]
+
+
+@pytest.mark.django_db
+def test_slow_queries_are_logged_with_service(settings, caplog):
+    user = User.objects.create(email="user1@gmail.com")
+    settings.SLOW_QUERY_MS = 0
+
+    with caplog.at_level(logging.WARNING, logger="app.querystats"):
+        services.get_user_wallets(user)
+
+    assert "from wallets.services.get_user_wallets:" in caplog.text
+
+
+def test_query_report(tmp_path):
+    querystats.stats.record("SELECT 1", 0.5)
+    querystats.stats.record("SELECT 2", 0.25)
+    querystats.stats.record("SELECT * FROM t", 0.1)
+    querystats.stats.dump(tmp_path)
+    (tmp_path / "2.json").write_text(
+        json.dumps({"pid": 2, "queries": [querystats.stats.snapshot()[-1]]})
+    )
+
+    out = StringIO()
+    call_command("query_report", dir=tmp_path, top=2, json=True, stdout=out)
+
+    rows = json.loads(out.getvalue())
+    assert [(row["fingerprint"], row["count"]) for row in rows] == [
+        ("SELECT ?", 2),
+        ("SELECT * FROM t", 2),
+    ]
+    assert rows[0]["total"] == 0.75
+    assert rows[0]["max"] == 0.5
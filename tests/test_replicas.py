@@ -0,0 +1,117 @@
+import pytest
+from django.core.cache import cache, caches
+from django.db import DEFAULT_DB_ALIAS, router
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from app.db import routers
+from wallets import checks, services
+from wallets.models import Wallet
+
+pytestmark = pytest.mark.django_db(databases=[DEFAULT_DB_ALIAS, "replica"])
+
+
+@pytest.fixture(autouse=True)
+def replica(settings):
+    settings.DATABASE_REPLICAS = ["replica"]
+    settings.REPLICA_PIN_SECONDS = 60
+
+
+@pytest.fixture
+def user():
+    """User in both databases, with a wallet the replica doesn't have yet"""
+    user = User.objects.create(email="user1@gmail.com")
+    User.objects.using("replica").create(pk=user.pk, email=user.email)
+    Wallet.objects.create(
+        name="U1USD1", type="Visa", currency="USD", balance=100, owner=user
+    )
+    return user
+
+
+def test_reads_go_to_replica(user):
+    assert services.get_user_wallets(user) == []
+    assert services.get_user_wallet_rows(user) == []
+    history = services.get_user_transactions(user)
+    assert history.hot.db == history.archive.db == "replica"
+
+
+def test_reads_go_to_primary_without_replicas(user, settings):
+    settings.DATABASE_REPLICAS = []
+
+    assert [wallet.name for wallet in services.get_user_wallets(user)] == ["U1USD1"]
+    assert services.get_user_transactions(user).hot.db == DEFAULT_DB_ALIAS
+
+
+def test_users_are_pinned_to_primary_after_writes(user):
+    services.create_wallet(user, {"type": "Visa", "currency": "EUR"})
+
+    wallets = services.get_user_wallets(user)
+    assert len(wallets) == 2
+    assert services.get_user_transactions(user).hot.db == DEFAULT_DB_ALIAS
+
+    # The pin expires with the cached wallets
+    cache.clear()
+    assert services.get_user_wallets(user) == []
+
+
+def test_receivers_are_pinned(user):
+    receiver = User.objects.create(email="user2@gmail.com")
+    wallet = Wallet.objects.create(
+        name="U2USD1", type="Visa", currency="USD", balance=0, owner=receiver
+    )
+    sender = Wallet.objects.get(name="U1USD1")
+
+    services.create_transaction(
+        user, {"sender": sender, "receiver": wallet, "transfer_amount": 10}
+    )
+
+    assert cache.get(routers.pin_key(receiver.pk))
+
+
+def test_pins_reach_other_processes(user, settings, tmp_path, monkeypatch):
+    """Users pinned by the queue worker read from the primary in web workers"""
+
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(tmp_path),
+        }
+    }
+    # The worker has its own instance of the cache
+    monkeypatch.setattr(routers, "cache", caches.create_connection("default"))
+    routers.pin_to_primary([user.pk])
+    monkeypatch.undo()
+
+    assert routers.get_read_db(user.pk) == DEFAULT_DB_ALIAS
+    assert [wallet.name for wallet in services.get_user_wallets(user)] == ["U1USD1"]
+
+
+def test_replicas_need_shared_cache(settings, tmp_path):
+    assert [error.id for error in checks.check_replica_pins(None)] == ["wallets.E002"]
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(tmp_path),
+        }
+    }
+    assert checks.check_replica_pins(None) == []
+
+
+def test_writes_go_to_primary(user):
+    replica_user = User.objects.using("replica").get(pk=user.pk)
+
+    assert router.db_for_write(User, instance=replica_user) == DEFAULT_DB_ALIAS
+    assert router.allow_relation(replica_user, Wallet.objects.first())
+
+
+def test_views_read_from_replica(user):
+    client = APIClient()
+    refresh = RefreshToken.for_user(user)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+    assert client.get("/wallets/").json() == []
+
+    response = client.post("/wallets/", data={"type": "Visa", "currency": "USD"})
+    assert response.status_code == 201
+    assert len(client.get("/wallets/").json()) == 2
@@ -0,0 +1,148 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from wallets import services
+from wallets.models import DailyWalletRollup, Transaction
+
+
+@pytest.fixture
+def user1():
+    return User.objects.create(email="user1@gmail.com")
+
+
+@pytest.fixture
+def user2():
+    return User.objects.create(email="user2@gmail.com")
+
+
+@pytest.fixture
+def wallets(user1, user2):
+    sender = services.create_wallet(user1, {"type": "Visa", "currency": "RUB"})
+    receiver = services.create_wallet(user2, {"type": "Visa", "currency": "RUB"})
+    return sender, receiver
+
+
+@pytest.fixture
+def auth_client1(user1):
+    client = APIClient()
+    refresh = RefreshToken.for_user(user1)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    return client
+
+
+def transfer(user, sender, receiver, amount):
+    return services.create_transaction(
+        user, {"sender": sender, "receiver": receiver, "transfer_amount": amount}
+    )
+
+
+def get_rollups():
+    return {
+        rollup.wallet_id: (
+            rollup.inflow,
+            rollup.outflow,
+            rollup.fees,
+            rollup.incoming_count,
+            rollup.outgoing_count,
+        )
+        for rollup in DailyWalletRollup.objects.all()
+    }
+
+
+@pytest.mark.django_db
+def test_transfers_update_rollups(user1, wallets):
+    """Transfers of a day are added to one rollup row per wallet"""
+
+    sender, receiver = wallets
+    transfer(user1, sender, receiver, Decimal("10"))
+    transfer(user1, sender, receiver, Decimal("2.50"))
+
+    assert DailyWalletRollup.objects.count() == 2
+    assert get_rollups() == {
+        sender.pk: (0, Decimal("12.50"), Decimal("1.25"), 0, 2),
+        receiver.pk: (Decimal("12.50"), 0, 0, 2, 0),
+    }
+
+
+@pytest.mark.django_db
+def test_batch_updates_rollups(user1, wallets):
+    """Batch transfers are aggregated before the upsert"""
+
+    sender, receiver = wallets
+    transfers = [
+        {"sender": sender.name, "receiver": receiver.name, "transfer_amount": amount}
+        for amount in (Decimal("1"), Decimal("2"), Decimal("3"))
+    ]
+    services.create_transactions_batch(user1, transfers)
+
+    assert get_rollups() == {
+        sender.pk: (0, Decimal("6"), Decimal("0.60"), 0, 3),
+        receiver.pk: (Decimal("6"), 0, 0, 3, 0),
+    }
+
+
+@pytest.mark.django_db
+def test_backfill_rollups(user1, wallets):
+    """Backfill rebuilds rollups from transactions of the range"""
+
+    sender, receiver = wallets
+    transfer(user1, sender, receiver, Decimal("10"))
+    yesterday = timezone.now() - timedelta(days=1)
+    Transaction.objects.update(timestamp=yesterday)
+    expected = get_rollups()
+    DailyWalletRollup.objects.all().delete()
+
+    call_command("backfill_rollups")
+
+    assert get_rollups() == expected
+    assert set(DailyWalletRollup.objects.values_list("day", flat=True)) == {
+        timezone.localdate(yesterday)
+    }
+
+
+@pytest.mark.django_db
+def test_rollups_view(auth_client1, user1, wallets):
+    """Rollups of wallet are listed by day"""
+
+    sender, receiver = wallets
+    transfer(user1, sender, receiver, Decimal("10"))
+
+    response = auth_client1.get(f"/wallets/{sender.name}/rollups/")
+    assert response.status_code == 200
+    assert response.data == [
+        {
+            "day": timezone.localdate().isoformat(),
+            "inflow": "0.00",
+            "outflow": "10.00",
+            "fees": "1.00",
+            "incoming_count": 0,
+            "outgoing_count": 1,
+        }
+    ]
+
+    yesterday = timezone.localdate() - timedelta(days=1)
+    response = auth_client1.get(
+        f"/wallets/{sender.name}/rollups/", {"end": yesterday.isoformat()}
+    )
+    assert response.data == []
+
+
+@pytest.mark.django_db
+def test_rollups_view_errors(auth_client1, wallets):
+    """Invalid ranges and wallets of other users are rejected"""
+
+    sender, receiver = wallets
+    response = auth_client1.get(
+        f"/wallets/{sender.name}/rollups/", {"start": "2021-02-01", "end": "2021-01-01"}
+    )
+    assert response.status_code == 400
+
+    response = auth_client1.get(f"/wallets/{receiver.name}/rollups/")
+    assert response.status_code == 404
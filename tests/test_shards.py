@@ -0,0 +1,187 @@
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from wallets import ledger, services, shards
+from wallets.models import (BalanceShard, BalanceShardRollup,
+                            DailyWalletRollup, Wallet)
+
+
+@pytest.fixture
+def user():
+    return User.objects.create(email="user1@gmail.com")
+
+
+@pytest.fixture
+def merchant():
+    return User.objects.create(email="merchant@gmail.com")
+
+
+@pytest.fixture
+def wallets(user, merchant):
+    """Wallet of user and a wallet of merchant on 4 shards, 100 on each"""
+    sender = services.create_wallet(user, {"type": "Visa", "currency": "RUB"})
+    receiver = services.create_wallet(merchant, {"type": "Visa", "currency": "RUB"})
+    shards.set_shards(receiver.pk, 4)
+    receiver.refresh_from_db()
+    return sender, receiver
+
+
+@pytest.fixture
+def merchant_client(merchant):
+    client = APIClient()
+    refresh = RefreshToken.for_user(merchant)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    return client
+
+
+def transfer(user, sender, receiver, amount):
+    return services.create_transaction(
+        user,
+        {"sender": sender, "receiver": receiver, "transfer_amount": Decimal(amount)},
+    )
+
+
+@pytest.mark.django_db
+def test_credits_go_to_shards(user, wallets):
+    sender, receiver = wallets
+    row = Wallet.objects.values("balance", "modified_on").get(pk=receiver.pk)
+
+    for _ in range(5):
+        transfer(user, sender, receiver, "10")
+
+    assert Wallet.objects.values("balance", "modified_on").get(pk=receiver.pk) == row
+    assert BalanceShard.objects.filter(wallet=receiver).count() == 4
+    assert sum(shard.balance for shard in receiver.shards.all()) == 50
+    assert services.get_specific_wallet(receiver.name).balance == 150
+    assert Wallet.objects.get(pk=sender.pk).balance < 50
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("fast", [True, False])
+def test_api_reports_balance_with_shards(
+    user, wallets, merchant_client, settings, fast
+):
+    settings.FAST_LIST_SERIALIZATION = fast
+    sender, receiver = wallets
+    detail = merchant_client.get(f"/wallets/{receiver.name}/")
+
+    transfer(user, sender, receiver, "10")
+
+    response = merchant_client.get(f"/wallets/{receiver.name}/")
+    assert response.data["balance"] == "110.00"
+    assert "balance_shards" not in response.data
+    assert response["ETag"] != detail["ETag"]
+    response = merchant_client.get("/wallets/")
+    assert response.json()[0]["balance"] == "110.00"
+
+
+@pytest.mark.django_db
+def test_sharded_wallet_spends_its_shards(user, merchant, wallets):
+    sender, receiver = wallets
+    transfer(user, sender, receiver, "50")
+
+    # More than the wallet row has, less than with the shards
+    transfer(merchant, services.get_specific_wallet(receiver.name), sender, "120")
+
+    row = Wallet.objects.get(pk=receiver.pk).balance
+    assert row < 0
+    assert services.get_specific_wallet(receiver.name).balance == row + 50
+
+
+@pytest.mark.django_db
+def test_batch_credits_shards(user, wallets):
+    sender, receiver = wallets
+    transfers = [
+        {"sender": sender.name, "receiver": receiver.name, "transfer_amount": 10}
+    ] * 3
+
+    results = services.create_transactions_batch(user, transfers)
+
+    assert [result["status"] for result in results] == ["PAID"] * 3
+    assert Wallet.objects.get(pk=receiver.pk).balance == 100
+    assert services.get_specific_wallet(receiver.name).balance == 130
+
+
+@pytest.mark.django_db
+def test_fold_keeps_reported_balance(user, wallets):
+    sender, receiver = wallets
+    transfer(user, sender, receiver, "10")
+    before = services.get_specific_wallet(receiver.name)
+    out = StringIO()
+
+    call_command("fold_balance_shards", stdout=out)
+
+    assert out.getvalue().strip() == "Folded shards of 1 wallets"
+    assert Wallet.objects.get(pk=receiver.pk).balance == 110
+    assert not BalanceShard.objects.exclude(balance=0).exists()
+    after = services.get_specific_wallet(receiver.name)
+    assert (after.balance, after.modified_on) == (before.balance, before.modified_on)
+
+
+@pytest.mark.django_db
+def test_turning_sharding_off_folds(user, wallets):
+    sender, receiver = wallets
+    transfer(user, sender, receiver, "10")
+
+    call_command("set_balance_shards", receiver.name, "0", stdout=StringIO())
+
+    wallet = Wallet.objects.get(pk=receiver.pk)
+    assert (wallet.balance, wallet.balance_shards) == (110, 0)
+    transfer(user, sender, wallet, "10")
+    assert Wallet.objects.get(pk=receiver.pk).balance == 120
+
+
+@pytest.mark.django_db
+def test_checkpoint_includes_shards(user, wallets):
+    sender, receiver = wallets
+    transfer(user, sender, receiver, "10")
+
+    checkpoint = ledger.create_checkpoint(receiver.pk)
+
+    assert checkpoint.balance == checkpoint.wallet.balance == 110
+
+
+@pytest.mark.django_db
+def test_credits_keep_rollups_on_shards(user, wallets, merchant_client):
+    sender, receiver = wallets
+    transfer(user, sender, receiver, "10")
+    services.create_transactions_batch(
+        user, [{"sender": sender.name, "receiver": receiver.name, "transfer_amount": 5}]
+    )
+
+    assert not DailyWalletRollup.objects.filter(wallet=receiver).exists()
+    assert BalanceShardRollup.objects.filter(shard__wallet=receiver).exists()
+    response = merchant_client.get(f"/wallets/{receiver.name}/rollups/")
+    assert response.status_code == 200
+    assert [(day["inflow"], day["incoming_count"]) for day in response.data] == [
+        ("15.00", 2)
+    ]
+
+    call_command("fold_balance_shards", stdout=StringIO())
+
+    assert not BalanceShardRollup.objects.exists()
+    rollup = DailyWalletRollup.objects.get(wallet=receiver)
+    assert (rollup.inflow, rollup.incoming_count) == (15, 2)
+    assert merchant_client.get(f"/wallets/{receiver.name}/rollups/").data == (
+        response.data
+    )
+
+
+@pytest.mark.django_db
+def test_backfill_replaces_shard_rollups(user, wallets):
+    sender, receiver = wallets
+    transfer(user, sender, receiver, "10")
+
+    today = timezone.localdate().isoformat()
+    call_command("backfill_rollups", "--until", today, stdout=StringIO())
+
+    assert not BalanceShardRollup.objects.exists()
+    rollup = DailyWalletRollup.objects.get(wallet=receiver)
+    assert (rollup.inflow, rollup.incoming_count) == (10, 1)
@@ -1,9 +1,20 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
 import pytest
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from accounts.models import User
-from wallets.models import DEFAULT_COMMISSION, Transaction, Wallet
+from wallets import services
+from wallets.models import (DEFAULT_COMMISSION, IdempotencyKey, Transaction,
+                            Wallet)
 from wallets.serializers import TransactionSerializer, WalletSerializer
 
 
@@ -182,6 +193,30 @@ class TestTransactionApi:
         )
         assert response.status_code == 400
 
+    @pytest.mark.django_db
+    @pytest.mark.parametrize("amount", ["-50.00", "0.00"])
+    def test_transaction_create_non_positive_amount(self, auth_client1, user1, amount):
+        """Transfers can't move money from the receiver to the sender"""
+
+        response = auth_client1.post(
+            "/transactions/",
+            data={"receiver": "U1RUS2", "sender": "U1RUS1", "transfer_amount": amount},
+        )
+        assert response.status_code == 400
+        assert Wallet.objects.get(name="U1RUS1").balance == 100
+        assert Wallet.objects.get(name="U1RUS2").balance == 100
+
+        with pytest.raises(ValidationError):
+            services.create_transaction(
+                user1,
+                {
+                    "sender": Wallet.objects.get(name="U1RUS1"),
+                    "receiver": Wallet.objects.get(name="U1RUS2"),
+                    "transfer_amount": Decimal(amount),
+                },
+            )
+        assert Wallet.objects.get(name="U1RUS1").balance == 100
+
     @pytest.mark.django_db
     def test_transaction_create_fee_check(self, auth_client1, auth_client2):
         """Testing balances after transaction and fee calculation"""
@@ -223,7 +258,7 @@ class TestTransactionApi:
         assert response.status_code == 401
 
         response = auth_client1.get("/transactions/")
-        transactions = response.json()
+        transactions = response.json()["results"]
         assert response.status_code == 200
 
         user_wallets = user1.wallet_set.all()
@@ -308,7 +343,7 @@ class TestTransactionOfWalletApi:
         assert response.status_code == 401
 
         response = auth_client1.get(f"/transactions/{user1_wallet_name}/")
-        response_transactions = response.json()
+        response_transactions = response.json()["results"]
         assert response.status_code == 200
 
         user1_wallet = Wallet.objects.get(name=user1_wallet_name)
@@ -349,3 +384,352 @@ class TestTransactionOfWalletApi:
 
         response = auth_client1.post(f"/transactions/{wallet}/")
         assert response.status_code == 405
+
+
+class TestTransactionPagination:
+    """Test cursor pagination of transaction history"""
+
+    @pytest.mark.django_db
+    def test_transaction_pages(self, auth_client1, create_transactions):
+        """Walking the cursor returns every transaction once, newest first"""
+
+        user1_transactions = Transaction.objects.filter(
+            Q(sender__owner__email="user1@gmail.com")
+            | Q(receiver__owner__email="user1@gmail.com")
+        )
+        expected_ids = list(
+            user1_transactions.order_by("-id").values_list("id", flat=True)
+        )
+
+        received_ids = []
+        url = "/transactions/?page_size=2"
+        while url:
+            response = auth_client1.get(url)
+            assert response.status_code == 200
+            body = response.json()
+            assert len(body["results"]) <= 2
+            received_ids += [transaction["id"] for transaction in body["results"]]
+            url = body["next"]
+
+        assert received_ids == expected_ids
+
+    @pytest.mark.django_db
+    def test_wallet_transaction_pages(self, auth_client2, create_transactions):
+        """Wallet history is paginated with the same cursor"""
+
+        response = auth_client2.get("/transactions/U2USD1/?page_size=1")
+        body = response.json()
+        assert response.status_code == 200
+        assert len(body["results"]) == 1
+        assert body["next"] is not None
+
+        response = auth_client2.get(body["next"])
+        body = response.json()
+        assert len(body["results"]) == 1
+        assert body["next"] is None
+
+    @pytest.mark.django_db
+    def test_transaction_invalid_cursor(self, auth_client1):
+        """Broken cursor is reported as not found"""
+
+        response = auth_client1.get("/transactions/?cursor=broken")
+        assert response.status_code == 404
+
+
+class TestCreateTransactionService:
+    """Test balance updates of services.create_transaction"""
+
+    @pytest.mark.django_db
+    def test_stale_wallets_do_not_lose_updates(self, user1):
+        """Balances are changed relative to the locked rows, not to stale copies"""
+
+        sender = Wallet.objects.get(name="U1RUS1")
+        receiver = Wallet.objects.get(name="U1RUS2")
+        data = {"sender": sender, "receiver": receiver, "transfer_amount": 10}
+
+        services.create_transaction(user1, data)
+        services.create_transaction(user1, data)
+
+        assert Wallet.objects.get(name="U1RUS1").balance == 80
+        assert Wallet.objects.get(name="U1RUS2").balance == 120
+
+    @pytest.mark.django_db
+    def test_balance_is_checked_under_lock(self, user1):
+        """Transfer fails if funds were spent after validation"""
+
+        sender = Wallet.objects.get(name="U1RUS1")
+        receiver = Wallet.objects.get(name="U1RUS2")
+        Wallet.objects.filter(pk=sender.pk).update(balance=5)
+
+        with pytest.raises(ValidationError):
+            services.create_transaction(
+                user1, {"sender": sender, "receiver": receiver, "transfer_amount": 10}
+            )
+
+        assert Wallet.objects.get(name="U1RUS1").balance == 5
+        assert Wallet.objects.get(name="U1RUS2").balance == 100
+        assert not Transaction.objects.exists()
+
+
+class TestTransactionBatchApi:
+    """Test /transactions/batch/"""
+
+    @pytest.mark.django_db
+    def test_batch_create(self, auth_client1, user2):
+        """Valid transfers are executed, invalid ones reported by index"""
+
+        transfers = [
+            {"sender": "U1USD1", "receiver": "U2USD1", "transfer_amount": "10"},
+            {"sender": "U1USD1", "receiver": "NoWallet", "transfer_amount": "10"},
+            {"sender": "U2USD1", "receiver": "U1USD1", "transfer_amount": "10"},
+            {"sender": "U1USD1", "receiver": "U1EUR1", "transfer_amount": "10"},
+            {"sender": "U1USD1", "receiver": "U2USD2", "transfer_amount": "70"},
+            {"sender": "U1USD1", "receiver": "U2USD2", "transfer_amount": "80"},
+        ]
+        response = auth_client1.post(
+            "/transactions/batch/", data={"transactions": transfers}, format="json"
+        )
+        results = response.json()
+        assert response.status_code == 201
+        assert [result["status"] for result in results] == [
+            "PAID",
+            "FAILED",
+            "FAILED",
+            "FAILED",
+            "PAID",
+            "FAILED",
+        ]
+        assert results[1]["error"] == "Receiver wallet doesn't exist"
+        assert results[2]["error"] == "You have no wallet: U2USD1"
+        assert results[3]["error"] == "Currencies of wallets are not equal"
+        assert results[5]["error"] == (
+            "Sender wallet doesn't have enough funds for transaction"
+        )
+
+        assert Wallet.objects.get(name="U1USD1").balance == 100 - 11 - 77
+        assert Wallet.objects.get(name="U2USD1").balance == 110
+        assert Wallet.objects.get(name="U2USD2").balance == 170
+        assert Transaction.objects.filter(status="PAID").count() == 2
+
+    @pytest.mark.django_db
+    def test_batch_all_failed(self, auth_client1):
+        """Batch without any executed transfer is a bad request"""
+
+        transfers = [
+            {"sender": "U1RUS1", "receiver": "U1RUS2", "transfer_amount": "1000"},
+        ]
+        response = auth_client1.post(
+            "/transactions/batch/", data={"transactions": transfers}, format="json"
+        )
+        assert response.status_code == 400
+        assert response.json()[0]["status"] == "FAILED"
+        assert Wallet.objects.get(name="U1RUS1").balance == 100
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize("amount", ["-50.00", "0.00"])
+    def test_batch_rejects_non_positive_amount(
+        self, auth_client1, user1, user2, amount
+    ):
+        """Transfers can't move money from the receiver to the sender"""
+
+        transfers = [
+            {"sender": "U1USD1", "receiver": "U2USD1", "transfer_amount": amount},
+        ]
+        response = auth_client1.post(
+            "/transactions/batch/", data={"transactions": transfers}, format="json"
+        )
+        assert response.status_code == 400
+        assert Wallet.objects.get(name="U1USD1").balance == 100
+        assert Wallet.objects.get(name="U2USD1").balance == 100
+
+        transfers[0]["transfer_amount"] = Decimal(amount)
+        results = services.create_transactions_batch(user1, transfers)
+        assert results[0]["error"] == "Transfer amount must be positive"
+        assert Wallet.objects.get(name="U1USD1").balance == 100
+
+    @pytest.mark.django_db
+    def test_batch_invalid(self, auth_client1):
+        """Empty and malformed batches are rejected"""
+
+        unauth_client = APIClient()
+        response = unauth_client.post("/transactions/batch/")
+        assert response.status_code == 401
+
+        response = auth_client1.post(
+            "/transactions/batch/", data={"transactions": []}, format="json"
+        )
+        assert response.status_code == 400
+
+        response = auth_client1.post(
+            "/transactions/batch/",
+            data={"transactions": [{"sender": "U1RUS1"}]},
+            format="json",
+        )
+        assert response.status_code == 400
+
+
+class TestTransactionQueries:
+    """Query budget of transfer creation"""
+
+    @pytest.mark.django_db
+    def test_transaction_create_queries(
+        self, auth_client1, user2, django_assert_num_queries
+    ):
+        """Transfer authenticates, loads both wallets, locks, inserts and updates"""
+
+        # user, wallets, SAVEPOINT, SELECT FOR UPDATE, INSERT transaction,
+        # INSERT ledger entries, upsert rollups, UPDATE, RELEASE
+        with django_assert_num_queries(9):
+            response = auth_client1.post(
+                "/transactions/",
+                data={"receiver": "U2USD1", "sender": "U1USD1", "transfer_amount": 10},
+            )
+        assert response.status_code == 201
+
+    @pytest.mark.django_db
+    def test_transaction_create_failed_queries(
+        self, auth_client1, django_assert_num_queries
+    ):
+        """Failed validation stops after loading the wallets"""
+
+        with django_assert_num_queries(2):
+            response = auth_client1.post(
+                "/transactions/",
+                data={"receiver": "U1USD1", "sender": "U1RUS1", "transfer_amount": 10},
+            )
+        assert response.status_code == 400
+
+
+class TestTransactionExportApi:
+    """Test /transactions/<wallet_name>/export/<format>/"""
+
+    @pytest.mark.django_db
+    def test_export_csv(self, auth_client1, create_transactions):
+        """Wallet history is streamed as CSV"""
+
+        response = auth_client1.get("/transactions/U1RUS1/export/csv/")
+        assert response.status_code == 200
+        assert response.streaming
+        assert response["Content-Type"] == "text/csv"
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        assert lines[0] == (
+            "id,sender,receiver,transfer_amount,commission,status,timestamp"
+        )
+        assert len(lines) == 2
+        assert lines[1].split(",")[1:4] == ["U1RUS1", "U2RUS1", "10.00"]
+
+    @pytest.mark.django_db
+    def test_export_ndjson(self, auth_client2, create_transactions):
+        """Wallet history is streamed as NDJSON"""
+
+        response = auth_client2.get("/transactions/U2USD1/export/ndjson/")
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/x-ndjson"
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        assert [(row["sender"], row["receiver"]) for row in rows] == [
+            ("U2USD1", "U1USD1"),
+            ("U2USD1", "U2USD2"),
+        ]
+        assert rows[0]["transfer_amount"] == "10.00"
+
+    @pytest.mark.django_db
+    def test_export_not_found(self, auth_client1, create_transactions):
+        """Unknown format and wallets of other users are not found"""
+
+        response = auth_client1.get("/transactions/U1RUS1/export/xml/")
+        assert response.status_code == 404
+
+        response = auth_client1.get("/transactions/U2RUS1/export/csv/")
+        assert response.status_code == 404
+
+
+class TestTransactionIdempotency:
+    """Test Idempotency-Key header of POST /transactions/"""
+
+    data = {"receiver": "U2USD1", "sender": "U1USD1", "transfer_amount": 10}
+
+    @pytest.mark.django_db
+    def test_retry_replays_response(
+        self, auth_client1, user2, django_assert_num_queries
+    ):
+        """Retry with the same key returns the first response and pays once"""
+
+        response = auth_client1.post(
+            "/transactions/", data=self.data, HTTP_IDEMPOTENCY_KEY="key-1"
+        )
+        assert response.status_code == 201
+        first = response.json()
+
+        # User is already authenticated, only the key is looked up
+        with django_assert_num_queries(1):
+            response = auth_client1.post(
+                "/transactions/", data=self.data, HTTP_IDEMPOTENCY_KEY="key-1"
+            )
+        assert response.status_code == 201
+        assert response.json() == first
+        assert Transaction.objects.count() == 1
+        assert Wallet.objects.get(name="U1USD1").balance == 89
+
+        response = auth_client1.post(
+            "/transactions/", data=self.data, HTTP_IDEMPOTENCY_KEY="key-2"
+        )
+        assert response.json()["id"] != first["id"]
+        assert Wallet.objects.get(name="U1USD1").balance == 78
+
+    @pytest.mark.django_db
+    def test_concurrent_retry(self, user1, user2):
+        """Retry committed by another request is returned instead of paying twice"""
+
+        data = {
+            "sender": Wallet.objects.get(name="U1USD1"),
+            "receiver": Wallet.objects.get(name="U2USD1"),
+            "transfer_amount": 10,
+        }
+        first = services.create_transaction(user1, data, "key-1")
+        second = services.create_transaction(user1, data, "key-1")
+
+        assert second.pk == first.pk
+        assert Transaction.objects.count() == 1
+        assert Wallet.objects.get(name="U1USD1").balance == 89
+
+    @pytest.mark.django_db
+    def test_keys_are_per_user(self, auth_client1, auth_client2):
+        """Same key of different users doesn't replay"""
+
+        auth_client1.post(
+            "/transactions/", data=self.data, HTTP_IDEMPOTENCY_KEY="key-1"
+        )
+        response = auth_client2.post(
+            "/transactions/",
+            data={"receiver": "U1USD1", "sender": "U2USD1", "transfer_amount": 10},
+            HTTP_IDEMPOTENCY_KEY="key-1",
+        )
+        assert response.status_code == 201
+        assert Transaction.objects.count() == 2
+
+    @pytest.mark.django_db
+    def test_invalid_key(self, auth_client1):
+        """Too long key is rejected"""
+
+        response = auth_client1.post(
+            "/transactions/", data=self.data, HTTP_IDEMPOTENCY_KEY="k" * 65
+        )
+        assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_purge_keys(self, auth_client1, user2):
+        """Expired keys are purged in batches"""
+
+        for key in ["key-1", "key-2", "key-3"]:
+            auth_client1.post(
+                "/transactions/", data=self.data, HTTP_IDEMPOTENCY_KEY=key
+            )
+        IdempotencyKey.objects.exclude(key="key-3").update(
+            created_on=timezone.now() - timedelta(days=2)
+        )
+
+        call_command("purge_idempotency_keys", "--batch-size", "1", stdout=StringIO())
+        assert list(IdempotencyKey.objects.values_list("key", flat=True)) == ["key-3"]
@@ -0,0 +1,165 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db.models import QuerySet
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from wallets import services
+from wallets.models import Transaction, TransferRequest, Wallet
+
+
+@pytest.fixture(autouse=True)
+def async_transfers(settings):
+    settings.ASYNC_TRANSFERS = 1
+
+
+@pytest.fixture
+def user():
+    return User.objects.create(email="user1@gmail.com")
+
+
+@pytest.fixture
+def wallets(user):
+    """Two RUB wallets of user with 100 on each"""
+    return [
+        services.create_wallet(user, {"type": "Visa", "currency": "RUB"})
+        for _ in range(2)
+    ]
+
+
+@pytest.fixture
+def auth_client(user):
+    client = APIClient()
+    refresh = RefreshToken.for_user(user)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    return client
+
+
+def post_transfer(client, sender, receiver, amount, **headers):
+    return client.post(
+        "/transactions/",
+        {"sender": sender.name, "receiver": receiver.name, "transfer_amount": amount},
+        format="json",
+        **headers,
+    )
+
+
+@pytest.mark.django_db
+def test_transfer_is_queued_and_processed(auth_client, wallets):
+    sender, receiver = wallets
+    response = post_transfer(auth_client, sender, receiver, 10)
+
+    assert response.status_code == 202
+    assert response.data["status"] == "QUEUED"
+    assert response["Location"].endswith(
+        f"/transactions/requests/{response.data['id']}/"
+    )
+    assert not Transaction.objects.exists()
+
+    assert services.process_transfer_requests(batch_size=10) == 1
+
+    response = auth_client.get(response["Location"])
+    assert response.status_code == 200
+    assert response.data["status"] == "PAID"
+    assert response.data["processed_on"] is not None
+    transaction = Transaction.objects.get()
+    assert response.data["transaction"] == transaction.id
+    assert Wallet.objects.get(pk=receiver.pk).balance == 110
+
+
+@pytest.mark.django_db
+def test_queued_transfer_is_validated(auth_client, wallets):
+    sender, receiver = wallets
+    response = post_transfer(auth_client, sender, receiver, 1000)
+
+    assert response.status_code == 400
+    assert not TransferRequest.objects.exists()
+
+
+@pytest.mark.django_db
+def test_idempotency_key_returns_queued_transfer(auth_client, wallets):
+    sender, receiver = wallets
+    first = post_transfer(auth_client, sender, receiver, 10, HTTP_IDEMPOTENCY_KEY="k")
+    retry = post_transfer(auth_client, sender, receiver, 10, HTTP_IDEMPOTENCY_KEY="k")
+
+    assert retry.status_code == 202
+    assert retry.data["id"] == first.data["id"]
+    assert TransferRequest.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_status_of_other_user_is_not_found(auth_client, wallets):
+    sender, receiver = wallets
+    other = User.objects.create(email="user2@gmail.com")
+    request = TransferRequest.objects.create(
+        user=other, sender=sender.name, receiver=receiver.name, transfer_amount=1
+    )
+
+    response = auth_client.get(f"/transactions/requests/{request.id}/")
+
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_batch_runs_transfers_in_queue_order(user, wallets):
+    sender, receiver = wallets
+    for amount in [60, 60, 30]:
+        services.enqueue_transfer(
+            user, {"sender": sender, "receiver": receiver, "transfer_amount": amount}
+        )
+
+    assert services.process_transfer_requests(batch_size=10) == 3
+
+    requests = list(TransferRequest.objects.order_by("id"))
+    assert [request.status for request in requests] == ["PAID", "FAILED", "PAID"]
+    assert requests[1].error == (
+        "Sender wallet doesn't have enough funds for transaction"
+    )
+    assert requests[1].transaction_id is None
+    assert Wallet.objects.get(pk=sender.pk).balance == 10
+    assert services.process_transfer_requests(batch_size=10) == 0
+
+
+@pytest.mark.django_db
+def test_newer_transfer_waits_for_older_one_of_another_worker(
+    user, wallets, monkeypatch
+):
+    sender, receiver = wallets
+    data = {"sender": sender, "receiver": receiver, "transfer_amount": 1}
+    older = services.enqueue_transfer(user, data)
+    newer = services.enqueue_transfer(user, data)
+    other = services.enqueue_transfer(user, {**data, "sender": receiver})
+
+    # Another worker has locked the older request
+    select_for_update = QuerySet.select_for_update
+
+    def skip_locked(queryset, **kwargs):
+        queryset = select_for_update(queryset, **kwargs)
+        if queryset.model is TransferRequest:
+            queryset = queryset.exclude(id=older.id)
+        return queryset
+
+    monkeypatch.setattr(QuerySet, "select_for_update", skip_locked)
+
+    assert services.process_transfer_requests(batch_size=10) == 1
+    statuses = dict(TransferRequest.objects.values_list("id", "status"))
+    assert statuses == {older.id: "QUEUED", newer.id: "QUEUED", other.id: "PAID"}
+
+
+@pytest.mark.django_db
+def test_process_transfers_command(user, wallets):
+    sender, receiver = wallets
+    for _ in range(5):
+        services.enqueue_transfer(
+            user, {"sender": sender, "receiver": receiver, "transfer_amount": 1}
+        )
+    out = StringIO()
+
+    call_command("process_transfers", "--once", "--batch-size", "2", stdout=out)
+
+    assert out.getvalue().strip() == "Processed 5 transfers"
+    assert not TransferRequest.objects.filter(status="QUEUED").exists()
+    assert Transaction.objects.count() == 5
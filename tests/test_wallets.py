@@ -1,9 +1,16 @@
+import threading
+import time
+
 import pytest
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.http import Http404
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from accounts.models import User
+from wallets import caching, checks, services
 from wallets.models import BONUSES, MAX_NUMBER_OF_WALLETS, Wallet
 
 
@@ -157,3 +164,187 @@ class TestWalletDetailApi:
 
         response = auth_client.patch("/wallets/FBH7ESKD/")
         assert response.status_code == 405
+
+
+@pytest.mark.django_db
+def test_create_wallet_skips_taken_names(user, monkeypatch):
+    """Allocated names taken by older wallets are skipped"""
+
+    Wallet.objects.create(name="U1USD1", type="Visa", currency="USD", owner=user)
+    allocated = iter(["U1USD1", "U1USD1", "U1USD2"])
+    monkeypatch.setattr(Wallet, "create_wallet_name", lambda: next(allocated))
+
+    wallet = services.create_wallet(user, {"type": "Visa", "currency": "USD"})
+
+    assert wallet.name == "U1USD2"
+    assert Wallet.objects.filter(owner=user).count() == 2
+
+
+@pytest.mark.django_db
+def test_create_wallet_gives_up_on_taken_names(user, monkeypatch):
+    Wallet.objects.create(name="U1USD1", type="Visa", currency="USD", owner=user)
+    monkeypatch.setattr(Wallet, "create_wallet_name", lambda: "U1USD1")
+
+    with pytest.raises(IntegrityError):
+        services.create_wallet(user, {"type": "Visa", "currency": "USD"})
+    assert Wallet.objects.count() == 1
+
+
+class TestWalletCache:
+    """Wallet lists and details are cached until a write changes them"""
+
+    @pytest.mark.django_db
+    def test_wallets_list_cached(self, user, auth_client, django_assert_num_queries):
+        """Repeated list is served from cache, creation invalidates it"""
+
+        auth_client.post("/wallets/", data={"type": "Visa", "currency": "USD"})
+        auth_client.get("/wallets/")
+        caching.reset_stats()
+
+        with django_assert_num_queries(0):
+            response = auth_client.get("/wallets/")
+        assert len(response.json()) == 1
+        # ETag and the list are both read from the cached rows
+        assert caching.get_stats() == {"hits": 2, "misses": 0}
+
+        auth_client.post("/wallets/", data={"type": "Visa", "currency": "EUR"})
+        response = auth_client.get("/wallets/")
+        assert len(response.json()) == 2
+        assert caching.get_stats() == {"hits": 3, "misses": 1}
+
+    @pytest.mark.django_db
+    def test_wallet_detail_invalidation(self, user, user2, auth_client):
+        """Transfers and deletion invalidate wallet details of both owners"""
+
+        Wallet.objects.create(
+            name="U1USD1", type="Visa", currency="USD", balance=100, owner=user
+        )
+        Wallet.objects.create(
+            name="U2USD1", type="Visa", currency="USD", balance=100, owner=user2
+        )
+        assert services.get_specific_user_wallet(user2, "U2USD1").balance == 100
+        assert len(services.get_user_wallets(user2)) == 1
+        response = auth_client.get("/wallets/U1USD1/")
+        assert response.json()["balance"] == "100.00"
+
+        auth_client.post(
+            "/transactions/",
+            data={"sender": "U1USD1", "receiver": "U2USD1", "transfer_amount": 10},
+        )
+        response = auth_client.get("/wallets/U1USD1/")
+        assert response.json()["balance"] == "89.00"
+        assert services.get_specific_user_wallet(user2, "U2USD1").balance == 110
+        assert services.get_user_wallets(user2)[0].balance == 110
+
+        response = auth_client.delete("/wallets/U1USD1/")
+        assert response.status_code == 204
+        response = auth_client.get("/wallets/U1USD1/")
+        assert response.status_code == 404
+        response = auth_client.get("/wallets/")
+        assert response.json() == []
+
+    @pytest.mark.django_db
+    def test_invalidation_from_another_process(
+        self, user, user2, auth_client, settings, tmp_path, monkeypatch
+    ):
+        """Transfers of the queue worker reach the cache of the web process"""
+
+        settings.CACHES = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": str(tmp_path),
+            }
+        }
+        sender = Wallet.objects.create(
+            name="U1USD1", type="Visa", currency="USD", balance=100, owner=user
+        )
+        receiver = Wallet.objects.create(
+            name="U2USD1", type="Visa", currency="USD", balance=100, owner=user2
+        )
+        assert auth_client.get("/wallets/").json()[0]["balance"] == "100.00"
+
+        # The worker has its own instance of the cache
+        monkeypatch.setattr(caching, "cache", caches.create_connection("default"))
+        services.create_transaction(
+            user, {"sender": sender, "receiver": receiver, "transfer_amount": 10}
+        )
+        monkeypatch.undo()
+
+        assert auth_client.get("/wallets/").json()[0]["balance"] == "89.00"
+
+    @pytest.mark.django_db
+    def test_cache_off(self, user, settings):
+        """WALLET_CACHE_TIMEOUT = 0 loads wallets on every call"""
+
+        settings.WALLET_CACHE_TIMEOUT = 0
+        assert services.get_user_wallets(user) == []
+        Wallet.objects.create(
+            name="U1USD1", type="Visa", currency="USD", balance=100, owner=user
+        )
+        assert len(services.get_user_wallets(user)) == 1
+
+    def test_local_cache_is_rejected(self, settings, tmp_path):
+        """Wallet cache needs a shared cache backend"""
+
+        assert [error.id for error in checks.check_wallet_cache(None)] == [
+            "wallets.E001"
+        ]
+        settings.CACHES = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": str(tmp_path),
+            }
+        }
+        assert checks.check_wallet_cache(None) == []
+
+    def test_concurrent_misses_load_once(self):
+        """Only one caller loads a missing key, the others wait for it"""
+
+        calls = []
+        caching.reset_stats()
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.1)
+            return "value"
+
+        threads = [
+            threading.Thread(target=caching.get_or_load, args=("key", loader))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert caching.get_stats() == {"hits": 4, "misses": 1}
+        assert caching.get_or_load("key", loader) == "value"
+
+    def test_waiters_load_after_failed_loader(self, settings):
+        """Waiters stop waiting as soon as the loader raises"""
+
+        settings.WALLET_CACHE_LOCK_TIMEOUT = 5
+        calls = []
+        errors = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.1)
+            raise Http404
+
+        def get():
+            try:
+                caching.get_or_load("key", loader)
+            except Http404 as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=get) for _ in range(5)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert time.monotonic() - started < 2
+        assert len(calls) == len(errors) == 5
@@ -1,6 +1,14 @@
 from django.contrib import admin
 
-from .models import Transaction, Wallet
+from .models import (ArchivedTransaction, BalanceCheckpoint, BalanceShard,
+                     DailyWalletRollup, LedgerEntry, Transaction,
+                     TransferRequest, Wallet)
 
 admin.site.register(Wallet)
 admin.site.register(Transaction)
+admin.site.register(ArchivedTransaction)
+admin.site.register(LedgerEntry)
+admin.site.register(BalanceCheckpoint)
+admin.site.register(BalanceShard)
+admin.site.register(DailyWalletRollup)
+admin.site.register(TransferRequest)
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
 
 
 class WalletsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "wallets"
+
+    def ready(self):
+        from . import checks  # noqa: F401
+
+        if settings.QUERY_STATS:
+            from app import querystats
+
+            connection_created.connect(querystats.install)
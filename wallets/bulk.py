@@ -0,0 +1,112 @@
+"""Bulk loading of rows with explicit primary keys.
+
+Rows are tuples of values in the order of the given field names. They
+are written with COPY on PostgreSQL and with batched executemany
+elsewhere, skipping model instances, signals and per-row queries.
+"""
+import io
+from typing import Any, Callable, List, Optional, Sequence, Type
+
+from django.core.management.color import no_style
+from django.db import models
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+Row = Sequence[Any]
+
+
+def _copy_value(value: Any) -> str:
+    """Format a value for COPY ... FROM STDIN in text format"""
+    if value is None:
+        return "\\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    if isinstance(value, str):
+        return (
+            value.replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
+    return str(value)
+
+
+class BulkWriter:
+    """Insert rows with batched executemany"""
+
+    def __init__(self, connection: BaseDatabaseWrapper, batch_size: int):
+        self.connection = connection
+        self.batch_size = batch_size
+
+    def write(
+        self, model: Type[models.Model], field_names: Sequence[str], rows: List[Row]
+    ) -> int:
+        fields = [model._meta.get_field(name) for name in field_names]
+        adapters = [self._adapter(field) for field in fields]
+        quote = self.connection.ops.quote_name
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            quote(model._meta.db_table),
+            ", ".join(quote(field.column) for field in fields),
+            ", ".join(["%s"] * len(fields)),
+        )
+        if any(adapters):
+            rows = [
+                [
+                    value if adapt is None or value is None else adapt(value)
+                    for adapt, value in zip(adapters, row)
+                ]
+                for row in rows
+            ]
+        with self.connection.cursor() as cursor:
+            for start in range(0, len(rows), self.batch_size):
+                cursor.executemany(sql, rows[start : start + self.batch_size])
+        return len(rows)
+
+    def _adapter(self, field: models.Field) -> Optional[Callable[[Any], Any]]:
+        # Decimals, dates and datetimes need the backend's representation
+        ops = self.connection.ops
+        if isinstance(field, models.DecimalField):
+            max_digits, decimal_places = field.max_digits, field.decimal_places
+            adapt = ops.adapt_decimalfield_value
+            return lambda value: adapt(value, max_digits, decimal_places)
+        if isinstance(field, models.DateTimeField):
+            return ops.adapt_datetimefield_value
+        if isinstance(field, models.DateField):
+            return ops.adapt_datefield_value
+        return None
+
+    def reset_sequences(self, model_list: Sequence[Type[models.Model]]) -> None:
+        """Move sequences past explicitly inserted primary keys"""
+        statements = self.connection.ops.sequence_reset_sql(no_style(), model_list)
+        with self.connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+class CopyWriter(BulkWriter):
+    """Insert rows with COPY FROM STDIN, PostgreSQL only"""
+
+    def write(
+        self, model: Type[models.Model], field_names: Sequence[str], rows: List[Row]
+    ) -> int:
+        quote = self.connection.ops.quote_name
+        columns = ", ".join(
+            quote(model._meta.get_field(name).column) for name in field_names
+        )
+        sql = f"COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN"
+        with self.connection.cursor() as cursor:
+            for start in range(0, len(rows), self.batch_size):
+                buffer = io.StringIO()
+                for row in rows[start : start + self.batch_size]:
+                    buffer.write("\t".join(map(_copy_value, row)))
+                    buffer.write("\n")
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+        return len(rows)
+
+
+def get_writer(connection: BaseDatabaseWrapper, batch_size: int) -> BulkWriter:
+    if connection.vendor == "postgresql":
+        return CopyWriter(connection, batch_size)
+    return BulkWriter(connection, batch_size)
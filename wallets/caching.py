@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from app.db import routers
+
+from .models import Wallet
+
+MISSING = object()
+
+_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(event: str) -> None:
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def get_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return {"hits": _stats["hits"], "misses": _stats["misses"]}
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+def user_wallets_key(user_id: int) -> str:
+    return f"wallets:user:{user_id}"
+
+
+def user_wallet_rows_key(user_id: int) -> str:
+    return f"wallets:user:{user_id}:rows"
+
+
+def wallet_key(user_id: int, name: str) -> str:
+    return f"wallets:user:{user_id}:wallet:{name}"
+
+
+def get_or_load(key: str, loader: Callable[[], Any]) -> Any:
+    """Return cached value of key, loading it on a miss.
+
+    Only one caller at a time loads a missing key: the others wait up to
+    WALLET_CACHE_LOCK_TIMEOUT for the value and load it themselves if it
+    doesn't appear before the loader gives up.
+    """
+    if not settings.WALLET_CACHE_TIMEOUT:
+        return loader()
+    value = cache.get(key, MISSING)
+    if value is not MISSING:
+        _count("hits")
+        return value
+
+    lock_timeout = settings.WALLET_CACHE_LOCK_TIMEOUT
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, True, timeout=lock_timeout):
+        _count("misses")
+        try:
+            value = loader()
+            cache.set(key, value, timeout=settings.WALLET_CACHE_TIMEOUT)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    value = _wait_for(key, lock_key, lock_timeout)
+    if value is not MISSING:
+        _count("hits")
+        return value
+    _count("misses")
+    return loader()
+
+
+def _wait_for(key: str, lock_key: str, timeout: float) -> Any:
+    """Value of key set by the holder of lock_key, or MISSING"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.01)
+        value = cache.get(key, MISSING)
+        if value is not MISSING:
+            return value
+        if cache.get(lock_key) is None:
+            # The loader raised, or the value was set and invalidated since
+            return cache.get(key, MISSING)
+    return MISSING
+
+
+def invalidate_wallets(wallets: Iterable[Wallet]) -> None:
+    """Drop cached lists and details of wallets changed by a write.
+
+    Keys are deleted right away and again after the transaction commits,
+    so a reader that cached old rows before the commit doesn't keep them.
+    """
+    keys = set()
+    owners = set()
+    for wallet in wallets:
+        owners.add(wallet.owner_id)
+        keys.add(user_wallets_key(wallet.owner_id))
+        keys.add(user_wallet_rows_key(wallet.owner_id))
+        keys.add(wallet_key(wallet.owner_id, wallet.name))
+
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+    # Owners read their changes from the primary until replicas catch up
+    routers.pin_to_primary(owners)
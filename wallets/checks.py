@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core import checks
+
+from app import caches
+
+
+@checks.register(checks.Tags.caches)
+def check_wallet_cache(app_configs, **kwargs):
+    """Wallet cache needs a cache all processes invalidate"""
+    if settings.WALLET_CACHE_TIMEOUT and not caches.is_shared():
+        return [
+            checks.Error(
+                "WALLET_CACHE_TIMEOUT is set, but the default cache isn't shared "
+                "between processes",
+                hint="Set CACHE_BACKEND and CACHE_LOCATION to a shared cache like "
+                "memcached, or set WALLET_CACHE_TIMEOUT to 0.",
+                id="wallets.E001",
+            )
+        ]
+    return []
+
+
+@checks.register(checks.Tags.caches, checks.Tags.database)
+def check_replica_pins(app_configs, **kwargs):
+    """Users pinned by one process must read from the primary in all of them"""
+    if settings.DATABASE_REPLICAS and not caches.is_shared():
+        return [
+            checks.Error(
+                "POSTGRES_REPLICAS is set, but the default cache isn't shared "
+                "between processes",
+                hint="Set CACHE_BACKEND and CACHE_LOCATION to a shared cache like "
+                "memcached.",
+                id="wallets.E002",
+            )
+        ]
+    return []
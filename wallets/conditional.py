@@ -0,0 +1,68 @@
+"""Conditional GET of wallet and transaction reads.
+
+Validators are derived from the cached wallets of the user: every write
+that changes a wallet or its history updates Wallet.modified_on of the
+wallets involved, and deleting a wallet changes their number. Unchanged
+polls get 304 Not Modified before any list is loaded or serialized.
+"""
+import hashlib
+from datetime import datetime
+from typing import Optional, Tuple
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework.request import Request
+
+from . import services
+
+
+def _wallets_state(request: Request) -> Tuple[int, Optional[datetime]]:
+    # ETag and Last-Modified of a request are read from one state
+    state = getattr(request, "_wallets_state", None)
+    if state is None:
+        rows = services.get_user_wallet_rows(request.user)
+        modified_on = max((row["modified_on"] for row in rows), default=None)
+        state = request._wallets_state = (len(rows), modified_on)
+    return state
+
+
+def _timestamp(modified_on: Optional[datetime]) -> str:
+    return "0" if modified_on is None else f"{modified_on.timestamp():.6f}"
+
+
+def wallets_etag(request: Request, *args, **kwargs) -> str:
+    count, modified_on = _wallets_state(request)
+    return f"wallets-{request.user.pk}-{count}-{_timestamp(modified_on)}"
+
+
+def wallets_last_modified(request: Request, *args, **kwargs) -> Optional[datetime]:
+    return _wallets_state(request)[1]
+
+
+def wallet_etag(request: Request, name: str) -> str:
+    wallet = services.get_specific_user_wallet(request.user, name)
+    return f"wallet-{wallet.pk}-{_timestamp(wallet.modified_on)}"
+
+
+def wallet_last_modified(request: Request, name: str) -> datetime:
+    return services.get_specific_user_wallet(request.user, name).modified_on
+
+
+def transactions_etag(request: Request, *args, **kwargs) -> str:
+    # Pages of one history differ by path, cursor and page size
+    page = hashlib.md5(request.get_full_path().encode()).hexdigest()[:16]
+    return f"{wallets_etag(request)}-{page}"
+
+
+wallets_condition = method_decorator(
+    condition(etag_func=wallets_etag, last_modified_func=wallets_last_modified),
+    name="get",
+)
+wallet_condition = method_decorator(
+    condition(etag_func=wallet_etag, last_modified_func=wallet_last_modified),
+    name="get",
+)
+transactions_condition = method_decorator(
+    condition(etag_func=transactions_etag, last_modified_func=wallets_last_modified),
+    name="get",
+)
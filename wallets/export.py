@@ -0,0 +1,40 @@
+import csv
+from typing import Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+COLUMNS = (
+    "id",
+    "sender",
+    "receiver",
+    "transfer_amount",
+    "commission",
+    "status",
+    "timestamp",
+)
+
+
+class Echo:
+    """File-like object returning written value instead of storing it"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def csv_lines(rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows: Iterable[tuple]) -> Iterator[str]:
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(COLUMNS, row))) + "\n"
+
+
+FORMATS = {
+    "csv": (csv_lines, "text/csv"),
+    "ndjson": (ndjson_lines, "application/x-ndjson"),
+}
@@ -0,0 +1,132 @@
+"""Read-only fast path of list serializers.
+
+A RowSerializer is compiled once from a DRF serializer class: every
+readable field becomes a values() lookup and a converter that returns
+what the field's to_representation returns. List views fetch plain
+values() rows and convert them, skipping model instances and per-row
+serializer machinery, and render byte-identical JSON.
+"""
+import datetime
+import decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from app.instrumentation import timed_serialization
+
+from .serializers import TransactionSerializer, WalletSerializer
+
+Converter = Optional[Callable[[Any], Any]]
+
+# Fields returning values of these types unchanged
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+)
+
+
+def _decimal_converter(field: serializers.DecimalField) -> Converter:
+    coerce_to_string = getattr(
+        field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING
+    )
+    if not coerce_to_string or field.localize or field.decimal_places is None:
+        return field.to_representation
+
+    exponent = decimal.Decimal(".1") ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value: decimal.Decimal) -> str:
+        return format(value.quantize(exponent, rounding=rounding, context=context), "f")
+
+    return convert
+
+
+def _datetime_converter(field: serializers.DateTimeField) -> Converter:
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    enforce_timezone = field.enforce_timezone
+
+    def convert(value: datetime.datetime) -> str:
+        value = enforce_timezone(value).isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return convert
+
+
+def _date_converter(field: serializers.DateField) -> Converter:
+    output_format = getattr(field, "format", api_settings.DATE_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    return datetime.date.isoformat
+
+
+def _converter(name: str, field: serializers.Field) -> Converter:
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, serializers.DateField):
+        return _date_converter(field)
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        return None
+    if isinstance(field, PLAIN_FIELDS):
+        return None
+    raise ValueError(f"Field {name} of type {type(field).__name__} is not supported")
+
+
+def _lookup(model: Any, name: str, field: serializers.Field) -> str:
+    if not field.source_attrs:
+        raise ValueError(f"Field {name} with source='*' is not supported")
+    if model is not None and len(field.source_attrs) == 1:
+        try:
+            # Foreign keys are read by their column, e.g. owner_id
+            return model._meta.get_field(field.source_attrs[0]).attname
+        except FieldDoesNotExist:
+            pass
+    return "__".join(field.source_attrs)
+
+
+class RowSerializer:
+    """Serialize values() rows the way serializer_class serializes instances"""
+
+    def __init__(self, serializer_class: type):
+        model = getattr(getattr(serializer_class, "Meta", None), "model", None)
+        fields = serializer_class().fields
+        self.fields: Tuple[Tuple[str, str, Converter], ...] = tuple(
+            (name, _lookup(model, name, field), _converter(name, field))
+            for name, field in fields.items()
+            if not field.write_only
+        )
+        self.lookups = tuple(dict.fromkeys(lookup for _, lookup, _ in self.fields))
+
+    def values(self, queryset: QuerySet) -> QuerySet:
+        return queryset.values(*self.lookups)
+
+    def to_representation(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        data = {}
+        for name, lookup, convert in self.fields:
+            value = row[lookup]
+            if value is not None and convert is not None:
+                value = convert(value)
+            data[name] = value
+        return data
+
+    def many(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        to_representation = self.to_representation
+        with timed_serialization():
+            return [to_representation(row) for row in rows]
+
+
+wallet_rows = RowSerializer(WalletSerializer)
+transaction_rows = RowSerializer(TransactionSerializer)
@@ -0,0 +1,107 @@
+"""Transfer fees.
+
+Fee schedules are read from settings.WALLET_FEE_SCHEDULES once, when the
+engine is first used, and kept as immutable tables of Decimals:
+
+    WALLET_FEE_SCHEDULES = {
+        "USD": [["1000.00", "0.10"], [None, "0.05"]],
+    }
+
+Each schedule is a list of [upper bound of transfer amount, fee rate]
+tiers, the last bound being None. Currencies without a schedule are
+charged DEFAULT_COMMISSION. Transfers between wallets of the same owner
+are free.
+"""
+import bisect
+import decimal
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from .models import CURRENCIES, DEFAULT_COMMISSION
+
+CENT = decimal.Decimal("0.01")
+ZERO = decimal.Decimal("0.00")
+# Prices kept by an engine before it starts over
+PRICE_CACHE_SIZE = 4096
+
+# Currency, whether both wallets have the same owner, and amount
+PriceKey = Tuple[str, bool, decimal.Decimal]
+
+
+class Price(NamedTuple):
+    """Fee rate, fee and amount charged to the sender"""
+
+    rate: decimal.Decimal
+    fee: decimal.Decimal
+    total: decimal.Decimal
+
+
+class FeeSchedule:
+    """Tiered fee rates of one currency"""
+
+    __slots__ = ("bounds", "rates")
+
+    def __init__(self, tiers: Sequence[Tuple[Optional[str], str]]):
+        if not tiers or tiers[-1][0] is not None:
+            raise ValueError("Last fee tier must have no upper bound")
+        bounds = tuple(decimal.Decimal(bound) for bound, _ in tiers[:-1])
+        if list(bounds) != sorted(bounds):
+            raise ValueError("Fee tiers must be ordered by upper bound")
+        self.bounds = bounds
+        self.rates = tuple(decimal.Decimal(rate) for _, rate in tiers)
+
+    def rate(self, amount: decimal.Decimal) -> decimal.Decimal:
+        return self.rates[bisect.bisect_left(self.bounds, amount)]
+
+
+class FeeEngine:
+    """Price transfers from precomputed fee schedules"""
+
+    def __init__(self, schedules: Mapping[str, FeeSchedule], default: FeeSchedule):
+        self.schedules = MappingProxyType(dict(schedules))
+        self.default = default
+
+        self._prices: Dict[PriceKey, Price] = {}
+
+    def price(self, currency: str, same_owner: bool, amount: decimal.Decimal) -> Price:
+        key = (currency, same_owner, amount)
+        price = self._prices.get(key)
+        if price is None:
+            if len(self._prices) >= PRICE_CACHE_SIZE:
+                self._prices.clear()
+            price = self._prices[key] = self._price(currency, same_owner, amount)
+        return price
+
+    def _price(self, currency: str, same_owner: bool, amount: decimal.Decimal) -> Price:
+        if same_owner:
+            return Price(ZERO, ZERO, amount)
+        rate = self.schedules.get(currency, self.default).rate(amount)
+        fee = (amount * rate).quantize(CENT, rounding=decimal.ROUND_HALF_UP)
+        return Price(rate, fee, amount + fee)
+
+    @staticmethod
+    def transfer_key(sender, receiver, amount: decimal.Decimal) -> PriceKey:
+        """Arguments of price() for a transfer between wallets"""
+        return sender.currency, sender.owner_id == receiver.owner_id, amount
+
+    def price_transfer(self, sender, receiver, amount: decimal.Decimal) -> Price:
+        return self.price(*self.transfer_key(sender, receiver, amount))
+
+    def price_batch(self, keys: Iterable[PriceKey]) -> Dict[PriceKey, Price]:
+        """Prices of transfer_key()s of a batch, equal ones are priced once"""
+        return {key: self.price(*key) for key in set(keys)}
+
+
+@lru_cache(maxsize=None)
+def get_fee_engine() -> FeeEngine:
+    default = FeeSchedule([(None, str(DEFAULT_COMMISSION))])
+    configured = settings.WALLET_FEE_SCHEDULES
+    schedules = {
+        currency: FeeSchedule(configured[currency])
+        for currency, _ in CURRENCIES
+        if currency in configured
+    }
+    return FeeEngine(schedules, default)
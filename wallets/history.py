@@ -0,0 +1,75 @@
+"""Transaction history spread over the hot table and the archive.
+
+Transactions are archived in id order (see services.archive_transactions),
+so every archived id is smaller than every id left in Transaction; the
+largest one is the archive watermark. Pages of the newest transactions
+are read from the hot table, and the archive is only queried for the rest
+of a page the hot table couldn't fill.
+"""
+from itertools import chain
+from typing import Any, Iterator, List, Optional
+
+from django.db.models import Max, QuerySet
+
+from .models import ArchivedTransaction
+
+
+def get_watermark(using: Optional[str] = None) -> int:
+    """Largest archived transaction id, 0 if nothing is archived.
+
+    It is read from the primary key index every time: archiving runs in
+    another process, which can't update caches of the web processes.
+    """
+    archive = ArchivedTransaction.objects.using(using)
+    return archive.aggregate(last=Max("id"))["last"] or 0
+
+
+class TransactionHistory:
+    """The same filter applied to Transaction and ArchivedTransaction"""
+
+    def __init__(
+        self, hot: QuerySet, archive: QuerySet, watermark: Optional[int] = None
+    ):
+        self.hot = hot
+        self.archive = archive
+        self._watermark = watermark
+
+    @property
+    def watermark(self) -> int:
+        """Watermark read once per history, e.g. once per request"""
+        if self._watermark is None:
+            self._watermark = get_watermark(self.archive.db)
+        return self._watermark
+
+    def values(self, *fields: str) -> "TransactionHistory":
+        return TransactionHistory(
+            self.hot.values(*fields), self.archive.values(*fields), self._watermark
+        )
+
+    def values_list(self, *fields: str) -> "TransactionHistory":
+        return TransactionHistory(
+            self.hot.values_list(*fields),
+            self.archive.values_list(*fields),
+            self._watermark,
+        )
+
+    def newest(self, limit: int, before: Optional[int] = None) -> List[Any]:
+        """Up to limit newest rows with id below before, newest first"""
+        watermark = self.watermark
+        rows: List[Any] = []
+        if before is None or before > watermark + 1:
+            hot = self.hot if before is None else self.hot.filter(id__lt=before)
+            rows = list(hot.order_by("-id")[:limit])
+        if len(rows) < limit and watermark:
+            archive = self.archive
+            if before is not None:
+                archive = archive.filter(id__lt=before)
+            rows += archive.order_by("-id")[: limit - len(rows)]
+        return rows
+
+    def iterator(self, chunk_size: int) -> Iterator[Any]:
+        """All rows, oldest first"""
+        return chain(
+            self.archive.order_by("id").iterator(chunk_size=chunk_size),
+            self.hot.order_by("id").iterator(chunk_size=chunk_size),
+        )
@@ -0,0 +1,107 @@
+import decimal
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Max, Sum
+
+from . import shards
+from .models import BalanceCheckpoint, LedgerEntry, Transaction, Wallet
+
+
+def open_wallet(wallet: Wallet) -> LedgerEntry:
+    return LedgerEntry.objects.create(
+        wallet=wallet, kind="OPENING", amount=wallet.balance
+    )
+
+
+def get_transaction_entries(
+    transaction_: Transaction, fee: decimal.Decimal
+) -> List[LedgerEntry]:
+    entries = [
+        LedgerEntry(
+            wallet_id=transaction_.sender_id,
+            transaction=transaction_,
+            kind="DEBIT",
+            amount=-transaction_.transfer_amount,
+        ),
+        LedgerEntry(
+            wallet_id=transaction_.receiver_id,
+            transaction=transaction_,
+            kind="CREDIT",
+            amount=transaction_.transfer_amount,
+        ),
+    ]
+    if fee:
+        entries.append(
+            LedgerEntry(
+                wallet_id=transaction_.sender_id,
+                transaction=transaction_,
+                kind="FEE",
+                amount=-fee,
+            )
+        )
+    return entries
+
+
+def record_transactions(
+    transactions: Iterable[Tuple[Transaction, decimal.Decimal]]
+) -> None:
+    """Write ledger entries of paid transactions and their fees"""
+    entries = []
+    for transaction_, fee in transactions:
+        entries += get_transaction_entries(transaction_, fee)
+    LedgerEntry.objects.bulk_create(entries)
+
+
+def get_balance(wallet: Wallet, at: Optional[datetime] = None) -> decimal.Decimal:
+    """Return wallet balance from the ledger, optionally as of a moment.
+
+    Only entries after the latest checkpoint are summed.
+    """
+    checkpoints = wallet.checkpoints.order_by("-last_entry_id")
+    entries = wallet.ledger_entries.all()
+    if at is not None:
+        checkpoints = checkpoints.filter(last_entry_on__lte=at)
+        entries = entries.filter(created_on__lte=at)
+
+    balance = decimal.Decimal("0.00")
+    checkpoint = checkpoints.first()
+    if checkpoint is not None:
+        balance = checkpoint.balance
+        entries = entries.filter(id__gt=checkpoint.last_entry_id)
+
+    total = entries.aggregate(total=Sum("amount"))["total"]
+    return balance + (total or 0)
+
+
+def create_checkpoint(wallet_id: int) -> Optional[BalanceCheckpoint]:
+    """Save balance of wallet entries since the previous checkpoint.
+
+    The wallet row and its balance shards are locked like in a transfer, so
+    no entry of the wallet can be committed behind the checkpoint. Returns
+    None if the wallet has no new entries.
+    """
+    with transaction.atomic():
+        wallet = Wallet.objects.select_for_update().get(pk=wallet_id)
+        # Balance of the wallet including its shards, see wallets.shards
+        wallet.balance += sum(shard.balance for shard in shards.lock_all(wallet_id))
+        checkpoint = wallet.checkpoints.order_by("-last_entry_id").first()
+
+        entries = wallet.ledger_entries.all()
+        balance = decimal.Decimal("0.00")
+        if checkpoint is not None:
+            entries = entries.filter(id__gt=checkpoint.last_entry_id)
+            balance = checkpoint.balance
+
+        new_entries = entries.aggregate(total=Sum("amount"), last_entry_id=Max("id"))
+        if new_entries["last_entry_id"] is None:
+            return None
+
+        last_entry = LedgerEntry.objects.get(pk=new_entries["last_entry_id"])
+        return BalanceCheckpoint.objects.create(
+            wallet=wallet,
+            balance=balance + new_entries["total"],
+            last_entry_id=last_entry.pk,
+            last_entry_on=last_entry.created_on,
+        )
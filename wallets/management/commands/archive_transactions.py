@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from wallets import services
+
+
+class Command(BaseCommand):
+    """Move old transactions to the archive"""
+
+    help = (
+        "Move transactions older than TRANSACTION_ARCHIVE_DAYS days to the "
+        "archive table in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.TRANSACTION_ARCHIVE_DAYS,
+            help="Archive transactions older than this many days",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(days=options["days"])
+        archived = services.archive_transactions(older_than, options["batch_size"])
+        self.stdout.write(f"Archived {archived} transactions")
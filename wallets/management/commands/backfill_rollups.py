@@ -0,0 +1,35 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from wallets import rollups
+
+
+class Command(BaseCommand):
+    """Rebuild daily wallet rollups from transaction history"""
+
+    help = (
+        "Rebuild daily wallet rollups of days from --since to --until "
+        "(yesterday by default) from paid transactions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            help="First day, YYYY-MM-DD, defaults to the first transaction",
+        )
+        parser.add_argument(
+            "--until", type=date.fromisoformat, help="Last day, YYYY-MM-DD"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        until = options["until"] or timezone.localdate() - timedelta(days=1)
+        since = options["since"]
+        if since is not None and since > until:
+            raise CommandError("--since can't be after --until")
+
+        created = rollups.backfill(since, until, options["batch_size"])
+        self.stdout.write(f"Created {created} rollups")
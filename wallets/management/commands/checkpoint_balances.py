@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wallets import ledger
+from wallets.models import Wallet
+
+
+class Command(BaseCommand):
+    """Save balance checkpoints of wallets with new ledger entries"""
+
+    help = (
+        "Save a balance checkpoint for every wallet with ledger entries after "
+        "its latest checkpoint and check it against the wallet balance."
+    )
+
+    def handle(self, *args, **options):
+        created = 0
+        mismatched = []
+
+        for wallet_id in Wallet.objects.values_list("id", flat=True).iterator():
+            checkpoint = ledger.create_checkpoint(wallet_id)
+            if checkpoint is None:
+                continue
+            created += 1
+            if checkpoint.balance != checkpoint.wallet.balance:
+                mismatched.append(checkpoint.wallet.name)
+                self.stderr.write(
+                    f"Wallet {checkpoint.wallet.name}: ledger balance "
+                    f"{checkpoint.balance} != wallet balance {checkpoint.wallet.balance}"
+                )
+
+        self.stdout.write(f"Created {created} checkpoints")
+        if mismatched:
+            raise CommandError(f"{len(mismatched)} wallets don't match their ledger")
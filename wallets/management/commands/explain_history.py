@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from wallets import services
+
+
+class Command(BaseCommand):
+    """Print query plans of the wallet and transaction history queries"""
+
+    help = (
+        "Print EXPLAIN output for the first history page of a user and one of "
+        "their wallets, to check that the ledger indexes are used."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="Owner of the history to explain")
+        parser.add_argument("--wallet", help="Wallet name, defaults to any wallet")
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Run EXPLAIN ANALYZE (PostgreSQL only)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options["email"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['email']} doesn't exist")
+
+        wallet_name = options["wallet"]
+        if wallet_name is None:
+            wallet = user.wallet_set.first()
+            if wallet is None:
+                raise CommandError(f"User {user.email} has no wallets")
+            wallet_name = wallet.name
+
+        explain_options = {"analyze": True} if options["analyze"] else {}
+        page_size = settings.TRANSACTIONS_PAGE_SIZE
+        queries = {
+            "user wallets": user.wallet_set.all(),
+        }
+        histories = {
+            "user transactions": services.get_user_transactions(user),
+            "wallet transactions": services.get_wallet_transactions(user, wallet_name),
+        }
+        for title, history in histories.items():
+            queries[title] = history.hot.order_by("-id")[:page_size]
+            queries[f"archived {title}"] = history.archive.order_by("-id")[:page_size]
+
+        for title, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{title}:"))
+            self.stdout.write(queryset.explain(**explain_options))
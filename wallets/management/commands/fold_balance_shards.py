@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from wallets import shards
+
+
+class Command(BaseCommand):
+    """Move balances of wallet shards to their wallets"""
+
+    help = (
+        "Fold the balance shards of every sharded wallet into Wallet.balance. "
+        "Reported balances don't change; run it periodically."
+    )
+
+    def handle(self, *args, **options):
+        folded = shards.fold_all()
+        self.stdout.write(f"Folded shards of {folded} wallets")
@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wallets.models import CURRENCIES, MAX_NUMBER_OF_WALLETS
+from wallets.synthetic import SCALES, DatasetGenerator, Scale
+
+
+class Command(BaseCommand):
+    """Generate users, wallets and transfers for performance testing"""
+
+    help = (
+        "Bulk insert a synthetic dataset: users, wallets with balances matching "
+        "their transfers, ledger entries and daily rollups. Uses COPY on "
+        "PostgreSQL and batched inserts elsewhere."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=SCALES, default="small")
+        parser.add_argument("--users", type=int, help="Overrides the scale")
+        parser.add_argument("--wallets-per-user", type=int, help="Overrides the scale")
+        parser.add_argument("--transactions", type=int, help="Overrides the scale")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--currencies",
+            nargs="+",
+            choices=[currency for currency, _ in CURRENCIES],
+            help="Wallet currencies, defaults to all",
+        )
+        parser.add_argument(
+            "--days", type=int, default=365, help="Transfers are spread over days"
+        )
+        parser.add_argument(
+            "--password", default="password", help="Password of every user"
+        )
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        # An explicit 0 must not fall back to the scale
+        scale = Scale(
+            *(
+                default if options[field] is None else options[field]
+                for field, default in SCALES[options["scale"]]._asdict().items()
+            )
+        )
+        if scale.users < 1:
+            raise CommandError("--users must be at least 1")
+        if not 1 <= scale.wallets_per_user <= MAX_NUMBER_OF_WALLETS:
+            raise CommandError(
+                f"--wallets-per-user must be from 1 to {MAX_NUMBER_OF_WALLETS}"
+            )
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        generator = DatasetGenerator(
+            scale,
+            seed=options["seed"],
+            currencies=options["currencies"],
+            days=options["days"],
+            password=options["password"],
+            batch_size=options["batch_size"],
+        )
+        started = time.perf_counter()
+        counts = generator.generate()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            ", ".join(f"{count} {name}" for name, count in counts.items())
+            + f" created in {elapsed:.1f}s"
+        )
+        if counts["transactions"] < scale.transactions:
+            self.stderr.write(
+                f"Only {counts['transactions']} transfers were possible with "
+                "the generated balances"
+            )
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from wallets import services
+
+
+class Command(BaseCommand):
+    """Execute transfers queued by POST /transactions/ in async mode"""
+
+    help = (
+        "Drain the transfer queue in batches, committing each batch in one "
+        "database transaction. Several workers can run at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.TRANSFER_QUEUE_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.TRANSFER_QUEUE_POLL_INTERVAL,
+            help="Seconds to wait when the queue is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty instead of waiting",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = services.process_transfer_requests(options["batch_size"])
+            total += processed
+            if processed:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["poll_interval"])
+        self.stdout.write(f"Processed {total} transfers")
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from wallets import services
+
+
+class Command(BaseCommand):
+    """Delete idempotency keys older than the retention period"""
+
+    help = "Delete idempotency keys older than IDEMPOTENCY_KEY_RETENTION hours."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=settings.IDEMPOTENCY_KEY_RETENTION,
+            help="Retention period in hours",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(hours=options["hours"])
+        deleted = services.purge_idempotency_keys(older_than, options["batch_size"])
+        self.stdout.write(f"Deleted {deleted} idempotency keys")
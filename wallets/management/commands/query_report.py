@@ -0,0 +1,56 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app import querystats
+
+
+class Command(BaseCommand):
+    """Print the slowest SQL fingerprints of all processes"""
+
+    help = (
+        "Merge query statistics that processes wrote to QUERY_STATS_DIR and "
+        "print the top fingerprints."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=20)
+        parser.add_argument("--sort", choices=querystats.SORT_KEYS, default="total")
+        parser.add_argument("--dir", type=Path, help="Defaults to QUERY_STATS_DIR")
+        parser.add_argument("--json", action="store_true", help="Print JSON")
+        parser.add_argument(
+            "--clear", action="store_true", help="Delete the snapshots afterwards"
+        )
+
+    def handle(self, *args, **options):
+        directory = options["dir"] or Path(settings.QUERY_STATS_DIR)
+        paths = sorted(directory.glob("*.json"))
+        snapshots = []
+        for path in paths:
+            try:
+                snapshots.append(json.loads(path.read_text())["queries"])
+            except (OSError, ValueError, KeyError):
+                self.stderr.write(f"Skipping unreadable {path}")
+
+        rows = querystats.top(
+            querystats.merge(snapshots), options["top"], options["sort"]
+        )
+        if options["json"]:
+            self.stdout.write(json.dumps(rows, indent=2))
+        else:
+            self.stdout.write(
+                f"{len(paths)} processes, sorted by {options['sort']} (ms)"
+            )
+            self.stdout.write(f"{'count':>10} {'total':>12} {'mean':>10} {'max':>10}")
+            for row in rows:
+                self.stdout.write(
+                    f"{row['count']:>10} {row['total'] * 1000:>12.1f} "
+                    f"{row['mean'] * 1000:>10.2f} {row['max'] * 1000:>10.2f}  "
+                    f"{row['fingerprint']}"
+                )
+
+        if options["clear"]:
+            for path in paths:
+                path.unlink(missing_ok=True)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wallets import shards
+from wallets.models import Wallet
+
+
+class Command(BaseCommand):
+    """Set the number of balance shards of a wallet"""
+
+    help = (
+        "Credit transfers to a wallet on this many balance shards instead of "
+        "its row, so concurrent transfers to it don't wait for each other. "
+        "0 turns sharding off and folds the shards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", help="Wallet name")
+        parser.add_argument("count", type=int, help="Number of shards")
+
+    def handle(self, *args, **options):
+        if options["count"] < 0:
+            raise CommandError("Number of shards can't be negative")
+        try:
+            wallet = Wallet.objects.get(name=options["name"])
+        except Wallet.DoesNotExist:
+            raise CommandError(f"Wallet {options['name']} doesn't exist")
+        shards.set_shards(wallet.pk, options["count"])
+        self.stdout.write(f"Wallet {wallet.name} has {options['count']} shards")
@@ -0,0 +1,72 @@
+# Generated by Django 3.2 on 2026-10-18 09:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("wallets", "0003_auto_20221216_0753"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["sender", "id"], name="transaction_sender_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["receiver", "id"], name="transaction_receiver_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wallet",
+            index=models.Index(
+                fields=["owner", "modified_on"], name="wallet_owner_modified_idx"
+            ),
+        ),
+        migrations.AlterModelOptions(
+            name="transaction",
+            options={},
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="receiver",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="receivers",
+                to="wallets.wallet",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="sender",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="senders",
+                to="wallets.wallet",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="timestamp",
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name="wallet",
+            name="owner",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
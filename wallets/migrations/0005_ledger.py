@@ -0,0 +1,113 @@
+# Generated by Django 3.2 on 2026-10-18 09:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_existing_wallets(apps, schema_editor):
+    """Start the ledger of existing wallets from their current balance"""
+    Wallet = apps.get_model("wallets", "Wallet")
+    LedgerEntry = apps.get_model("wallets", "LedgerEntry")
+    wallets = Wallet.objects.values_list("id", "balance").iterator()
+    LedgerEntry.objects.bulk_create(
+        (
+            LedgerEntry(wallet_id=wallet_id, kind="OPENING", amount=balance)
+            for wallet_id, balance in wallets
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0004_transaction_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LedgerEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("OPENING", "OPENING"),
+                            ("DEBIT", "DEBIT"),
+                            ("CREDIT", "CREDIT"),
+                            ("FEE", "FEE"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("created_on", models.DateTimeField(auto_now_add=True)),
+                (
+                    "transaction",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="ledger_entries",
+                        to="wallets.transaction",
+                    ),
+                ),
+                (
+                    "wallet",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ledger_entries",
+                        to="wallets.wallet",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="BalanceCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("balance", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("last_entry_id", models.BigIntegerField()),
+                ("last_entry_on", models.DateTimeField()),
+                ("created_on", models.DateTimeField(auto_now_add=True)),
+                (
+                    "wallet",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="checkpoints",
+                        to="wallets.wallet",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="ledgerentry",
+            index=models.Index(fields=["wallet", "id"], name="ledger_wallet_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="balancecheckpoint",
+            index=models.Index(
+                fields=["wallet", "last_entry_id"], name="checkpoint_wallet_entry_idx"
+            ),
+        ),
+        migrations.RunPython(open_existing_wallets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0006_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WalletNameBlock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_on", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2 on 2026-10-18 10:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0007_wallet_name_block"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyWalletRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "inflow",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "outflow",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "fees",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("incoming_count", models.PositiveIntegerField(default=0)),
+                ("outgoing_count", models.PositiveIntegerField(default=0)),
+                (
+                    "wallet",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_rollups",
+                        to="wallets.wallet",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="dailywalletrollup",
+            constraint=models.UniqueConstraint(
+                fields=("wallet", "day"), name="rollup_wallet_day_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 3.2 on 2026-10-18 10:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0008_daily_wallet_rollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedTransaction",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "transfer_amount",
+                    models.DecimalField(decimal_places=2, max_digits=10),
+                ),
+                ("commission", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("PAID", "PAID"), ("FAILED", "FAILED")], max_length=10
+                    ),
+                ),
+                ("timestamp", models.DateTimeField()),
+                (
+                    "receiver",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="wallets.wallet",
+                    ),
+                ),
+                (
+                    "sender",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="wallets.wallet",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="archivedtransaction",
+            index=models.Index(fields=["sender", "id"], name="archive_sender_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="archivedtransaction",
+            index=models.Index(
+                fields=["receiver", "id"], name="archive_receiver_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 3.2 on 2026-10-18 10:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("wallets", "0009_archived_transaction"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TransferRequest",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sender", models.CharField(max_length=8)),
+                ("receiver", models.CharField(max_length=8)),
+                (
+                    "transfer_amount",
+                    models.DecimalField(decimal_places=2, max_digits=10),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("QUEUED", "QUEUED"),
+                            ("PAID", "PAID"),
+                            ("FAILED", "FAILED"),
+                        ],
+                        default="QUEUED",
+                        max_length=10,
+                    ),
+                ),
+                ("error", models.CharField(blank=True, max_length=100)),
+                (
+                    "idempotency_key",
+                    models.CharField(blank=True, max_length=64, null=True),
+                ),
+                ("created_on", models.DateTimeField(auto_now_add=True)),
+                ("processed_on", models.DateTimeField(blank=True, null=True)),
+                (
+                    "transaction",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="wallets.transaction",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="transferrequest",
+            index=models.Index(
+                condition=models.Q(status="QUEUED"),
+                fields=["id"],
+                name="transfer_request_queued_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transferrequest",
+            index=models.Index(
+                condition=models.Q(status="QUEUED"),
+                fields=["sender", "id"],
+                name="transfer_request_sender_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="transferrequest",
+            constraint=models.UniqueConstraint(
+                fields=("user", "idempotency_key"),
+                name="transfer_request_user_key_unique",
+            ),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2 on 2026-10-18 10:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0010_transfer_request"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="wallet",
+            name="balance_shards",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="BalanceShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("index", models.PositiveSmallIntegerField()),
+                (
+                    "balance",
+                    models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+                ),
+                ("modified_on", models.DateTimeField(auto_now=True)),
+                (
+                    "wallet",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shards",
+                        to="wallets.wallet",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="balanceshard",
+            constraint=models.UniqueConstraint(
+                fields=("wallet", "index"), name="balance_shard_wallet_index_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2 on 2026-10-18 10:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0011_balance_shards"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BalanceShardRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "inflow",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("incoming_count", models.PositiveIntegerField(default=0)),
+                (
+                    "shard",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rollups",
+                        to="wallets.balanceshard",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="balanceshardrollup",
+            constraint=models.UniqueConstraint(
+                fields=("shard", "day"), name="shard_rollup_shard_day_unique"
+            ),
+        ),
+    ]
@@ -1,6 +1,3 @@
-import random
-import string
-
 from django.conf import settings
 from django.db import models
 
@@ -10,10 +7,21 @@ User = settings.AUTH_USER_MODEL
 CARDS = [("Visa", "Visa"), ("Mastercard", "Mastercard")]
 CURRENCIES = [("USD", "USD"), ("EUR", "EUR"), ("RUB", "RUB")]
 STATUSES = [("PAID", "PAID"), ("FAILED", "FAILED")]
+TRANSFER_REQUEST_STATUSES = [("QUEUED", "QUEUED")] + STATUSES
+ENTRY_KINDS = [
+    ("OPENING", "OPENING"),
+    ("DEBIT", "DEBIT"),
+    ("CREDIT", "CREDIT"),
+    ("FEE", "FEE"),
+]
 WALLET_NAME_LENGTH = 8
 MAX_NUMBER_OF_WALLETS = 5
 BONUSES = {"USD": 3.00, "EUR": 3.00, "RUB": 100.00}
 DEFAULT_COMMISSION = 0.10
+MAX_TRANSFERS_IN_BATCH = 1000
+IDEMPOTENCY_KEY_LENGTH = 64
+ROLLUP_DEFAULT_DAYS = 30
+ROLLUP_MAX_DAYS = 366
 
 
 class Wallet(models.Model):
@@ -25,39 +33,294 @@ class Wallet(models.Model):
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     created_on = models.DateField(auto_now_add=True)
     modified_on = models.DateTimeField(auto_now=True)
-    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    # Number of BalanceShard rows taking credits of the wallet, see wallets.shards
+    balance_shards = models.PositiveSmallIntegerField(default=0)
 
     class Meta:
         ordering = ["modified_on"]
+        indexes = [
+            models.Index(
+                fields=["owner", "modified_on"], name="wallet_owner_modified_idx"
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"Owner: {self.owner}, wallet: {self.name}"
 
     @classmethod
     def create_wallet_name(cls) -> str:
-        name = "".join(
-            random.SystemRandom().choice(string.ascii_uppercase + string.digits)
-            for _ in range(WALLET_NAME_LENGTH)
-        )
-        return name
+        from .names import allocator
+
+        return allocator.allocate()
+
+
+class WalletNameBlock(models.Model):
+    """Reserved block of wallet name numbers, see wallets.names"""
+
+    created_on = models.DateTimeField(auto_now_add=True)
 
 
 class Transaction(models.Model):
     """Transaction model"""
 
-    sender = models.ForeignKey(Wallet, related_name="senders", on_delete=models.CASCADE)
+    sender = models.ForeignKey(
+        Wallet, related_name="senders", on_delete=models.CASCADE, db_index=False
+    )
     receiver = models.ForeignKey(
-        Wallet, related_name="receivers", on_delete=models.CASCADE
+        Wallet, related_name="receivers", on_delete=models.CASCADE, db_index=False
     )
     transfer_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.10)
     commission = models.DecimalField(max_digits=10, decimal_places=2, default=0.10)
     status = models.CharField(max_length=10, choices=STATUSES)
-    timestamp = models.DateField(auto_now_add=True)
+    timestamp = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ["timestamp"]
+        # History is read newest first by id, see wallets.pagination
+        indexes = [
+            models.Index(fields=["sender", "id"], name="transaction_sender_id_idx"),
+            models.Index(fields=["receiver", "id"], name="transaction_receiver_id_idx"),
+        ]
 
     def __str__(self) -> str:
         return (
             f"Transaction: {self.pk}; sender: {self.sender}; receiver: {self.receiver}"
         )
+
+
+class ArchivedTransaction(models.Model):
+    """Transaction moved out of the hot table, see services.archive_transactions.
+
+    Rows keep the ids of their transactions, which are always smaller than
+    the ids of the transactions left in the hot table.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    sender = models.ForeignKey(
+        Wallet, related_name="+", on_delete=models.CASCADE, db_index=False
+    )
+    receiver = models.ForeignKey(
+        Wallet, related_name="+", on_delete=models.CASCADE, db_index=False
+    )
+    transfer_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    commission = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=10, choices=STATUSES)
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["sender", "id"], name="archive_sender_id_idx"),
+            models.Index(fields=["receiver", "id"], name="archive_receiver_id_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Archived transaction: {self.pk}"
+
+
+class BalanceShard(models.Model):
+    """Part of the balance of a wallet taking credits, see wallets.shards"""
+
+    wallet = models.ForeignKey(
+        Wallet, related_name="shards", on_delete=models.CASCADE, db_index=False
+    )
+    index = models.PositiveSmallIntegerField()
+    balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    modified_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["wallet", "index"], name="balance_shard_wallet_index_unique"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Shard {self.index} of wallet: {self.wallet_id}; balance: {self.balance}"
+
+
+class LedgerEntry(models.Model):
+    """Append-only record of one change of a wallet balance.
+
+    A transfer writes a DEBIT of the sender, a CREDIT of the receiver and a
+    FEE of the sender if commission was charged; a new wallet starts with an
+    OPENING entry. Entries are never updated, so the sum of a wallet's
+    entries is its balance.
+    """
+
+    wallet = models.ForeignKey(
+        Wallet, related_name="ledger_entries", on_delete=models.CASCADE, db_index=False
+    )
+    # Entries outlive the transaction row, e.g. when it is archived
+    transaction = models.ForeignKey(
+        Transaction,
+        related_name="ledger_entries",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+    )
+    kind = models.CharField(max_length=10, choices=ENTRY_KINDS)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["wallet", "id"], name="ledger_wallet_id_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} {self.amount} of wallet: {self.wallet_id}"
+
+
+class BalanceCheckpoint(models.Model):
+    """Wallet balance after all ledger entries up to last_entry_id"""
+
+    wallet = models.ForeignKey(
+        Wallet, related_name="checkpoints", on_delete=models.CASCADE, db_index=False
+    )
+    balance = models.DecimalField(max_digits=10, decimal_places=2)
+    last_entry_id = models.BigIntegerField()
+    last_entry_on = models.DateTimeField()
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["wallet", "last_entry_id"], name="checkpoint_wallet_entry_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Checkpoint of wallet: {self.wallet_id}; balance: {self.balance}"
+
+
+class IdempotencyKey(models.Model):
+    """Transaction created by a request with Idempotency-Key header"""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    key = models.CharField(max_length=IDEMPOTENCY_KEY_LENGTH)
+    # Keys are purged long before transactions, no index for cascades needed
+    transaction = models.ForeignKey(
+        Transaction,
+        related_name="+",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+    )
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="idempotency_user_key_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["created_on"], name="idempotency_created_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Key: {self.key}; transaction: {self.transaction_id}"
+
+
+class TransferRequest(models.Model):
+    """Transfer queued by POST /transactions/ in async mode.
+
+    Workers (see services.process_transfer_requests) execute queued requests
+    and record their status, error and transaction.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    sender = models.CharField(max_length=WALLET_NAME_LENGTH)
+    receiver = models.CharField(max_length=WALLET_NAME_LENGTH)
+    transfer_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(
+        max_length=10, choices=TRANSFER_REQUEST_STATUSES, default="QUEUED"
+    )
+    error = models.CharField(max_length=100, blank=True)
+    transaction = models.ForeignKey(
+        Transaction,
+        related_name="+",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+    )
+    idempotency_key = models.CharField(
+        max_length=IDEMPOTENCY_KEY_LENGTH, null=True, blank=True
+    )
+    created_on = models.DateTimeField(auto_now_add=True)
+    processed_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "idempotency_key"],
+                name="transfer_request_user_key_unique",
+            ),
+        ]
+        indexes = [
+            # Workers scan queued requests in id order
+            models.Index(
+                fields=["id"],
+                condition=models.Q(status="QUEUED"),
+                name="transfer_request_queued_idx",
+            ),
+            # Per-wallet ordering checks of workers
+            models.Index(
+                fields=["sender", "id"],
+                condition=models.Q(status="QUEUED"),
+                name="transfer_request_sender_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Transfer request: {self.pk}; status: {self.status}"
+
+
+class DailyWalletRollup(models.Model):
+    """Totals of wallet transfers of one day, see wallets.rollups"""
+
+    wallet = models.ForeignKey(
+        Wallet, related_name="daily_rollups", on_delete=models.CASCADE, db_index=False
+    )
+    day = models.DateField()
+    inflow = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    outflow = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    fees = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    incoming_count = models.PositiveIntegerField(default=0)
+    outgoing_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["wallet", "day"], name="rollup_wallet_day_unique"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Rollup of wallet: {self.wallet_id}; day: {self.day}"
+
+
+class BalanceShardRollup(models.Model):
+    """Incoming totals of one day credited on a balance shard.
+
+    Kept apart from DailyWalletRollup so credits to a sharded wallet don't
+    all lock its daily row; shards.fold() adds them to it.
+    """
+
+    shard = models.ForeignKey(
+        BalanceShard, related_name="rollups", on_delete=models.CASCADE, db_index=False
+    )
+    day = models.DateField()
+    inflow = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    incoming_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["shard", "day"], name="shard_rollup_shard_day_unique"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Rollup of shard: {self.shard_id}; day: {self.day}"
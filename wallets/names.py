@@ -0,0 +1,77 @@
+"""Allocation of unique wallet names.
+
+A name is a 7 character base 36 body followed by a check digit. Bodies
+are produced from unique numbers by a bijective affine map, so names look
+random but two numbers never give the same name. Numbers are reserved in
+blocks: each process inserts a WalletNameBlock row and then hands out
+the BLOCK_SIZE numbers starting at its id times BLOCK_SIZE in memory, so
+allocating a name doesn't read the wallet table at all.
+"""
+import string
+import threading
+
+from .models import WALLET_NAME_LENGTH, WalletNameBlock
+
+ALPHABET = string.digits + string.ascii_uppercase
+BODY_LENGTH = WALLET_NAME_LENGTH - 1
+CAPACITY = len(ALPHABET) ** BODY_LENGTH
+# Coprime with 36, which makes number -> body a permutation of CAPACITY
+MULTIPLIER = 48_271_174_841
+OFFSET = 21_495_634_519
+# Ranges of blocks are derived from it, so it must never vary between
+# processes or deploys of one database
+BLOCK_SIZE = 1000
+
+
+def check_digit(body: str) -> str:
+    total = sum(ALPHABET.index(char) * (index + 1) for index, char in enumerate(body))
+    return str(total % 10)
+
+
+def encode(number: int) -> str:
+    if not 0 <= number < CAPACITY:
+        raise ValueError(f"Wallet name number {number} is out of range")
+
+    value = (number * MULTIPLIER + OFFSET) % CAPACITY
+    chars = []
+    for _ in range(BODY_LENGTH):
+        value, remainder = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[remainder])
+    body = "".join(reversed(chars))
+    return body + check_digit(body)
+
+
+def is_valid(name: str) -> bool:
+    return (
+        len(name) == WALLET_NAME_LENGTH
+        and all(char in ALPHABET for char in name)
+        and check_digit(name[:-1]) == name[-1]
+    )
+
+
+class WalletNameAllocator:
+    """Hand out wallet names from blocks of reserved numbers"""
+
+    def __init__(self):
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def allocate(self) -> str:
+        with self._lock:
+            if self._next >= self._end:
+                # Primary keys aren't reused, so blocks never overlap
+                block = WalletNameBlock.objects.create()
+                self._next = block.pk * BLOCK_SIZE
+                self._end = self._next + BLOCK_SIZE
+            number = self._next
+            self._next += 1
+        return encode(number)
+
+    def reset(self) -> None:
+        """Forget the current block, e.g. after its row was rolled back"""
+        with self._lock:
+            self._next = self._end = 0
+
+
+allocator = WalletNameAllocator()
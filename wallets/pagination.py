@@ -0,0 +1,96 @@
+import base64
+from typing import Any, List, Mapping, Optional
+
+from django.conf import settings
+from django.db.models import QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .history import TransactionHistory
+
+
+class TransactionCursorPagination(BasePagination):
+    """Keyset pagination for transaction history.
+
+    Pages are ordered by descending primary key, which is unique and grows
+    with time, so every page is fetched with ``id < cursor`` and costs the
+    same regardless of how deep the client has scrolled. Transaction
+    histories continue from the hot table into the archive.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(
+        self, queryset: QuerySet, request: Request, view: Any = None
+    ) -> List[Any]:
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        if isinstance(queryset, TransactionHistory):
+            page = queryset.newest(self.page_size + 1, before=position)
+        else:
+            if position is not None:
+                queryset = queryset.filter(id__lt=position)
+            page = list(queryset.order_by("-id")[: self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[: self.page_size]
+        self.next_position = self.get_position(page[-1]) if self.has_next else None
+        return page
+
+    def get_position(self, item: Any) -> int:
+        # Pages are lists of instances or of values() rows
+        return item["id"] if isinstance(item, Mapping) else item.id
+
+    def get_paginated_response(self, data: List[Any]) -> Response:
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request: Request) -> int:
+        page_size = settings.TRANSACTIONS_PAGE_SIZE
+        value = request.query_params.get(self.page_size_query_param)
+        if value is not None:
+            try:
+                page_size = int(value)
+            except ValueError:
+                pass
+        return max(1, min(page_size, settings.TRANSACTIONS_MAX_PAGE_SIZE))
+
+    def get_next_link(self) -> Optional[str]:
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_position)
+        )
+
+    def encode_cursor(self, position: int) -> str:
+        return base64.urlsafe_b64encode(f"id={position}".encode()).decode()
+
+    def decode_cursor(self, request: Request) -> Optional[int]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            key, _, value = (
+                base64.urlsafe_b64decode(encoded.encode()).decode().partition("=")
+            )
+            if key != "id":
+                raise ValueError
+            return int(value)
+        # Covers binascii.Error and UnicodeDecodeError too
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
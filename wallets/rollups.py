@@ -0,0 +1,181 @@
+import decimal
+from collections import defaultdict
+from datetime import date
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+
+from django.db import connections, models, router, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .fees import CENT
+from .models import (ArchivedTransaction, BalanceShard, BalanceShardRollup,
+                     DailyWalletRollup, Transaction, Wallet)
+
+COLUMNS = ("inflow", "outflow", "fees", "incoming_count", "outgoing_count")
+SHARD_COLUMNS = ("inflow", "incoming_count")
+
+# Running [inflow, outflow, fees, incoming_count, outgoing_count] of a day
+Totals = List
+
+
+def _new_totals() -> Totals:
+    return [decimal.Decimal("0.00")] * 3 + [0, 0]
+
+
+def _add_transaction(
+    totals: Dict[Tuple[int, date], Totals],
+    transaction_: Transaction,
+    fee: decimal.Decimal,
+) -> None:
+    day = timezone.localdate(transaction_.timestamp)
+    outgoing = totals[(transaction_.sender_id, day)]
+    outgoing[1] += transaction_.transfer_amount
+    outgoing[2] += fee
+    outgoing[4] += 1
+    incoming = totals[(transaction_.receiver_id, day)]
+    incoming[0] += transaction_.transfer_amount
+    incoming[3] += 1
+
+
+def record_transactions(
+    transactions: Iterable[Tuple[Transaction, decimal.Decimal]],
+    credited: Optional[Dict[int, BalanceShard]] = None,
+) -> None:
+    """Add paid transactions and their fees to daily rollups of their wallets.
+
+    Changed rows are upserted with one INSERT ... ON CONFLICT statement per
+    table. Callers hold the locks of the wallets, except of the receivers
+    credited on a locked shard (see wallets.shards): their incoming totals
+    go to rollups of that shard.
+    """
+    credited = credited or {}
+    totals: Dict[Tuple[int, date], Totals] = defaultdict(_new_totals)
+    for transaction_, fee in transactions:
+        _add_transaction(totals, transaction_, fee)
+
+    shard_totals: Dict[Tuple[int, date], Totals] = {}
+    for wallet_id, day in list(totals):
+        if wallet_id in credited:
+            # Credited wallets aren't senders, their totals are incoming only
+            values = totals.pop((wallet_id, day))
+            shard_totals[(credited[wallet_id].pk, day)] = [values[0], values[3]]
+    _upsert(DailyWalletRollup, "wallet_id", COLUMNS, totals)
+    _upsert(BalanceShardRollup, "shard_id", SHARD_COLUMNS, shard_totals)
+
+
+def fold_shards(wallet_id: int) -> None:
+    """Move rollups of the locked shards of a wallet to its daily rollups"""
+    shard_rollups = BalanceShardRollup.objects.filter(shard__wallet_id=wallet_id)
+    totals: Dict[Tuple[int, date], Totals] = defaultdict(_new_totals)
+    for rollup in shard_rollups:
+        day = totals[(wallet_id, rollup.day)]
+        day[0] += rollup.inflow
+        day[3] += rollup.incoming_count
+    _upsert(DailyWalletRollup, "wallet_id", COLUMNS, totals)
+    shard_rollups.delete()
+
+
+def include_shards(
+    wallet: Wallet, rollups: List[DailyWalletRollup], start: date, end: date
+) -> List[DailyWalletRollup]:
+    """Add shard rollups not folded yet to daily rollups of a wallet"""
+    if not wallet.balance_shards:
+        return rollups
+    by_day = {rollup.day: rollup for rollup in rollups}
+    shard_rollups = (
+        BalanceShardRollup.objects.filter(
+            shard__wallet=wallet, day__gte=start, day__lte=end
+        )
+        .values("day")
+        .annotate(inflow=Sum("inflow"), incoming_count=Sum("incoming_count"))
+        .order_by()
+    )
+    for shard_rollup in shard_rollups:
+        day = shard_rollup["day"]
+        rollup = by_day.setdefault(day, DailyWalletRollup(wallet=wallet, day=day))
+        rollup.inflow += shard_rollup["inflow"]
+        rollup.incoming_count += shard_rollup["incoming_count"]
+    return sorted(by_day.values(), key=lambda rollup: rollup.day)
+
+
+def _upsert(
+    model: Type[models.Model],
+    key: str,
+    columns: Tuple[str, ...],
+    totals: Dict[Tuple[int, date], Totals],
+) -> None:
+    """Add totals by (key, day) to rows of model with one statement"""
+    if not totals:
+        return
+
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    fields = [model._meta.get_field(name) for name in ("day",) + columns]
+
+    params: list = []
+    for (key_id, day), values in sorted(totals.items()):
+        params.append(key_id)
+        for field, value in zip(fields, [day] + values):
+            params.append(field.get_db_prep_save(value, connection))
+
+    names = ", ".join(quote(column) for column in (key, "day") + columns)
+    row = "(" + ", ".join(["%s"] * (len(columns) + 2)) + ")"
+    updates = ", ".join(
+        f"{quote(column)} = {table}.{quote(column)} + excluded.{quote(column)}"
+        for column in columns
+    )
+    sql = (
+        f"INSERT INTO {table} ({names}) VALUES {', '.join([row] * len(totals))} "
+        f"ON CONFLICT ({quote(key)}, {quote('day')}) DO UPDATE SET {updates}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def backfill(since: Optional[date], until: date, batch_size: int = 1000) -> int:
+    """Rebuild rollups of days in [since, until] from transaction history,
+    archived transactions included.
+
+    Transfers only change rollups of the current day, so rebuilding past
+    days is safe while the service is running. Returns number of rollups.
+    """
+    rollups = DailyWalletRollup.objects.filter(day__lte=until)
+    shard_rollups = BalanceShardRollup.objects.filter(day__lte=until)
+    if since is not None:
+        rollups = rollups.filter(day__gte=since)
+        shard_rollups = shard_rollups.filter(day__gte=since)
+    querysets = []
+    for model in (ArchivedTransaction, Transaction):
+        transactions = model.objects.filter(status="PAID", timestamp__date__lte=until)
+        if since is not None:
+            transactions = transactions.filter(timestamp__date__gte=since)
+        querysets.append(
+            transactions.only(
+                "sender_id", "receiver_id", "transfer_amount", "commission", "timestamp"
+            )
+        )
+
+    totals: Dict[Tuple[int, date], Totals] = defaultdict(_new_totals)
+    rows = chain.from_iterable(
+        queryset.iterator(chunk_size=batch_size) for queryset in querysets
+    )
+    with transaction.atomic():
+        for transaction_ in rows:
+            fee = (transaction_.transfer_amount * transaction_.commission).quantize(
+                CENT, rounding=decimal.ROUND_HALF_UP
+            )
+            _add_transaction(totals, transaction_, fee)
+        rollups.delete()
+        shard_rollups.delete()
+        DailyWalletRollup.objects.bulk_create(
+            (
+                DailyWalletRollup(
+                    wallet_id=wallet_id, day=day, **dict(zip(COLUMNS, values))
+                )
+                for (wallet_id, day), values in totals.items()
+            ),
+            batch_size=batch_size,
+        )
+    return len(totals)
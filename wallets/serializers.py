@@ -1,13 +1,32 @@
-import decimal
+import datetime
 
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import NotFound
 
+from app.instrumentation import timed_serialization
+
 from . import services
-from .models import DEFAULT_COMMISSION, WALLET_NAME_LENGTH, Transaction, Wallet
+from .fees import CENT, get_fee_engine
+from .models import (MAX_TRANSFERS_IN_BATCH, ROLLUP_DEFAULT_DAYS,
+                     ROLLUP_MAX_DAYS, WALLET_NAME_LENGTH, DailyWalletRollup,
+                     Transaction, TransferRequest, Wallet)
+
+
+class TimedDataMixin:
+    """Count building of data in serialization time of the request"""
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
 
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    pass
 
-class WalletSerializer(serializers.ModelSerializer):
+
+class WalletSerializer(TimedDataMixin, serializers.ModelSerializer):
     """Serializer for wallet validation"""
 
     type = serializers.CharField(max_length=10)
@@ -15,7 +34,8 @@ class WalletSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Wallet
-        fields = "__all__"
+        list_serializer_class = TimedListSerializer
+        exclude = ("balance_shards",)
         read_only_fields = ("name", "balance", "owner")
 
     def validate(self, attrs):
@@ -32,7 +52,7 @@ class WalletSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(TimedDataMixin, serializers.ModelSerializer):
     """Serializer for transaction validation"""
 
     receiver = serializers.CharField(
@@ -42,12 +62,17 @@ class TransactionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Transaction
+        list_serializer_class = TimedListSerializer
         fields = "__all__"
         read_only_fields = ("id", "status", "commission")
+        extra_kwargs = {"transfer_amount": {"min_value": CENT}}
 
     def validate(self, attrs):
-        receiver = services.get_specific_wallet(attrs["receiver"]["name"])
-        sender = services.get_specific_wallet(attrs["sender"]["name"])
+        wallets = services.get_wallets_by_names(
+            [attrs["receiver"]["name"], attrs["sender"]["name"]]
+        )
+        receiver = wallets.get(attrs["receiver"]["name"])
+        sender = wallets.get(attrs["sender"]["name"])
 
         if not receiver:
             raise NotFound(detail="Receiver wallet doesn't exist", code=404)
@@ -57,17 +82,93 @@ class TransactionSerializer(serializers.ModelSerializer):
         if sender.currency != receiver.currency:
             raise serializers.ValidationError("Currencies of wallets are not equal")
 
-        ratio = round(decimal.Decimal(1.00 + DEFAULT_COMMISSION), 2)
-        text_exep = "Sender wallet doesn't have enough funds for transaction"
-
-        if sender.owner == receiver.owner:
-            if sender.balance < attrs["transfer_amount"]:
-                raise serializers.ValidationError(text_exep)
-        else:
-            if sender.balance < attrs["transfer_amount"] * ratio:
-                raise serializers.ValidationError(text_exep)
+        price = get_fee_engine().price_transfer(
+            sender, receiver, attrs["transfer_amount"]
+        )
+        if sender.balance < price.total:
+            raise serializers.ValidationError(
+                "Sender wallet doesn't have enough funds for transaction"
+            )
 
         attrs["receiver"] = receiver
         attrs["sender"] = sender
 
         return attrs
+
+
+class TransferRequestSerializer(TimedDataMixin, serializers.ModelSerializer):
+    """Serializer for status of queued transfer"""
+
+    class Meta:
+        model = TransferRequest
+        fields = (
+            "id",
+            "sender",
+            "receiver",
+            "transfer_amount",
+            "status",
+            "error",
+            "transaction",
+            "created_on",
+            "processed_on",
+        )
+
+
+class TransferSerializer(serializers.Serializer):
+    """Serializer for one transfer of a batch"""
+
+    sender = serializers.CharField(max_length=WALLET_NAME_LENGTH)
+    receiver = serializers.CharField(max_length=WALLET_NAME_LENGTH)
+    transfer_amount = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=CENT
+    )
+
+
+class TransactionBatchSerializer(serializers.Serializer):
+    """Serializer for batch of transfers validation"""
+
+    transactions = TransferSerializer(many=True, allow_empty=False)
+
+    def validate_transactions(self, value):
+        if len(value) > MAX_TRANSFERS_IN_BATCH:
+            raise serializers.ValidationError(
+                f"Batch can't have more than {MAX_TRANSFERS_IN_BATCH} transfers"
+            )
+        return value
+
+
+class DailyWalletRollupSerializer(TimedDataMixin, serializers.ModelSerializer):
+    """Serializer for daily totals of wallet"""
+
+    class Meta:
+        model = DailyWalletRollup
+        list_serializer_class = TimedListSerializer
+        fields = (
+            "day",
+            "inflow",
+            "outflow",
+            "fees",
+            "incoming_count",
+            "outgoing_count",
+        )
+
+
+class RollupRangeSerializer(serializers.Serializer):
+    """Serializer for range of days query parameters"""
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault("end", timezone.localdate())
+        attrs.setdefault(
+            "start",
+            attrs["end"] - datetime.timedelta(days=ROLLUP_DEFAULT_DAYS - 1),
+        )
+        if attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("Start can't be after end")
+        if (attrs["end"] - attrs["start"]).days >= ROLLUP_MAX_DAYS:
+            raise serializers.ValidationError(
+                f"Range can't be longer than {ROLLUP_MAX_DAYS} days"
+            )
+        return attrs
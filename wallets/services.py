@@ -1,39 +1,85 @@
 import decimal
+from collections import defaultdict
 from collections.abc import Iterable
-from typing import Any, List, Union
+from datetime import date, datetime
+from itertools import takewhile
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import transaction
-from django.db.models import Q
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, DecimalField, F, Min, Q, Value, When
 from django.http import Http404
+from django.utils import timezone
 
 from accounts.models import User
+from app.db.routers import current_read_db, read_from_replica
 
-from .models import (BONUSES, DEFAULT_COMMISSION, MAX_NUMBER_OF_WALLETS,
-                     Transaction, Wallet)
+from . import caching, ledger, rollups, shards
+from .fees import get_fee_engine
+from .history import TransactionHistory
+from .models import (
+    BONUSES,
+    MAX_NUMBER_OF_WALLETS,
+    ArchivedTransaction,
+    BalanceShard,
+    DailyWalletRollup,
+    IdempotencyKey,
+    Transaction,
+    TransferRequest,
+    Wallet,
+)
 
+# Allocated names to try before giving up on a collision with an old name
+WALLET_NAME_ATTEMPTS = 5
 
+
+@read_from_replica
 def get_user_wallets(user: User) -> Iterable[Wallet]:
-    user_wallets = user.wallet_set.all()
-    return user_wallets
+    return caching.get_or_load(
+        caching.user_wallets_key(user.pk),
+        lambda: shards.include(list(user.wallet_set.all())),
+    )
+
+
+@read_from_replica
+def get_user_wallet_rows(user: User) -> List[dict]:
+    """Wallets of user as values() rows of all their fields"""
+    return caching.get_or_load(
+        caching.user_wallet_rows_key(user.pk),
+        lambda: shards.include_rows(list(user.wallet_set.values())),
+    )
 
 
+@read_from_replica
 def get_specific_user_wallet(user: User, name: str) -> Union[Wallet, Http404]:
-    try:
-        return user.wallet_set.get(name=name)
-    except Wallet.DoesNotExist:
-        raise Http404
+    def load() -> Wallet:
+        try:
+            wallet = user.wallet_set.get(name=name)
+        except Wallet.DoesNotExist:
+            raise Http404
+        return shards.include([wallet])[0]
+
+    return caching.get_or_load(caching.wallet_key(user.pk, name), load)
 
 
 def get_specific_wallet(name: str) -> Union[Wallet, Http404]:
     try:
-        return Wallet.objects.get(name=name)
+        wallet = Wallet.objects.get(name=name)
     except Wallet.DoesNotExist:
         raise Http404
+    return shards.include([wallet])[0]
+
+
+def get_wallets_by_names(names: Iterable[str]) -> Dict[str, Wallet]:
+    wallets = shards.include(list(Wallet.objects.filter(name__in=names).order_by()))
+    return {wallet.name: wallet for wallet in wallets}
 
 
 def delete_specific_wallet(wallet: Wallet) -> None:
-    wallet.delete()
+    with transaction.atomic():
+        wallet.delete()
+        caching.invalidate_wallets([wallet])
 
 
 def create_wallet(user: User, validated_data) -> Wallet:
@@ -44,73 +90,479 @@ def create_wallet(user: User, validated_data) -> Wallet:
             f"You can't have more than {MAX_NUMBER_OF_WALLETS} wallets"
         )
 
-    name = Wallet.create_wallet_name()
+    for _ in range(WALLET_NAME_ATTEMPTS - 1):
+        name = Wallet.create_wallet_name()
+        try:
+            return _create_wallet(user, name, validated_data)
+        except IntegrityError:
+            # Wallets created before wallets.names have random names
+            if not Wallet.objects.filter(name=name).exists():
+                raise
+    return _create_wallet(user, Wallet.create_wallet_name(), validated_data)
+
 
+@transaction.atomic
+def _create_wallet(user: User, name: str, validated_data) -> Wallet:
     wallet = Wallet.objects.create(
         name=name,
         **validated_data,
         balance=BONUSES[validated_data["currency"]],
         owner=user,
     )
+    ledger.open_wallet(wallet)
+    caching.invalidate_wallets([wallet])
     return wallet
 
 
-def create_transaction(user: User, validated_data: dict) -> Transaction:
+def create_transaction(
+    user: User, validated_data: dict, idempotency_key: Optional[str] = None
+) -> Transaction:
     sender = validated_data["sender"]
     receiver = validated_data["receiver"]
+    transfer_amount = validated_data["transfer_amount"]
 
-    if sender.owner != user:
-        raise ValidationError(f"You have no wallet: {sender.name}")
+    error = _transfer_error(sender, receiver, transfer_amount, user.pk)
+    if error is not None:
+        raise ValidationError(error)
+
+    try:
+        return _pay(user, sender, receiver, transfer_amount, idempotency_key)
+    except IntegrityError:
+        # A concurrent retry with the same key committed first
+        if idempotency_key is None:
+            raise
+        transaction_ = get_idempotent_transaction(user, idempotency_key)
+        if transaction_ is None:
+            raise
+        return transaction_
 
-    if sender.owner == receiver.owner:
-        commission = 0.00
-    else:
-        commission = DEFAULT_COMMISSION
 
-    ratio = round(decimal.Decimal(1.00 + commission), 2)
-    transfer_amount_with_fee = validated_data["transfer_amount"] * ratio
+@transaction.atomic
+def _pay(
+    user: User,
+    sender: Wallet,
+    receiver: Wallet,
+    transfer_amount: decimal.Decimal,
+    idempotency_key: Optional[str],
+) -> Transaction:
+    """Make a validated transfer of create_transaction"""
+    price = get_fee_engine().price_transfer(sender, receiver, transfer_amount)
+    wallets = lock_wallets(Q(pk=sender.pk) | Q(pk=receiver.pk, balance_shards=0))
+    credited = {}
+    if receiver.pk not in wallets:
+        credited = shards.lock_random([receiver])
+    shards.include([wallets[sender.pk]])
+    if wallets[sender.pk].balance < price.total:
+        raise ValidationError("Sender wallet doesn't have enough funds for transaction")
 
     transaction_ = Transaction.objects.create(
         sender=sender,
         receiver=receiver,
-        commission=commission,
-        transfer_amount=validated_data["transfer_amount"],
-        status="FAILED",
+        commission=price.rate,
+        transfer_amount=transfer_amount,
+        status="PAID",
+    )
+    if idempotency_key is not None:
+        IdempotencyKey.objects.create(
+            user=user, key=idempotency_key, transaction=transaction_
+        )
+    ledger.record_transactions([(transaction_, price.fee)])
+    rollups.record_transactions([(transaction_, price.fee)], credited)
+    deltas: Dict[int, decimal.Decimal] = defaultdict(decimal.Decimal)
+    deltas[sender.pk] -= price.total
+    deltas[receiver.pk] += transfer_amount
+    apply_balance_deltas(deltas, credited)
+    caching.invalidate_wallets([sender, receiver])
+    return transaction_
+
+
+def get_idempotent_transaction(user: User, key: str) -> Optional[Transaction]:
+    record = (
+        IdempotencyKey.objects.select_related(
+            "transaction__sender", "transaction__receiver"
+        )
+        .filter(user=user, key=key)
+        .first()
     )
+    return record.transaction if record is not None else None
+
+
+def purge_idempotency_keys(older_than: datetime, batch_size: int) -> int:
+    """Delete expired idempotency keys in batches, return number deleted"""
+    deleted = 0
+    expired = IdempotencyKey.objects.filter(created_on__lt=older_than)
+    while True:
+        ids = list(expired.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+
+
+def archive_transactions(older_than: datetime, batch_size: int) -> int:
+    """Move transactions older than older_than to the archive in batches.
+
+    Transactions are moved in id order and archiving stops at the first
+    newer one, so archived ids are always smaller than the ids left in the
+    hot table. Returns number of archived transactions.
+    """
+    archived = 0
+    fields = [field.attname for field in ArchivedTransaction._meta.concrete_fields]
+    while True:
+        with transaction.atomic():
+            rows = list(Transaction.objects.order_by("id").values(*fields)[:batch_size])
+            rows = list(takewhile(lambda row: row["timestamp"] < older_than, rows))
+            if not rows:
+                return archived
+            ArchivedTransaction.objects.bulk_create(
+                ArchivedTransaction(**row) for row in rows
+            )
+            # Only rows that were copied, others may have appeared in between
+            Transaction.objects.filter(id__in=[row["id"] for row in rows]).delete()
+        archived += len(rows)
+        if len(rows) < batch_size:
+            return archived
+
+
+def _transfer_error(
+    sender: Optional[Wallet],
+    receiver: Optional[Wallet],
+    amount: decimal.Decimal,
+    user_id: int,
+) -> Optional[str]:
+    """Reason a transfer can't be made regardless of balances, if any"""
+    if amount <= 0:
+        return "Transfer amount must be positive"
+    if receiver is None:
+        return "Receiver wallet doesn't exist"
+    if sender is None:
+        return "Sender wallet doesn't exist"
+    if sender.owner_id != user_id:
+        return f"You have no wallet: {sender.name}"
+    if sender.currency != receiver.currency:
+        return "Currencies of wallets are not equal"
+    return None
+
+
+def create_transactions_batch(user: User, transfers: List[dict]) -> List[dict]:
+    """Execute a list of transfers in one database transaction.
+
+    Every transfer is checked against the balances left by the previous
+    ones; failed transfers are reported by index and don't stop the batch.
+    """
+    return execute_transfers(transfers, [user.pk] * len(transfers))
+
+
+def execute_transfers(transfers: List[dict], user_ids: List[int]) -> List[dict]:
+    """Execute transfers made by users with user_ids in one transaction"""
+    senders = {transfer["sender"] for transfer in transfers}
+    receivers = {transfer["receiver"] for transfer in transfers}
+    results = []
+    transactions = []
+    fees = []
+    fee_engine = get_fee_engine()
 
     with transaction.atomic():
-        sender.balance = sender.balance - transfer_amount_with_fee
-        sender.save()
-        receiver.balance = receiver.balance + validated_data["transfer_amount"]
-        receiver.save()
-        transaction_.status = "PAID"
+        wallets, credited = _lock_transfer_wallets(senders, receivers)
+        prices = fee_engine.price_batch(
+            fee_engine.transfer_key(
+                wallets[transfer["sender"]],
+                wallets[transfer["receiver"]],
+                transfer["transfer_amount"],
+            )
+            for transfer in transfers
+            if wallets.keys() >= {transfer["sender"], transfer["receiver"]}
+        )
+        balances = {wallet.pk: wallet.balance for wallet in wallets.values()}
+        deltas: Dict[int, decimal.Decimal] = defaultdict(decimal.Decimal)
+
+        for index, (transfer, user_id) in enumerate(zip(transfers, user_ids)):
+            sender = wallets.get(transfer["sender"])
+            receiver = wallets.get(transfer["receiver"])
+            transfer_amount = transfer["transfer_amount"]
+
+            error = _transfer_error(sender, receiver, transfer_amount, user_id)
+            if error is None:
+                price = prices[
+                    fee_engine.transfer_key(sender, receiver, transfer_amount)
+                ]
+                if balances[sender.pk] < price.total:
+                    error = "Sender wallet doesn't have enough funds for transaction"
+
+            if error is not None:
+                results.append({"index": index, "status": "FAILED", "error": error})
+                continue
+
+            balances[sender.pk] -= price.total
+            balances[receiver.pk] += transfer_amount
+            deltas[sender.pk] -= price.total
+            deltas[receiver.pk] += transfer_amount
+            transactions.append(
+                Transaction(
+                    sender=sender,
+                    receiver=receiver,
+                    commission=price.rate,
+                    transfer_amount=transfer_amount,
+                    status="PAID",
+                )
+            )
+            fees.append(price.fee)
+            results.append({"index": index, "status": "PAID"})
+
+        _save_transactions(transactions)
+        ledger.record_transactions(zip(transactions, fees))
+        rollups.record_transactions(zip(transactions, fees), credited)
+        apply_balance_deltas(deltas, credited)
+        caching.invalidate_wallets(
+            wallet for wallet in wallets.values() if wallet.pk in deltas
+        )
+
+    paid = iter(transactions)
+    for result in results:
+        if result["status"] == "PAID":
+            result["id"] = next(paid).pk
+    return results
+
+
+def _lock_transfer_wallets(
+    senders: Iterable[str], receivers: Iterable[str]
+) -> Tuple[Dict[str, Wallet], Dict[int, BalanceShard]]:
+    """Lock wallets of a batch by name, return them and shards of credited ones.
+
+    Sharded receivers are credited on a random locked shard instead of their
+    row, which stays unlocked. Locked wallets include their shards.
+    """
+    locked = lock_wallets(Q(name__in=senders) | Q(name__in=receivers, balance_shards=0))
+    wallets = {wallet.name: wallet for wallet in locked.values()}
+    missing = (set(senders) | set(receivers)) - wallets.keys()
+    if missing:
+        unlocked = Wallet.objects.filter(name__in=missing)
+        wallets.update((wallet.name, wallet) for wallet in unlocked)
+    credited = shards.lock_random(
+        wallet for wallet in wallets.values() if wallet.pk not in locked
+    )
+    shards.include(list(locked.values()))
+    return wallets, credited
+
+
+def _save_transactions(transactions: List[Transaction]) -> None:
+    if connection.features.can_return_rows_from_bulk_insert:
+        Transaction.objects.bulk_create(transactions)
+        return
+    # Ledger entries need primary keys of the transactions
+    for transaction_ in transactions:
         transaction_.save()
 
-    return transaction_
 
+def enqueue_transfer(
+    user: User, validated_data: dict, idempotency_key: Optional[str] = None
+) -> TransferRequest:
+    """Queue a transfer for the workers, see process_transfer_requests"""
+    sender = validated_data["sender"]
 
-def get_user_transactions(user: User) -> List[dict]:
-    user_wallets = user.wallet_set.all()
-    user_transactions = Transaction.objects.filter(
-        Q(receiver__in=user_wallets) | Q(sender__in=user_wallets)
+    if sender.owner_id != user.pk:
+        raise ValidationError(f"You have no wallet: {sender.name}")
+    if validated_data["transfer_amount"] <= 0:
+        raise ValidationError("Transfer amount must be positive")
+
+    try:
+        with transaction.atomic():
+            return TransferRequest.objects.create(
+                user=user,
+                sender=sender.name,
+                receiver=validated_data["receiver"].name,
+                transfer_amount=validated_data["transfer_amount"],
+                idempotency_key=idempotency_key,
+            )
+    except IntegrityError:
+        # A concurrent retry with the same key committed first
+        if idempotency_key is None:
+            raise
+        request = get_idempotent_transfer_request(user, idempotency_key)
+        if request is None:
+            raise
+        return request
+
+
+def get_idempotent_transfer_request(user: User, key: str) -> Optional[TransferRequest]:
+    return TransferRequest.objects.filter(user=user, idempotency_key=key).first()
+
+
+def get_transfer_request(
+    user: User, request_id: int
+) -> Union[TransferRequest, Http404]:
+    # Read from the primary: clients poll right after queueing
+    try:
+        return TransferRequest.objects.get(user=user, id=request_id)
+    except TransferRequest.DoesNotExist:
+        raise Http404
+
+
+def process_transfer_requests(batch_size: int) -> int:
+    """Execute up to batch_size queued transfers in one transaction.
+
+    Workers claim the oldest queued requests no other worker has locked.
+    Requests of a sender wallet run in the order they were queued: one
+    whose sender has an older request claimed by another worker stays
+    queued for a later batch. Returns number of processed requests.
+    """
+    with transaction.atomic():
+        claimed = list(
+            TransferRequest.objects.select_for_update(skip_locked=True)
+            .filter(status="QUEUED")
+            .order_by("id")[:batch_size]
+        )
+        if not claimed:
+            return 0
+
+        older = (
+            TransferRequest.objects.filter(
+                status="QUEUED",
+                sender__in={request.sender for request in claimed},
+                id__lt=claimed[-1].id,
+            )
+            .exclude(id__in=[request.id for request in claimed])
+            .values("sender")
+            .annotate(first=Min("id"))
+            .order_by()
+        )
+        blocked = {row["sender"]: row["first"] for row in older}
+        ready = [
+            request
+            for request in claimed
+            if request.id < blocked.get(request.sender, request.id + 1)
+        ]
+        if not ready:
+            return 0
+
+        results = execute_transfers(
+            [
+                {
+                    "sender": request.sender,
+                    "receiver": request.receiver,
+                    "transfer_amount": request.transfer_amount,
+                }
+                for request in ready
+            ],
+            [request.user_id for request in ready],
+        )
+        processed_on = timezone.now()
+        for request, result in zip(ready, results):
+            request.status = result["status"]
+            request.error = result.get("error", "")
+            request.transaction_id = result.get("id")
+            request.processed_on = processed_on
+        TransferRequest.objects.bulk_update(
+            ready, ["status", "error", "transaction", "processed_on"]
+        )
+    return len(ready)
+
+
+def lock_wallets(*args: Q, **filters: Any) -> Dict[int, Wallet]:
+    """Lock wallet rows for the rest of the current transaction.
+
+    Rows are always locked in primary key order, so two transfers between
+    the same wallets in opposite directions can't deadlock.
+    """
+    wallets = Wallet.objects.select_for_update().filter(*args, **filters).order_by("pk")
+    return {wallet.pk: wallet for wallet in wallets}
+
+
+def apply_balance_deltas(
+    deltas: Dict[int, decimal.Decimal],
+    credited: Optional[Dict[int, BalanceShard]] = None,
+) -> None:
+    """Add deltas to wallet balances with a single UPDATE statement.
+
+    Deltas of wallets in credited go to their locked shard instead.
+    """
+    credited = credited or {}
+    shards.credit(
+        credited, {pk: delta for pk, delta in deltas.items() if pk in credited}
+    )
+    deltas = {pk: delta for pk, delta in deltas.items() if pk not in credited}
+    if not deltas:
+        return
+    Wallet.objects.filter(pk__in=deltas).update(
+        balance=F("balance")
+        + Case(
+            *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+        modified_on=timezone.now(),
+    )
+
+
+def _history(filter_: Q) -> TransactionHistory:
+    alias = current_read_db()
+    return TransactionHistory(
+        Transaction.objects.using(alias)
+        .select_related("sender", "receiver")
+        .filter(filter_),
+        ArchivedTransaction.objects.using(alias)
+        .select_related("sender", "receiver")
+        .filter(filter_),
     )
-    return user_transactions
 
 
-def get_specific_transaction(user: User, transaction_id: int) -> Union[Transaction, Http404]:
+@read_from_replica
+def get_user_transactions(user: User) -> TransactionHistory:
     user_wallets = user.wallet_set.all()
+    return _history(Q(receiver__in=user_wallets) | Q(sender__in=user_wallets))
+
+
+@read_from_replica
+def get_specific_transaction(
+    user: User, transaction_id: int
+) -> Union[Transaction, ArchivedTransaction, Http404]:
+    user_wallets = user.wallet_set.all()
+    transactions = _history(Q(receiver__in=user_wallets) | Q(sender__in=user_wallets))
     try:
-        transaction = Transaction.objects.filter(
-            Q(receiver__in=user_wallets) | Q(sender__in=user_wallets)
-        ).get(id=transaction_id)
-        return transaction
+        return transactions.hot.get(id=transaction_id)
     except Transaction.DoesNotExist:
+        pass
+    if transaction_id > transactions.watermark:
+        raise Http404
+    try:
+        return transactions.archive.get(id=transaction_id)
+    except ArchivedTransaction.DoesNotExist:
         raise Http404
 
 
-def get_wallet_transactions(user: User, name: str) -> List[Transaction]:
+@read_from_replica
+def get_wallet_transactions(user: User, name: str) -> TransactionHistory:
     wallet = user.wallet_set.get(name=name)
-    wallet_transactions = Transaction.objects.filter(
-        Q(receiver__name=wallet.name) | Q(sender__name=wallet.name)
-    )
-    return wallet_transactions
+    return _history(Q(receiver=wallet) | Q(sender=wallet))
+
+
+EXPORT_FIELDS = (
+    "id",
+    "sender__name",
+    "receiver__name",
+    "transfer_amount",
+    "commission",
+    "status",
+    "timestamp",
+)
+
+
+@read_from_replica
+def get_wallet_transactions_export(user: User, name: str) -> Iterator[tuple]:
+    """Iterate over wallet history rows in chunks.
+
+    Rows are tuples of EXPORT_FIELDS. On PostgreSQL the rows are read with
+    a server-side cursor, so memory use doesn't depend on history size.
+    """
+    wallet = get_specific_user_wallet(user, name)
+    rows = _history(Q(receiver=wallet) | Q(sender=wallet)).values_list(*EXPORT_FIELDS)
+    return rows.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+@read_from_replica
+def get_wallet_rollups(
+    user: User, name: str, start: date, end: date
+) -> List[DailyWalletRollup]:
+    wallet = get_specific_user_wallet(user, name)
+    days = DailyWalletRollup.objects.filter(
+        wallet=wallet, day__gte=start, day__lte=end
+    ).order_by("day")
+    return rollups.include_shards(wallet, list(days), start, end)
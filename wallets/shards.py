@@ -0,0 +1,152 @@
+"""Sharded balances of hot receiver wallets.
+
+Every transfer locks the row of its receiver, so transfers to a wallet
+receiving a large share of them wait for each other. A wallet with
+balance_shards = N takes credits on N BalanceShard rows instead: a transfer
+locks one of them at random and leaves the wallet row alone. Debits still
+lock the wallet row and change Wallet.balance.
+
+The balance of a wallet is Wallet.balance plus the balances of its shards
+and its modified_on is the latest of the row and the shards, as reported
+by include() and include_rows(). Daily totals of the credits are kept per
+shard too, see rollups.record_transactions. fold() moves shard balances
+and totals back to the wallet without changing what is reported. Wallet
+rows are always locked before shard rows.
+"""
+import decimal
+import random
+from typing import Dict, Iterable, List
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Max, Q, Sum, Value, When
+from django.utils import timezone
+
+from . import caching, rollups
+from .models import BalanceShard, Wallet
+
+
+def get_totals(wallet_ids: Iterable[int]) -> Dict[int, dict]:
+    """Sum of balances and latest modified_on of shards by wallet id"""
+    wallet_ids = list(wallet_ids)
+    if not wallet_ids:
+        return {}
+    rows = (
+        BalanceShard.objects.filter(wallet_id__in=wallet_ids)
+        .values("wallet_id")
+        .annotate(balance=Sum("balance"), modified_on=Max("modified_on"))
+        .order_by()
+    )
+    return {row["wallet_id"]: row for row in rows}
+
+
+def include(wallets: List[Wallet]) -> List[Wallet]:
+    """Add shards to balance and modified_on of wallets"""
+    totals = get_totals(wallet.pk for wallet in wallets if wallet.balance_shards)
+    for wallet in wallets:
+        total = totals.get(wallet.pk)
+        if total is not None:
+            wallet.balance += total["balance"]
+            wallet.modified_on = max(wallet.modified_on, total["modified_on"])
+    return wallets
+
+
+def include_rows(rows: List[dict]) -> List[dict]:
+    """Add shards to balance and modified_on of wallet values() rows"""
+    totals = get_totals(row["id"] for row in rows if row["balance_shards"])
+    for row in rows:
+        total = totals.get(row["id"])
+        if total is not None:
+            row["balance"] += total["balance"]
+            row["modified_on"] = max(row["modified_on"], total["modified_on"])
+    return rows
+
+
+def lock_random(wallets: Iterable[Wallet]) -> Dict[int, BalanceShard]:
+    """Lock a random shard of every wallet for the rest of the transaction"""
+    query = Q()
+    for wallet in wallets:
+        # Shard 0 exists even if balance_shards was read before it was set
+        index = random.randrange(max(wallet.balance_shards, 1))
+        query |= Q(wallet_id=wallet.pk, index=index)
+    if not query:
+        return {}
+    shards = BalanceShard.objects.select_for_update().filter(query).order_by("pk")
+    return {shard.wallet_id: shard for shard in shards}
+
+
+def lock_all(wallet_id: int) -> List[BalanceShard]:
+    """Lock all shards of a locked wallet, waiting for credits in progress"""
+    return list(
+        BalanceShard.objects.select_for_update()
+        .filter(wallet_id=wallet_id)
+        .order_by("pk")
+    )
+
+
+def credit(shards: Dict[int, BalanceShard], deltas: Dict[int, decimal.Decimal]) -> None:
+    """Add deltas by wallet id to locked shards with a single UPDATE statement"""
+    if not deltas:
+        return
+    BalanceShard.objects.filter(
+        pk__in=[shards[wallet_id].pk for wallet_id in deltas]
+    ).update(
+        balance=F("balance")
+        + Case(
+            *[
+                When(pk=shards[wallet_id].pk, then=Value(delta))
+                for wallet_id, delta in deltas.items()
+            ],
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+        modified_on=timezone.now(),
+    )
+
+
+def set_shards(wallet_id: int, count: int) -> None:
+    """Take credits of a wallet on count shards, 0 turns sharding off.
+
+    Shard rows are never deleted, so a transfer that read the old count
+    still finds its shard; with sharding off, the next fold() moves such
+    credits to the wallet.
+    """
+    with transaction.atomic():
+        wallet = Wallet.objects.select_for_update().get(pk=wallet_id)
+        existing = wallet.shards.count()
+        BalanceShard.objects.bulk_create(
+            BalanceShard(wallet=wallet, index=index) for index in range(existing, count)
+        )
+        Wallet.objects.filter(pk=wallet_id).update(balance_shards=count)
+        caching.invalidate_wallets([wallet])
+        if not count:
+            fold(wallet_id)
+
+
+def fold(wallet_id: int) -> decimal.Decimal:
+    """Move shard balances and rollups of a wallet to it, return the balance"""
+    with transaction.atomic():
+        wallet = Wallet.objects.select_for_update().get(pk=wallet_id)
+        shards = lock_all(wallet_id)
+        rollups.fold_shards(wallet_id)
+        total = sum((shard.balance for shard in shards), decimal.Decimal("0.00"))
+        if not total:
+            return total
+        BalanceShard.objects.filter(pk__in=[shard.pk for shard in shards]).update(
+            balance=0
+        )
+        updates = {"balance": F("balance") + total}
+        if not wallet.balance_shards:
+            # Credits that raced with turning sharding off weren't reported
+            updates["modified_on"] = timezone.now()
+            caching.invalidate_wallets([wallet])
+        Wallet.objects.filter(pk=wallet_id).update(**updates)
+    return total
+
+
+def fold_all() -> int:
+    """Fold every wallet with a non-zero shard, return number of wallets"""
+    wallet_ids = (
+        BalanceShard.objects.exclude(balance=0)
+        .values_list("wallet_id", flat=True)
+        .distinct()
+    )
+    return sum(1 for wallet_id in list(wallet_ids) if fold(wallet_id))
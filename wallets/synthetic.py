@@ -0,0 +1,396 @@
+"""Synthetic datasets of users, wallets and transfers.
+
+Transfers are simulated in memory with the fee engine, so every wallet
+balance equals its opening balance plus its history, and the ledger and
+daily rollups agree with the transactions. Wallet rows are written with
+their final balances before the transactions referencing them, so the
+seeded simulation is run twice: once for the balances and once for the
+rows. All rows get explicit primary keys and are written with
+wallets.bulk, in one database transaction.
+"""
+import decimal
+import itertools
+import math
+import random
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import (Dict, Iterable, Iterator, List, NamedTuple, Optional,
+                    Sequence)
+
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.models import User
+
+from . import bulk
+from .fees import get_fee_engine
+from .models import (CARDS, CURRENCIES, DailyWalletRollup, LedgerEntry,
+                     Transaction, Wallet, WalletNameBlock)
+from .names import BLOCK_SIZE, encode
+
+MIN_OPENING_BALANCE = 1_000_00
+MAX_OPENING_BALANCE = 100_000_00
+MAX_TRANSFER_AMOUNT = 1_000_00
+# Draws per requested transfer before giving up on broke wallets
+MAX_ATTEMPTS = 20
+
+USER_FIELDS = (
+    "id",
+    "password",
+    "last_login",
+    "is_superuser",
+    "first_name",
+    "last_name",
+    "is_staff",
+    "is_active",
+    "date_joined",
+    "username",
+    "email",
+)
+WALLET_FIELDS = (
+    "id",
+    "name",
+    "type",
+    "currency",
+    "balance",
+    "created_on",
+    "modified_on",
+    "owner_id",
+    "balance_shards",
+)
+TRANSACTION_FIELDS = (
+    "id",
+    "sender_id",
+    "receiver_id",
+    "transfer_amount",
+    "commission",
+    "status",
+    "timestamp",
+)
+ENTRY_FIELDS = ("id", "wallet_id", "transaction_id", "kind", "amount", "created_on")
+ROLLUP_FIELDS = (
+    "id",
+    "wallet_id",
+    "day",
+    "inflow",
+    "outflow",
+    "fees",
+    "incoming_count",
+    "outgoing_count",
+)
+
+
+class Scale(NamedTuple):
+    users: int
+    wallets_per_user: int
+    transactions: int
+
+
+SCALES = {
+    "small": Scale(users=1_000, wallets_per_user=3, transactions=10_000),
+    "medium": Scale(users=100_000, wallets_per_user=3, transactions=1_000_000),
+    "large": Scale(users=1_000_000, wallets_per_user=3, transactions=10_000_000),
+}
+
+
+class Transfer(NamedTuple):
+    """Simulated transfer between wallet indexes, amounts in cents"""
+
+    sender: int
+    receiver: int
+    amount: int
+    rate: decimal.Decimal
+    fee: int
+
+
+def _money(cents: int) -> decimal.Decimal:
+    return decimal.Decimal(cents).scaleb(-2)
+
+
+def _next_id(model: models.Model) -> int:
+    return (model.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[List]:
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class DailyTotals:
+    """Daily rollups of transfers, which are generated in time order.
+
+    Only totals of the current day are kept; they are returned as rollup
+    rows when a transfer of the next day arrives or on flush().
+    """
+
+    def __init__(self, first_id: int):
+        self.next_id = first_id
+        self.day: Optional[date] = None
+        # wallet id -> [inflow, outflow, fees, incoming count, outgoing count]
+        self.totals: Dict[int, List[int]] = defaultdict(lambda: [0, 0, 0, 0, 0])
+
+    def add(
+        self, day: date, sender: int, receiver: int, transfer: Transfer
+    ) -> List[bulk.Row]:
+        rows = self.flush() if day != self.day else []
+        self.day = day
+        outgoing = self.totals[sender]
+        outgoing[1] += transfer.amount
+        outgoing[2] += transfer.fee
+        outgoing[4] += 1
+        incoming = self.totals[receiver]
+        incoming[0] += transfer.amount
+        incoming[3] += 1
+        return rows
+
+    def flush(self) -> List[bulk.Row]:
+        rows = []
+        for wallet_id, (inflow, outflow, fees, incoming, outgoing) in sorted(
+            self.totals.items()
+        ):
+            rows.append(
+                (self.next_id, wallet_id, self.day, _money(inflow), _money(outflow))
+                + (_money(fees), incoming, outgoing)
+            )
+            self.next_id += 1
+        self.totals.clear()
+        return rows
+
+
+class DatasetGenerator:
+    """Generate scale.users users with scale.wallets_per_user wallets each and
+    up to scale.transactions transfers between wallets of the same currency.
+
+    The same scale, seed and options always give the same dataset, apart
+    from primary keys and wallet names, which continue after existing rows.
+    """
+
+    def __init__(
+        self,
+        scale: Scale,
+        seed: int = 0,
+        currencies: Optional[Sequence[str]] = None,
+        days: int = 365,
+        password: str = "password",
+        batch_size: int = 10_000,
+    ):
+        self.scale = scale
+        self.seed = seed
+        self.currencies = list(currencies or [currency for currency, _ in CURRENCIES])
+        self.days = days
+        self.password = password
+        self.batch_size = batch_size
+
+    def transfers(
+        self,
+        rng: random.Random,
+        currencies: List[str],
+        owners: List[int],
+        balances: List[int],
+    ) -> Iterator[Transfer]:
+        """Simulate transfers, updating balances of wallet indexes in place"""
+        engine = get_fee_engine()
+        by_currency: Dict[str, List[int]] = defaultdict(list)
+        for index, currency in enumerate(currencies):
+            by_currency[currency].append(index)
+
+        made = 0
+        for _ in range(self.scale.transactions * MAX_ATTEMPTS):
+            if made == self.scale.transactions:
+                return
+            sender = rng.randrange(len(currencies))
+            group = by_currency[currencies[sender]]
+            receiver = group[rng.randrange(len(group))]
+            amount = rng.randint(1, MAX_TRANSFER_AMOUNT)
+            if receiver == sender:
+                continue
+            price = engine.price(
+                currencies[sender], owners[sender] == owners[receiver], _money(amount)
+            )
+            fee = int(price.fee.scaleb(2))
+            if balances[sender] < amount + fee:
+                continue
+            balances[sender] -= amount + fee
+            balances[receiver] += amount
+            made += 1
+            yield Transfer(sender, receiver, amount, price.rate, fee)
+
+    def generate(self) -> Dict[str, int]:
+        """Write the dataset and return numbers of written rows"""
+        rng = random.Random(self.seed)
+        wallet_count = self.scale.users * self.scale.wallets_per_user
+        currencies = [rng.choice(self.currencies) for _ in range(wallet_count)]
+        types = [rng.choice(CARDS)[0] for _ in range(wallet_count)]
+        opening = [
+            rng.randint(MIN_OPENING_BALANCE, MAX_OPENING_BALANCE)
+            for _ in range(wallet_count)
+        ]
+        owners = [index // self.scale.wallets_per_user for index in range(wallet_count)]
+        transfer_seed = rng.getrandbits(64)
+
+        balances = opening.copy()
+        transfer_count = sum(
+            1
+            for _ in self.transfers(
+                random.Random(transfer_seed), currencies, owners, balances
+            )
+        )
+
+        connection = connections[DEFAULT_DB_ALIAS]
+        writer = bulk.get_writer(connection, self.batch_size)
+        now = timezone.now()
+        start = now - timedelta(days=self.days)
+
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                # Check foreign keys per statement instead of queuing them
+                with connection.cursor() as cursor:
+                    cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+            first_user_id = _next_id(User)
+            password = make_password(self.password)
+            self._write(
+                writer,
+                User,
+                USER_FIELDS,
+                (
+                    (user_id, password, None, False, "", "", False, True, start)
+                    + (None, f"user{user_id}@example.com")
+                    for user_id in range(
+                        first_user_id, first_user_id + self.scale.users
+                    )
+                ),
+            )
+
+            names = self._reserve_names(writer, wallet_count, now)
+            first_wallet_id = _next_id(Wallet)
+            self._write(
+                writer,
+                Wallet,
+                WALLET_FIELDS,
+                (
+                    (
+                        first_wallet_id + index,
+                        next(names),
+                        types[index],
+                        currencies[index],
+                        _money(balances[index]),
+                        start.date(),
+                        now,
+                        first_user_id + owners[index],
+                        0,
+                    )
+                    for index in range(wallet_count)
+                ),
+            )
+
+            entry_id = _next_id(LedgerEntry)
+            self._write(
+                writer,
+                LedgerEntry,
+                ENTRY_FIELDS,
+                (
+                    (entry_id + index, first_wallet_id + index, None)
+                    + ("OPENING", _money(opening[index]), start)
+                    for index in range(wallet_count)
+                ),
+            )
+            entry_id += wallet_count
+
+            transaction_id = _next_id(Transaction)
+            span = (now - start) / max(transfer_count, 1)
+            transfers = self.transfers(
+                random.Random(transfer_seed), currencies, owners, opening.copy()
+            )
+            entry_count = wallet_count
+            daily = DailyTotals(_next_id(DailyWalletRollup))
+            rollup_count = 0
+            for chunk in _chunks(enumerate(transfers), self.batch_size):
+                transaction_rows = []
+                entry_rows = []
+                rollup_rows = []
+                for index, transfer in chunk:
+                    sender = first_wallet_id + transfer.sender
+                    receiver = first_wallet_id + transfer.receiver
+                    amount = _money(transfer.amount)
+                    timestamp = start + span * index
+                    transaction_rows.append(
+                        (transaction_id, sender, receiver, amount)
+                        + (transfer.rate, "PAID", timestamp)
+                    )
+                    entries = [("DEBIT", sender, -amount), ("CREDIT", receiver, amount)]
+                    if transfer.fee:
+                        entries.append(("FEE", sender, -_money(transfer.fee)))
+                    for kind, wallet_id, entry_amount in entries:
+                        entry_rows.append(
+                            (entry_id, wallet_id, transaction_id, kind)
+                            + (entry_amount, timestamp)
+                        )
+                        entry_id += 1
+                    transaction_id += 1
+                    rollup_rows += daily.add(
+                        timezone.localdate(timestamp), sender, receiver, transfer
+                    )
+                writer.write(Transaction, TRANSACTION_FIELDS, transaction_rows)
+                entry_count += writer.write(LedgerEntry, ENTRY_FIELDS, entry_rows)
+                rollup_count += writer.write(
+                    DailyWalletRollup, ROLLUP_FIELDS, rollup_rows
+                )
+            rollup_count += writer.write(
+                DailyWalletRollup, ROLLUP_FIELDS, daily.flush()
+            )
+
+            writer.reset_sequences(
+                [
+                    User,
+                    WalletNameBlock,
+                    Wallet,
+                    Transaction,
+                    LedgerEntry,
+                    DailyWalletRollup,
+                ]
+            )
+
+        return {
+            "users": self.scale.users,
+            "wallets": wallet_count,
+            "transactions": transfer_count,
+            "ledger_entries": entry_count,
+            "rollups": rollup_count,
+        }
+
+    def _write(
+        self,
+        writer: bulk.BulkWriter,
+        model: models.Model,
+        fields: Sequence[str],
+        rows: Iterable[bulk.Row],
+    ) -> int:
+        return sum(
+            writer.write(model, fields, chunk)
+            for chunk in _chunks(rows, self.batch_size)
+        )
+
+    def _reserve_names(
+        self, writer: bulk.BulkWriter, count: int, now: datetime
+    ) -> Iterator[str]:
+        """Reserve name blocks like wallets.names.WalletNameAllocator does"""
+        first_block_id = _next_id(WalletNameBlock)
+        block_count = math.ceil(count / BLOCK_SIZE)
+        self._write(
+            writer,
+            WalletNameBlock,
+            ("id", "created_on"),
+            (
+                (block_id, now)
+                for block_id in range(first_block_id, first_block_id + block_count)
+            ),
+        )
+        start = first_block_id * BLOCK_SIZE
+        return (encode(number) for number in range(start, start + count))
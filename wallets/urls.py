@@ -1,13 +1,27 @@
 from django.urls import path
 
-from wallets.views import (TransactionDetailView, TransactionListCreateView,
-                           WalletDetailView, WalletListCreateView,
+from wallets.views import (TransactionBatchView, TransactionDetailView,
+                           TransactionListCreateView,
+                           TransferRequestDetailView, WalletDetailView,
+                           WalletListCreateView, WalletRollupsView,
+                           WalletTransactionsExportView,
                            WalletTransactionsView)
 
 urlpatterns = [
     path("wallets/", WalletListCreateView.as_view(), name="wallets_list"),
     path("wallets/<str:name>/", WalletDetailView.as_view(), name="specific_wallet"),
+    path("wallets/<str:name>/rollups/", WalletRollupsView.as_view()),
     path("transactions/", TransactionListCreateView.as_view()),
+    path("transactions/batch/", TransactionBatchView.as_view()),
     path("transactions/<int:transaction_id>/", TransactionDetailView.as_view()),
+    path(
+        "transactions/requests/<int:request_id>/",
+        TransferRequestDetailView.as_view(),
+        name="transfer_request",
+    ),
     path("transactions/<str:wallet_name>/", WalletTransactionsView.as_view()),
+    path(
+        "transactions/<str:wallet_name>/export/<str:export_format>/",
+        WalletTransactionsExportView.as_view(),
+    ),
 ]
@@ -1,17 +1,32 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
 from rest_framework import status
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 
-from . import services
-from .serializers import TransactionSerializer, WalletSerializer
+from . import export, services
+from .conditional import (transactions_condition, wallet_condition,
+                          wallets_condition)
+from .fast_serializers import transaction_rows, wallet_rows
+from .models import IDEMPOTENCY_KEY_LENGTH
+from .pagination import TransactionCursorPagination
+from .serializers import (DailyWalletRollupSerializer, RollupRangeSerializer,
+                          TransactionBatchSerializer, TransactionSerializer,
+                          TransferRequestSerializer, WalletSerializer)
 
 
+@wallets_condition
 class WalletListCreateView(GenericAPIView):
     """View handle GET, POST requests to list of wallet"""
 
     serializer_class = WalletSerializer
 
     def get(self, request):
+        if settings.FAST_LIST_SERIALIZATION:
+            rows = services.get_user_wallet_rows(request.user)
+            return Response(wallet_rows.many(rows))
         wallets = services.get_user_wallets(request.user)
         serializer = WalletSerializer(wallets, many=True)
         return Response(serializer.data)
@@ -24,6 +39,7 @@ class WalletListCreateView(GenericAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@wallet_condition
 class WalletDetailView(GenericAPIView):
     """View handle GET, DELETE requests to wallet"""
 
@@ -40,23 +56,122 @@ class WalletDetailView(GenericAPIView):
         return Response(f"Wallet {name} deleted", status=status.HTTP_204_NO_CONTENT)
 
 
+class WalletRollupsView(GenericAPIView):
+    """View handle GET requests to daily totals of wallet"""
+
+    serializer_class = DailyWalletRollupSerializer
+
+    def get(self, request, name):
+        range_serializer = RollupRangeSerializer(data=request.query_params)
+        if not range_serializer.is_valid():
+            return Response(range_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        rollups = services.get_wallet_rollups(
+            request.user, name, **range_serializer.validated_data
+        )
+        serializer = DailyWalletRollupSerializer(rollups, many=True)
+        return Response(serializer.data)
+
+
+@transactions_condition
 class TransactionListCreateView(GenericAPIView):
     """View handle GET, POST requests to list of transaction"""
 
     serializer_class = TransactionSerializer
+    pagination_class = TransactionCursorPagination
 
     def get(self, request):
         transaction = services.get_user_transactions(request.user)
-        serializer = TransactionSerializer(transaction, many=True)
-        return Response(serializer.data)
+        if settings.FAST_LIST_SERIALIZATION:
+            page = self.paginate_queryset(transaction_rows.values(transaction))
+            return self.get_paginated_response(transaction_rows.many(page))
+        page = self.paginate_queryset(transaction)
+        serializer = TransactionSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def post(self, request):
+        idempotency_key = request.headers.get("Idempotency-Key")
+        if idempotency_key is not None:
+            if not 0 < len(idempotency_key) <= IDEMPOTENCY_KEY_LENGTH:
+                return Response(
+                    f"Idempotency-Key must have 1 to {IDEMPOTENCY_KEY_LENGTH} characters",
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        if settings.ASYNC_TRANSFERS:
+            return self.enqueue(request, idempotency_key)
+        return self.create(request, idempotency_key)
+
+    def create(self, request, idempotency_key):
+        if idempotency_key is not None:
+            transaction = services.get_idempotent_transaction(
+                self.request.user, idempotency_key
+            )
+            if transaction is not None:
+                serializer = TransactionSerializer(transaction)
+                return Response(serializer.data, status=status.HTTP_201_CREATED)
+
         serializer = TransactionSerializer(data=request.data)
         if serializer.is_valid():
-            services.create_transaction(self.request.user, serializer.validated_data)
+            try:
+                transaction = services.create_transaction(
+                    self.request.user, serializer.validated_data, idempotency_key
+                )
+            except ValidationError as error:
+                return Response(error.messages, status=status.HTTP_400_BAD_REQUEST)
+            serializer = TransactionSerializer(transaction)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def enqueue(self, request, idempotency_key):
+        transfer_request = None
+        if idempotency_key is not None:
+            transfer_request = services.get_idempotent_transfer_request(
+                self.request.user, idempotency_key
+            )
+        if transfer_request is None:
+            serializer = TransactionSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                transfer_request = services.enqueue_transfer(
+                    self.request.user, serializer.validated_data, idempotency_key
+                )
+            except ValidationError as error:
+                return Response(error.messages, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = TransferRequestSerializer(transfer_request)
+        location = reverse("transfer_request", args=[transfer_request.pk])
+        return Response(
+            serializer.data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": request.build_absolute_uri(location)},
+        )
+
+
+class TransferRequestDetailView(GenericAPIView):
+    """View handle GET requests to status of queued transfer"""
+
+    def get(self, request, request_id):
+        transfer_request = services.get_transfer_request(request.user, request_id)
+        serializer = TransferRequestSerializer(transfer_request)
+        return Response(serializer.data)
+
+
+class TransactionBatchView(GenericAPIView):
+    """View handle POST requests with a batch of transactions"""
+
+    serializer_class = TransactionBatchSerializer
+
+    def post(self, request):
+        serializer = TransactionBatchSerializer(data=request.data)
+        if serializer.is_valid():
+            results = services.create_transactions_batch(
+                self.request.user, serializer.validated_data["transactions"]
+            )
+            if any(result["status"] == "PAID" for result in results):
+                return Response(results, status=status.HTTP_201_CREATED)
+            return Response(results, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 
 class TransactionDetailView(GenericAPIView):
     """View handle GET requests to transaction"""
@@ -67,10 +182,33 @@ class TransactionDetailView(GenericAPIView):
         return Response(serializer.data)
 
 
+@transactions_condition
 class WalletTransactionsView(GenericAPIView):
     """View handle GET requests to list of transaction specific wallet"""
 
+    pagination_class = TransactionCursorPagination
+
     def get(self, request, wallet_name):
         transaction = services.get_wallet_transactions(request.user, wallet_name)
-        serializer = TransactionSerializer(transaction, many=True)
-        return Response(serializer.data)
+        if settings.FAST_LIST_SERIALIZATION:
+            page = self.paginate_queryset(transaction_rows.values(transaction))
+            return self.get_paginated_response(transaction_rows.many(page))
+        page = self.paginate_queryset(transaction)
+        serializer = TransactionSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class WalletTransactionsExportView(GenericAPIView):
+    """View handle GET requests to export transactions of specific wallet"""
+
+    def get(self, request, wallet_name, export_format):
+        if export_format not in export.FORMATS:
+            raise Http404
+        writer, content_type = export.FORMATS[export_format]
+
+        rows = services.get_wallet_transactions_export(request.user, wallet_name)
+        response = StreamingHttpResponse(writer(rows), content_type=content_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="{wallet_name}.{export_format}"'
+        )
+        return response